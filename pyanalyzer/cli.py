@@ -8,17 +8,24 @@ import sys
 import click
 import yaml
 import time
+from collections import Counter
+from functools import partial
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 
 from pyanalyzer.core.ast_parser import ASTParser
 from pyanalyzer.core.defect_detector import DefectDetector
-from pyanalyzer.core.symbolic_executor import SymbolicExecutor
 from pyanalyzer.reporting.html_reporter import HTMLReporter
 from pyanalyzer.reporting.json_reporter import JSONReporter
 from pyanalyzer.reporting.console_reporter import ConsoleReporter
-from pyanalyzer.utils.file_utils import find_python_files
+from pyanalyzer.utils.file_utils import find_python_files, prefetch_files
 from pyanalyzer.utils.metrics import calculate_metrics
+from pyanalyzer.utils.parallel import parallel_map
+
+# 文件数少于该值时顺序分析，避免进程池启动开销
+PARALLEL_MIN_FILES = 4
+# 每次分发给工作进程的文件数
+PARALLEL_CHUNKSIZE = 8
 
 
 @click.group()
@@ -39,8 +46,10 @@ def cli():
               help="最低严重级别")
 @click.option("--symbolic", is_flag=True, help="启用符号执行分析")
 @click.option("--visualize", is_flag=True, help="生成可视化图表")
+@click.option("--jobs", "-j", default=None, type=click.IntRange(min=1),
+              help="并行分析的进程数（默认为CPU核数，1表示顺序分析）")
 def analyze(project_path: str, config: str, output: str, format: str, 
-            severity: str, symbolic: bool, visualize: bool):
+            severity: str, symbolic: bool, visualize: bool, jobs: Optional[int]):
     """分析Python项目代码"""
     start_time = time.time()
     
@@ -58,18 +67,18 @@ def analyze(project_path: str, config: str, output: str, format: str,
     py_files = find_python_files(project_path, config_data.get("ignore", {}))
     click.echo(f"📄 找到 {len(py_files)} 个Python文件")
     
+    # 后台预读文件，冷缓存时磁盘I/O与解析重叠
+    prefetch_files(py_files)
+    
     all_defects = []
     all_metrics = []
+    # 按严重程度在线计数，摘要无需再遍历全部缺陷
+    severity_counts = Counter()
     
-    # 分析每个文件
-    with click.progressbar(py_files, label="分析文件中...", length=len(py_files)) as bar:
-        for file_path in bar:
-            try:
-                defects, metrics = analyze_file(file_path, config_data)
-                all_defects.extend(defects)
-                all_metrics.append(metrics)
-            except Exception as e:
-                click.echo(f"\n⚠️  分析文件 {file_path} 时出错: {e}", err=True)
+    # 分析每个文件（多文件时使用进程池并行）
+    with click.progressbar(length=len(py_files), label="分析文件中...") as bar:
+        results = analyze_files_parallel(py_files, config_data, workers=jobs)
+        _collect_results(results, py_files, bar, all_defects, all_metrics, severity_counts)
     
     # 生成报告
     if all_defects:
@@ -79,7 +88,7 @@ def analyze(project_path: str, config: str, output: str, format: str,
     
     # 计算项目指标
     project_metrics = calculate_project_metrics(all_metrics)
-    display_summary(all_defects, project_metrics, time.time() - start_time)
+    display_summary(severity_counts, project_metrics, time.time() - start_time)
 
 
 @cli.command()
@@ -148,11 +157,11 @@ def load_config(config_path: str) -> Dict:
 
 def analyze_file(file_path: str, config: Dict) -> tuple:
     """分析单个文件"""
-    with open(file_path, 'r', encoding='utf-8') as f:
-        source_code = f.read()
+    # 一次读取整个文件再整体解码，跳过文本I/O层的逐块解码和换行转换
+    source_code = Path(file_path).read_bytes().decode('utf-8')
     
-    # 解析AST
-    parser = ASTParser(source_code, str(file_path))
+    # 解析AST（命令行分析时启用磁盘缓存，未修改的文件无需重新解析）
+    parser = ASTParser(source_code, str(file_path), use_cache=True)
     
     # 检测缺陷
     detector = DefectDetector(parser, config)
@@ -160,6 +169,9 @@ def analyze_file(file_path: str, config: Dict) -> tuple:
     
     # 符号执行（如果启用）
     if config.get("symbolic_execution", {}).get("enabled", False):
+        # z3导入较慢，仅在启用符号执行时导入
+        from pyanalyzer.core.symbolic_executor import SymbolicExecutor
+        
         symbolic_executor = SymbolicExecutor(parser)
         symbolic_defects = symbolic_executor.analyze()
         defects.extend(symbolic_defects)
@@ -170,6 +182,39 @@ def analyze_file(file_path: str, config: Dict) -> tuple:
     return defects, metrics
 
 
+def analyze_files_parallel(py_files: List[str], config: Dict, workers: Optional[int] = None):
+    """分析多个文件，按文件顺序逐个产出(缺陷, 指标, 错误信息)
+    
+    文件数较多时使用进程池；工作进程数不超过分块数，避免启动永远分不到任务的进程；
+    workers为1时始终顺序分析
+    """
+    worker = partial(_analyze_file_safely, config=config)
+    yield from parallel_map(worker, py_files, workers=workers,
+                            min_items=PARALLEL_MIN_FILES, chunksize=PARALLEL_CHUNKSIZE)
+
+
+def _analyze_file_safely(file_path: str, config: Dict) -> tuple:
+    """分析单个文件，将异常作为结果返回以便在主进程中报告"""
+    try:
+        defects, metrics = analyze_file(file_path, config)
+        return defects, metrics, None
+    except Exception as e:
+        return None, None, str(e)
+
+
+def _collect_results(results, py_files: List[str], bar,
+                     all_defects: List, all_metrics: List, severity_counts: Counter):
+    """按文件顺序收集分析结果并推进进度条"""
+    for file_path, (defects, metrics, error) in zip(py_files, results):
+        if error is None:
+            all_defects.extend(defects)
+            all_metrics.append(metrics)
+            severity_counts.update(defect.severity.value for defect in defects)
+        else:
+            click.echo(f"\n⚠️  分析文件 {file_path} 时出错: {error}", err=True)
+        bar.update(1)
+
+
 def generate_report(defects: List, metrics: List, config: Dict, visualize: bool):
     """生成报告"""
     format_type = config["reporting"]["format"]
@@ -197,10 +242,15 @@ def calculate_project_metrics(all_metrics: List) -> Dict:
     if not all_metrics:
         return {}
     
-    total_lines = sum(m.get("total_lines", 0) for m in all_metrics)
-    total_functions = sum(m.get("function_count", 0) for m in all_metrics)
-    total_classes = sum(m.get("class_count", 0) for m in all_metrics)
-    avg_complexity = sum(m.get("avg_cyclomatic_complexity", 0) for m in all_metrics) / len(all_metrics)
+    # 单次遍历累加所有指标
+    total_lines = total_functions = total_classes = 0
+    total_complexity = 0.0
+    for m in all_metrics:
+        total_lines += m.get("total_lines", 0)
+        total_functions += m.get("function_count", 0)
+        total_classes += m.get("class_count", 0)
+        total_complexity += m.get("avg_cyclomatic_complexity", 0)
+    avg_complexity = total_complexity / len(all_metrics)
     
     return {
         "total_lines": total_lines,
@@ -211,19 +261,14 @@ def calculate_project_metrics(all_metrics: List) -> Dict:
     }
 
 
-def display_summary(defects: List, metrics: Dict, elapsed_time: float):
+def display_summary(severity_counts: Dict[str, int], metrics: Dict, elapsed_time: float):
     """显示分析摘要"""
     click.echo("\n" + "="*50)
     click.echo("📊 分析摘要")
     click.echo("="*50)
     
     # 缺陷统计
-    severity_counts = {}
-    for defect in defects:
-        sev = defect.severity
-        severity_counts[sev] = severity_counts.get(sev, 0) + 1
-    
-    click.echo(f"🔍 发现缺陷总数: {len(defects)}")
+    click.echo(f"🔍 发现缺陷总数: {sum(severity_counts.values())}")
     for severity in ["critical", "high", "medium", "low"]:
         count = severity_counts.get(severity, 0)
         if count > 0:
@@ -0,0 +1,109 @@
+"""
+AST解析结果磁盘缓存
+按源码内容哈希缓存解析与提取结果，未修改的文件无需重新解析
+"""
+
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+# 缓存结构变化时递增，使旧缓存自动失效
+CACHE_SCHEMA_VERSION = 8
+
+# 缓存目录的上限：超过最大保留时间的条目删除，总大小超限时从最久未使用的条目开始删除
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_MAX_AGE = 30 * 24 * 3600
+
+# 每个进程只在首次写入时清理一次，避免每次写入都扫描目录
+_pruned = False
+
+
+def get_cache_dir() -> Path:
+    """获取缓存目录（可通过PYANALYZER_CACHE_DIR覆盖）"""
+    cache_dir = os.environ.get("PYANALYZER_CACHE_DIR")
+    if cache_dir:
+        return Path(cache_dir)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "pyanalyzer"
+
+
+def is_cache_enabled() -> bool:
+    """检查是否启用缓存（设置PYANALYZER_NO_CACHE可关闭）"""
+    return not os.environ.get("PYANALYZER_NO_CACHE")
+
+
+def make_key(source_code: str) -> str:
+    """根据源码、Python版本和缓存结构版本生成缓存键"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{CACHE_SCHEMA_VERSION}:{sys.version_info[0]}.{sys.version_info[1]}:".encode())
+    digest.update(source_code.encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+def load(key: str) -> Optional[Any]:
+    """读取缓存，未命中或缓存损坏时返回None"""
+    path = get_cache_dir() / f"{key}.pkl"
+    try:
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        # 命中时刷新修改时间，清理时按修改时间淘汰最久未使用的条目
+        os.utime(path)
+        return data
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # 缓存损坏或不兼容，当作未命中
+        return None
+
+
+def store(key: str, data: Any):
+    """写入缓存，先写临时文件再原子替换，避免并发进程读到半截文件"""
+    global _pruned
+    cache_dir = get_cache_dir()
+    try:
+        if not _pruned:
+            _pruned = True
+            prune(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_dir / f"{key}.pkl")
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception:
+        # 缓存写入失败不影响分析
+        pass
+
+
+def prune(cache_dir: Optional[Path] = None,
+          max_bytes: int = CACHE_MAX_BYTES, max_age: float = CACHE_MAX_AGE):
+    """删除过期的缓存条目，并按修改时间从旧到新删除，直到总大小不超过上限"""
+    cache_dir = cache_dir or get_cache_dir()
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                if entry.name.endswith(".pkl"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+    except OSError:
+        return
+    
+    expire_before = time.time() - max_age
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in sorted(entries):
+        if mtime >= expire_before and total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
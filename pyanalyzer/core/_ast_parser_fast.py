@@ -0,0 +1,130 @@
+"""
+AST提取遍历的热点代码
+所有变量均带类型注解，可用mypyc编译为C扩展（见setup.py），未编译时按纯Python运行
+"""
+
+import ast
+from collections import deque
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+
+class ExtractVisitor:
+    """单次遍历AST，同时收集函数、类、导入、变量、调用和控制流信息"""
+    
+    def __init__(self, parser: Any):
+        self.parser = parser
+        # 当前节点外层的函数链（由外到内），判定点计入链上每个函数的圈复杂度
+        self._funcs: Tuple[Any, ...] = ()
+        self._calls: List[Any] = parser._calls
+        self._loaded_names: Set[str] = parser.loaded_names
+        
+        # 节点类型 -> 处理方法
+        self._handlers: Dict[type, Callable[[Any], None]] = {
+            ast.FunctionDef: self.visit_FunctionDef,
+            ast.ClassDef: self.visit_ClassDef,
+            ast.Import: self.visit_Import,
+            ast.ImportFrom: self.visit_Import,
+            ast.Assign: self.visit_Assign,
+            ast.Call: self.visit_Call,
+            ast.If: self.visit_If,
+            ast.While: self.visit_While,
+            ast.For: self.visit_For,
+            ast.AsyncFor: self.visit_branch,
+            ast.Try: self.visit_branch,
+            ast.ExceptHandler: self.visit_branch,
+            ast.BoolOp: self.visit_BoolOp,
+            ast.Name: self.visit_Name,
+        }
+        if hasattr(ast, "Match"):  # Python 3.10+
+            self._handlers[getattr(ast, "Match")] = self.visit_Match
+    
+    def run(self, tree: ast.AST) -> None:
+        """按ast.walk相同的广度优先顺序遍历，按type(node)查表分派
+        
+        函数、类、导入、变量和调用的收集顺序与ast.walk一致：同名函数中外层定义排在嵌套定义之前
+        """
+        handlers = self._handlers
+        iter_child_nodes = ast.iter_child_nodes
+        queue: deque = deque([(tree, ())])
+        
+        while queue:
+            node, funcs = queue.popleft()
+            self._funcs = funcs
+            handler = handlers.get(type(node))
+            if handler is not None:
+                handler(node)
+            # 处理函数定义时self._funcs会加入该函数，子节点随之带上新的函数链
+            funcs = self._funcs
+            for child in iter_child_nodes(node):
+                queue.append((child, funcs))
+    
+    def _add_complexity(self, amount: int) -> None:
+        # 嵌套函数的分支同样计入外层函数的复杂度
+        for func_info in self._funcs:
+            func_info.complexity += amount
+    
+    def visit_FunctionDef(self, node: Any) -> None:
+        func_info = self.parser._parse_function(node)
+        self.parser.functions.append(func_info)
+        self._funcs = self._funcs + (func_info,)
+    
+    def visit_ClassDef(self, node: Any) -> None:
+        self.parser.classes.append(self.parser._parse_class(node))
+    
+    def visit_Import(self, node: Any) -> None:
+        self.parser.imports.append(self.parser._parse_import(node))
+    
+    def visit_Assign(self, node: Any) -> None:
+        self.parser._parse_assignment(node)
+    
+    def visit_Call(self, node: Any) -> None:
+        # 以元组(函数名, 行号, 参数个数, 模块)记录，需要时再转为字典
+        func = node.func
+        func_type = type(func)
+        if func_type is ast.Name:
+            self._calls.append((func.id, node.lineno, len(node.args), None))
+        elif func_type is ast.Attribute:
+            self._calls.append((func.attr, node.lineno, len(node.args), self.parser._src(func.value)))
+    
+    def visit_Name(self, node: Any) -> None:
+        if type(node.ctx) is ast.Load:
+            self._loaded_names.add(node.id)
+    
+    def visit_If(self, node: Any) -> None:
+        self._add_complexity(1)
+        self.parser._flow_nodes.append({
+            "type": "if",
+            "lineno": node.lineno,
+            "test": self.parser._src(node.test) if node.test else "",
+            "has_else": bool(node.orelse)
+        })
+    
+    def visit_While(self, node: Any) -> None:
+        self._add_complexity(1)
+        self.parser._flow_nodes.append({
+            "type": "while",
+            "lineno": node.lineno,
+            "test": self.parser._src(node.test) if node.test else "",
+            "has_else": bool(node.orelse)
+        })
+    
+    def visit_For(self, node: Any) -> None:
+        self._add_complexity(1)
+        self.parser._flow_nodes.append({
+            "type": "for",
+            "lineno": node.lineno,
+            "target": self.parser._src(node.target) if node.target else "",
+            "iter": self.parser._src(node.iter) if node.iter else "",
+            "has_else": bool(node.orelse)
+        })
+    
+    def visit_branch(self, node: Any) -> None:
+        self._add_complexity(1)
+    
+    def visit_BoolOp(self, node: Any) -> None:
+        # 布尔操作符中的每个运算符增加1
+        self._add_complexity(len(node.values) - 1)
+    
+    def visit_Match(self, node: Any) -> None:
+        # match语句的每个case增加1
+        self._add_complexity(len(node.cases))
@@ -3,14 +3,51 @@ AST解析器模块
 """
 
 import ast
-import libcst as cst
-import astunparse
-from typing import Dict, List, Any, Optional, Tuple, Set
+import inspect
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple, Set
 from dataclasses import dataclass, field
 from collections import defaultdict
 
+from pyanalyzer.core import _ast_cache
+from pyanalyzer.core._ast_parser_fast import ExtractVisitor
 
-@dataclass
+if TYPE_CHECKING:
+    import libcst
+
+
+# 无GIL构建（PEP 703）下，libcst解析可与ast解析在线程中真正并行
+_GIL_DISABLED = not getattr(sys, "_is_gil_enabled", lambda: True)()
+_cst_executor = ThreadPoolExecutor(max_workers=2) if _GIL_DISABLED else None
+
+
+def _parse_cst(source_code: str) -> "libcst.Module":
+    """解析具体语法树（libcst导入较慢，仅在需要时导入）"""
+    import libcst
+    return libcst.parse_module(source_code)
+
+# 大型项目中函数/类信息对象数量很多，Python 3.10+使用__slots__去掉实例__dict__
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+def _get_docstring(node: ast.FunctionDef) -> Optional[str]:
+    """获取函数文档字符串，结果与ast.get_docstring一致，单行文档字符串无需cleandoc"""
+    if not node.body:
+        return None
+    first = node.body[0]
+    if type(first) is not ast.Expr:
+        return None
+    value = first.value
+    if type(value) is not ast.Constant or type(value.value) is not str:
+        return None
+    text = value.value
+    if "\n" not in text and "\t" not in text:
+        return text.lstrip()
+    return inspect.cleandoc(text)
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class FunctionInfo:
     """函数信息"""
     name: str
@@ -23,7 +60,7 @@ class FunctionInfo:
     complexity: int = 1
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class ClassInfo:
     """类信息"""
     name: str
@@ -36,69 +73,166 @@ class ClassInfo:
 class ASTParser:
     """抽象语法树解析器"""
     
-    def __init__(self, source_code: str, file_path: str = ""):
+    # 写入磁盘缓存的解析结果字段
+    _CACHED_FIELDS = (
+        "ast_tree", "functions", "classes", "imports",
+        "variables", "loaded_names", "_calls", "_flow_nodes",
+    )
+    
+    def __init__(self, source_code: str, file_path: str = "", use_cache: bool = False):
         self.source_code = source_code
         self.file_path = file_path
         
+        self._cst_tree = None
+        self._cst_future = None
+        self._nodes_by_type = None
+        self._functions_by_node = None
+        self._named_calls = None
+        self._lines = None
+        if _cst_executor is not None:
+            self._cst_future = _cst_executor.submit(_parse_cst, source_code)
+        
+        # 命中缓存时直接恢复解析结果
+        cache_key = None
+        if use_cache and _ast_cache.is_cache_enabled():
+            cache_key = _ast_cache.make_key(source_code)
+            cached = _ast_cache.load(cache_key)
+            if cached is not None:
+                for name, value in zip(self._CACHED_FIELDS, cached):
+                    setattr(self, name, value)
+                return
+        
         # 解析AST
         try:
             self.ast_tree = ast.parse(source_code)
-            self.cst_tree = cst.parse_module(source_code)
         except SyntaxError as e:
             raise ValueError(f"语法错误: {e}")
         
         # 提取信息
         self._extract_info()
+        
+        if cache_key is not None:
+            _ast_cache.store(cache_key, tuple(getattr(self, name) for name in self._CACHED_FIELDS))
+    
+    @property
+    def cst_tree(self) -> "libcst.Module":
+        """具体语法树，首次访问时才解析（无GIL构建下已在后台线程解析）"""
+        if self._cst_tree is None:
+            if self._cst_future is not None:
+                self._cst_tree = self._cst_future.result()
+                self._cst_future = None
+            else:
+                self._cst_tree = _parse_cst(self.source_code)
+        return self._cst_tree
+    
+    @property
+    def nodes_by_type(self) -> Dict[type, List[ast.AST]]:
+        """按节点类型分组的所有AST节点（源码顺序），首次访问时遍历一次，供各检测器共享
+        
+        同一次遍历中为每个节点设置parent属性，检测器可直接取得父节点
+        """
+        if self._nodes_by_type is None:
+            nodes_by_type = defaultdict(list)
+            iter_child_nodes = ast.iter_child_nodes
+            stack = [self.ast_tree]
+            while stack:
+                node = stack.pop()
+                nodes_by_type[type(node)].append(node)
+                children = list(iter_child_nodes(node))
+                for child in children:
+                    child.parent = node
+                stack.extend(reversed(children))
+            self._nodes_by_type = dict(nodes_by_type)
+        return self._nodes_by_type
+    
+    @property
+    def named_calls(self) -> List[Tuple[ast.Call, str]]:
+        """源码顺序的(调用节点, 被调用名称)列表，名称取函数名或属性名，供按名称筛选调用的检测器共享"""
+        if self._named_calls is None:
+            named_calls = []
+            for node in self.nodes_by_type.get(ast.Call, ()):
+                func = node.func
+                func_type = type(func)
+                if func_type is ast.Name:
+                    named_calls.append((node, func.id))
+                elif func_type is ast.Attribute:
+                    named_calls.append((node, func.attr))
+                else:
+                    named_calls.append((node, ""))
+            self._named_calls = named_calls
+        return self._named_calls
     
     def _extract_info(self):
-        """从AST中提取信息"""
+        """从AST中提取信息（单次遍历）"""
         self.functions = []
         self.classes = []
         self.imports = []
         self.variables = defaultdict(list)
+        # 以Load上下文出现过的名称，供查找未使用变量和未使用导入共用
+        self.loaded_names: Set[str] = set()
+        self._calls = []
+        self._flow_nodes = []
+        self._function_infos = {}
+        # 按行切分源码，ast的行号只以\n、\r\n、\r分隔
+        self._lines = self.source_code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
         
         # 遍历AST
-        for node in ast.walk(self.ast_tree):
-            if isinstance(node, ast.FunctionDef):
-                func_info = self._parse_function(node)
-                self.functions.append(func_info)
-                
-            elif isinstance(node, ast.ClassDef):
-                class_info = self._parse_class(node)
-                self.classes.append(class_info)
-                
-            elif isinstance(node, (ast.Import, ast.ImportFrom)):
-                import_info = self._parse_import(node)
-                self.imports.append(import_info)
-                
-            elif isinstance(node, ast.Assign):
-                self._parse_assignment(node)
+        ExtractVisitor(self).run(self.ast_tree)
+    
+    def source_segment(self, node: ast.AST) -> str:
+        """节点对应的源码原文，供检测器生成缺陷上下文（命中磁盘缓存时才按需切分源码行）"""
+        if self._lines is None:
+            self._lines = self.source_code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+        return self._src(node)
+    
+    def _src(self, node: ast.AST) -> str:
+        """按节点位置直接截取源码片段，代替逐节点ast.unparse"""
+        end_lineno = getattr(node, "end_lineno", None)
+        if end_lineno is None:
+            return ast.unparse(node)
+        
+        lineno, col, end_col = node.lineno, node.col_offset, node.end_col_offset
+        lines = self._lines
+        if lineno == end_lineno:
+            line = lines[lineno - 1]
+            if line.isascii():
+                return line[col:end_col]
+            # 列偏移量是UTF-8字节偏移
+            return line.encode("utf-8")[col:end_col].decode("utf-8")
+        
+        first = lines[lineno - 1].encode("utf-8")[col:].decode("utf-8")
+        last = lines[end_lineno - 1].encode("utf-8")[:end_col].decode("utf-8")
+        return "\n".join([first, *lines[lineno:end_lineno - 1], last])
     
     def _parse_function(self, node: ast.FunctionDef) -> FunctionInfo:
-        """解析函数定义"""
+        """解析函数定义（同一节点只解析一次，类方法与函数列表共享结果）"""
+        func_info = self._function_infos.get(id(node))
+        if func_info is None:
+            func_info = self._function_infos[id(node)] = self._build_function_info(node)
+        return func_info
+    
+    def _build_function_info(self, node: ast.FunctionDef) -> FunctionInfo:
+        """构建函数信息"""
         args = []
         if node.args.args:
             args = [arg.arg for arg in node.args.args]
         
-        # 计算圈复杂度
-        complexity = self._calculate_cyclomatic_complexity(node)
-        
         return FunctionInfo(
-            name=node.name,
+            name=sys.intern(node.name),
             lineno=node.lineno,
             args=args,
-            returns=ast.unparse(node.returns) if node.returns else None,
-            docstring=ast.get_docstring(node),
-            decorators=[ast.unparse(decorator) for decorator in node.decorator_list],
-            body=node,
-            complexity=complexity
+            returns=self._src(node.returns) if node.returns else None,
+            docstring=_get_docstring(node),
+            # 装饰器文本高度重复（@property、@staticmethod等），驻留以共享同一字符串
+            decorators=[sys.intern(self._src(decorator)) for decorator in node.decorator_list],
+            body=node
         )
     
     def _parse_class(self, node: ast.ClassDef) -> ClassInfo:
         """解析类定义"""
         bases = []
         if node.bases:
-            bases = [ast.unparse(base) for base in node.bases]
+            bases = [self._src(base) for base in node.bases]
         
         # 提取类的方法
         methods = []
@@ -115,7 +249,7 @@ class ASTParser:
                         attributes.append(target.id)
         
         return ClassInfo(
-            name=node.name,
+            name=sys.intern(node.name),
             lineno=node.lineno,
             bases=bases,
             methods=methods,
@@ -124,15 +258,30 @@ class ASTParser:
     
     def _parse_import(self, node: ast.AST) -> Dict:
         """解析导入语句"""
+        # effective_names与names一一对应，是导入后实际绑定的名称：
+        # import a.b 绑定 a，import a as b / from m import a as b 绑定 b，from m import * 为None
         if isinstance(node, ast.Import):
             names = [alias.name for alias in node.names]
-            return {"type": "import", "names": names, "lineno": node.lineno}
+            effective_names = [
+                alias.asname or alias.name.partition(".")[0] for alias in node.names
+            ]
+            return {
+                "type": "import",
+                "names": names,
+                "effective_names": effective_names,
+                "lineno": node.lineno
+            }
         elif isinstance(node, ast.ImportFrom):
             names = [alias.name for alias in node.names]
+            effective_names = [
+                None if alias.name == "*" else (alias.asname or alias.name)
+                for alias in node.names
+            ]
             return {
                 "type": "import_from", 
                 "module": node.module or "", 
                 "names": names, 
+                "effective_names": effective_names,
                 "level": node.level,
                 "lineno": node.lineno
             }
@@ -140,83 +289,27 @@ class ASTParser:
     def _parse_assignment(self, node: ast.Assign):
         """解析赋值语句"""
         for target in node.targets:
-            if isinstance(target, ast.Name):
+            target_type = type(target)
+            if target_type is ast.Name:
                 self.variables[target.id].append(node.lineno)
-            elif isinstance(target, ast.Tuple):
+            elif target_type is ast.Tuple:
                 for elt in target.elts:
-                    if isinstance(elt, ast.Name):
+                    if type(elt) is ast.Name:
                         self.variables[elt.id].append(node.lineno)
     
-    def _calculate_cyclomatic_complexity(self, node: ast.AST) -> int:
-        """计算圈复杂度"""
-        complexity = 1  # 起始复杂度为1
-        
-        for child in ast.walk(node):
-            # 增加复杂度的节点类型
-            if isinstance(child, (ast.If, ast.While, ast.For, ast.AsyncFor)):
-                complexity += 1
-            elif isinstance(child, ast.BoolOp):
-                # 布尔操作符中的每个运算符增加1
-                complexity += len(child.values) - 1
-            elif isinstance(child, (ast.Try, ast.ExceptHandler)):
-                complexity += 1
-            elif isinstance(child, ast.Match):
-                # match语句的每个case增加1
-                complexity += len(child.cases)
-        
-        return complexity
-    
     def get_all_calls(self) -> List[Dict]:
         """获取所有函数调用"""
         calls = []
-        
-        for node in ast.walk(self.ast_tree):
-            if isinstance(node, ast.Call):
-                if isinstance(node.func, ast.Name):
-                    calls.append({
-                        "function": node.func.id,
-                        "lineno": node.lineno,
-                        "args": len(node.args)
-                    })
-                elif isinstance(node.func, ast.Attribute):
-                    calls.append({
-                        "function": node.func.attr,
-                        "lineno": node.lineno,
-                        "module": ast.unparse(node.func.value),
-                        "args": len(node.args)
-                    })
-        
+        for function, lineno, args, module in self._calls:
+            if module is None:
+                calls.append({"function": function, "lineno": lineno, "args": args})
+            else:
+                calls.append({"function": function, "lineno": lineno, "module": module, "args": args})
         return calls
     
     def get_control_flow_nodes(self) -> List[Dict]:
         """获取控制流节点（if/while/for等）"""
-        flow_nodes = []
-        
-        for node in ast.walk(self.ast_tree):
-            if isinstance(node, ast.If):
-                flow_nodes.append({
-                    "type": "if",
-                    "lineno": node.lineno,
-                    "test": ast.unparse(node.test) if node.test else "",
-                    "has_else": bool(node.orelse)
-                })
-            elif isinstance(node, ast.While):
-                flow_nodes.append({
-                    "type": "while",
-                    "lineno": node.lineno,
-                    "test": ast.unparse(node.test) if node.test else "",
-                    "has_else": bool(node.orelse)
-                })
-            elif isinstance(node, ast.For):
-                flow_nodes.append({
-                    "type": "for",
-                    "lineno": node.lineno,
-                    "target": ast.unparse(node.target) if node.target else "",
-                    "iter": ast.unparse(node.iter) if node.iter else "",
-                    "has_else": bool(node.orelse)
-                })
-        
-        return flow_nodes
+        return list(self._flow_nodes)
     
     def calculate_metrics(self) -> Dict[str, Any]:
         """计算代码指标"""
@@ -262,6 +355,12 @@ class ASTParser:
                 return func
         return None
     
+    def get_function_by_node(self, node: ast.AST) -> Optional[FunctionInfo]:
+        """根据函数定义节点查找函数信息（首次调用时建立索引，同名函数互不干扰）"""
+        if self._functions_by_node is None:
+            self._functions_by_node = {id(func.body): func for func in self.functions}
+        return self._functions_by_node.get(id(node))
+    
     def get_class_by_name(self, name: str) -> Optional[ClassInfo]:
         """根据名称查找类"""
         for cls in self.classes:
@@ -270,27 +369,15 @@ class ASTParser:
         return None
     
     def find_unused_variables(self) -> List[Dict]:
-        """查找未使用的变量"""
-        unused = []
-        
-        # 获取所有变量使用
-        used_vars = set()
-        for node in ast.walk(self.ast_tree):
-            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
-                used_vars.add(node.id)
-        
-        # 检查哪些变量定义了但未使用
-        for var_name, lines in self.variables.items():
-            if var_name not in used_vars:
-                # 排除以_开头的变量（通常是有意不使用的）
-                if not var_name.startswith('_'):
-                    unused.append({
-                        "variable": var_name,
-                        "lines": lines,
-                        "reason": "定义了但未使用"
-                    })
+        """查找未使用的变量（变量使用已在提取遍历中收集）"""
+        used_vars = self.loaded_names
         
-        return unused
+        # 排除以_开头的变量（通常是有意不使用的）
+        return [
+            {"variable": var_name, "lines": lines, "reason": "定义了但未使用"}
+            for var_name, lines in self.variables.items()
+            if var_name not in used_vars and not var_name.startswith('_')
+        ]
     
     def generate_ast_dump(self) -> str:
         """生成AST的字符串表示"""
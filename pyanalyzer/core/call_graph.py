@@ -3,25 +3,53 @@
 """
 
 import ast
-import networkx as nx
-from typing import Dict, List, Set, Tuple
+import heapq
+import sys
+from typing import TYPE_CHECKING, Any, Dict, List, Set, Tuple
 from collections import defaultdict
 
+if TYPE_CHECKING:
+    import networkx as nx
+
 
 class CallGraphAnalyzer:
     """调用图分析器"""
     
     def __init__(self, parser):
         self.parser = parser
-        self.graph = nx.DiGraph()
+        # 邻接表表示的调用图：节点属性、后继集合、前驱集合
+        self.nodes: Dict[str, Dict[str, Any]] = {}
+        self.successors: Dict[str, Set[str]] = {}
+        self.predecessors: Dict[str, Set[str]] = {}
         self.function_calls = defaultdict(set)
         self.class_hierarchy = defaultdict(set)
+    
+    def add_node(self, name: str, **attrs):
+        """添加节点（已存在时合并属性）"""
+        if name in self.nodes:
+            self.nodes[name].update(attrs)
+        else:
+            self.nodes[name] = attrs
+            self.successors[name] = set()
+            self.predecessors[name] = set()
+    
+    def add_edge(self, caller: str, callee: str):
+        """添加调用边"""
+        for name in (caller, callee):
+            if name not in self.nodes:
+                self.add_node(name)
+        self.successors[caller].add(callee)
+        self.predecessors[callee].add(caller)
+    
+    def edge_count(self) -> int:
+        """调用边数量"""
+        return sum(len(callees) for callees in self.successors.values())
         
-    def build_call_graph(self):
-        """构建调用图"""
+    def build_call_graph(self) -> Dict[str, Set[str]]:
+        """构建调用图，返回 调用者 -> 被调用者集合 的邻接表"""
         # 添加所有函数作为节点
         for func in self.parser.functions:
-            self.graph.add_node(
+            self.add_node(
                 func.name,
                 type='function',
                 line=func.lineno,
@@ -30,7 +58,7 @@ class CallGraphAnalyzer:
         
         # 添加所有类作为节点
         for cls in self.parser.classes:
-            self.graph.add_node(
+            self.add_node(
                 cls.name,
                 type='class',
                 line=cls.lineno
@@ -38,8 +66,8 @@ class CallGraphAnalyzer:
             
             # 添加类方法
             for method in cls.methods:
-                self.graph.add_node(
-                    f"{cls.name}.{method.name}",
+                self.add_node(
+                    sys.intern(f"{cls.name}.{method.name}"),
                     type='method',
                     line=method.lineno,
                     complexity=method.complexity
@@ -51,75 +79,123 @@ class CallGraphAnalyzer:
         # 添加调用边
         for caller, callees in self.function_calls.items():
             for callee in callees:
-                if callee in self.graph:
-                    self.graph.add_edge(caller, callee)
+                if callee in self.nodes:
+                    self.add_edge(caller, callee)
         
-        return self.graph
+        return self.successors
     
     def _analyze_calls(self):
         """分析函数调用关系"""
-        # 遍历AST，收集调用信息
-        for node in ast.walk(self.parser.ast_tree):
-            if isinstance(node, ast.Call):
-                caller = self._get_enclosing_function(node)
-                callee = self._extract_callee_name(node)
-                
-                if caller and callee:
-                    self.function_calls[caller].add(callee)
-    
-    def _get_enclosing_function(self, node: ast.AST) -> str:
-        """获取包含给定节点的函数名"""
-        parent = node
-        while hasattr(parent, 'parent'):
-            parent = parent.parent
-            if isinstance(parent, ast.FunctionDef):
-                # 检查是否是类方法
-                class_parent = parent
-                while hasattr(class_parent, 'parent'):
-                    class_parent = class_parent.parent
-                    if isinstance(class_parent, ast.ClassDef):
-                        return f"{class_parent.name}.{parent.name}"
-                return parent.name
-        return None
+        # 单次遍历AST，自顶向下维护当前所在函数，收集调用信息
+        _EnclosingVisitor(self).visit(self.parser.ast_tree)
     
     def _extract_callee_name(self, node: ast.Call) -> str:
-        """提取被调用函数名"""
+        """提取被调用函数名（驻留字符串，作为图节点键时比较更快）"""
         if isinstance(node.func, ast.Name):
-            return node.func.id
+            return sys.intern(node.func.id)
         elif isinstance(node.func, ast.Attribute):
             # 处理obj.method()形式的调用
             if isinstance(node.func.value, ast.Name):
-                return f"{node.func.value.id}.{node.func.attr}"
+                return sys.intern(f"{node.func.value.id}.{node.func.attr}")
         return None
     
     def find_circular_dependencies(self) -> List[List[str]]:
-        """查找循环依赖"""
-        try:
-            cycles = list(nx.simple_cycles(self.graph))
-            return cycles
-        except nx.NetworkXNoCycle:
-            return []
+        """查找循环依赖（所有简单环）"""
+        cycles = []
+        
+        for component in self._strongly_connected_components():
+            if len(component) == 1:
+                node = next(iter(component))
+                if node in self.successors[node]:
+                    cycles.append([node])
+                continue
+            
+            # 每个环只从其中排序最小的节点出发枚举一次
+            order = sorted(component)
+            for i, start in enumerate(order):
+                allowed = set(order[i:])
+                path = [start]
+                on_path = {start}
+                work = [iter(sorted(self.successors[start] & allowed))]
+                
+                while work:
+                    for child in work[-1]:
+                        if child == start:
+                            cycles.append(list(path))
+                        elif child not in on_path:
+                            path.append(child)
+                            on_path.add(child)
+                            work.append(iter(sorted(self.successors[child] & allowed)))
+                            break
+                    else:
+                        work.pop()
+                        on_path.discard(path.pop())
+        
+        return cycles
+    
+    def _strongly_connected_components(self) -> List[Set[str]]:
+        """Tarjan算法（迭代实现）求强连通分量"""
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        components = []
+        counter = 0
+        
+        for root in self.nodes:
+            if root in index:
+                continue
+            
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(self.successors[root]))]
+            
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.successors[child])))
+                        break
+                    elif child in on_stack:
+                        lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[node])
+                    
+                    if lowlink[node] == index[node]:
+                        component = set()
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.add(member)
+                            if member == node:
+                                break
+                        components.append(component)
+        
+        return components
     
     def calculate_coupling_metrics(self) -> Dict:
         """计算耦合度指标"""
-        if not self.graph.nodes:
+        if not self.nodes:
             return {}
         
         # 计算传入耦合（afferent coupling）
-        afferent = {}
-        for node in self.graph.nodes():
-            predecessors = list(self.graph.predecessors(node))
-            afferent[node] = len(predecessors)
+        afferent = {node: len(callers) for node, callers in self.predecessors.items()}
         
         # 计算传出耦合（efferent coupling）
-        efferent = {}
-        for node in self.graph.nodes():
-            successors = list(self.graph.successors(node))
-            efferent[node] = len(successors)
+        efferent = {node: len(callees) for node, callees in self.successors.items()}
         
         # 计算不稳定性
         instability = {}
-        for node in self.graph.nodes():
+        for node in self.nodes:
             ce = efferent.get(node, 0)
             ca = afferent.get(node, 0)
             if ce + ca > 0:
@@ -131,34 +207,49 @@ class CallGraphAnalyzer:
             'afferent_coupling': afferent,
             'efferent_coupling': efferent,
             'instability': instability,
-            'total_nodes': len(self.graph.nodes()),
-            'total_edges': len(self.graph.edges()),
+            'total_nodes': len(self.nodes),
+            'total_edges': self.edge_count(),
         }
     
     def find_most_coupled_functions(self, n: int = 10) -> List[Tuple[str, int]]:
         """找出耦合度最高的函数"""
-        coupling = {}
-        for node in self.graph.nodes():
-            in_degree = self.graph.in_degree(node)
-            out_degree = self.graph.out_degree(node)
-            coupling[node] = in_degree + out_degree
+        coupling = (
+            (node, len(self.predecessors[node]) + len(self.successors[node]))
+            for node in self.nodes
+        )
+        return heapq.nlargest(n, coupling, key=lambda x: x[1])
+    
+    def to_networkx(self) -> "nx.DiGraph":
+        """转换为NetworkX图（仅可视化和导出时使用）"""
+        import networkx as nx
         
-        sorted_coupling = sorted(coupling.items(), key=lambda x: x[1], reverse=True)
-        return sorted_coupling[:n]
+        graph = nx.DiGraph()
+        for name, attrs in self.nodes.items():
+            graph.add_node(name, **attrs)
+        for caller, callees in self.successors.items():
+            for callee in callees:
+                graph.add_edge(caller, callee)
+        return graph
     
     def visualize(self, output_path: str = "call_graph.png"):
         """可视化调用图"""
-        import matplotlib.pyplot as plt
+        import networkx as nx
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
         
-        plt.figure(figsize=(12, 8))
+        graph = self.to_networkx()
+        # 直接使用Figure和Agg画布，不经过pyplot的全局图形管理
+        fig = Figure(figsize=(12, 8))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
         
         # 使用层次布局
-        pos = nx.spring_layout(self.graph, k=2, iterations=50)
+        pos = nx.spring_layout(graph, k=2, iterations=50)
         
         # 根据节点类型设置颜色
         node_colors = []
-        for node in self.graph.nodes():
-            node_type = self.graph.nodes[node].get('type', 'function')
+        for node in graph.nodes():
+            node_type = graph.nodes[node].get('type', 'function')
             if node_type == 'function':
                 node_colors.append('lightblue')
             elif node_type == 'class':
@@ -169,7 +260,7 @@ class CallGraphAnalyzer:
                 node_colors.append('gray')
         
         nx.draw(
-            self.graph,
+            graph,
             pos,
             with_labels=True,
             node_color=node_colors,
@@ -177,16 +268,50 @@ class CallGraphAnalyzer:
             font_size=10,
             font_weight='bold',
             edge_color='gray',
-            alpha=0.8
+            alpha=0.8,
+            ax=ax
         )
         
-        plt.title("函数调用图", fontsize=16)
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        ax.set_title("函数调用图", fontsize=16)
+        fig.savefig(output_path, dpi=300, bbox_inches='tight',
+                    pil_kwargs={'compress_level': 3})
         
         return output_path
     
     def export_to_dot(self, output_path: str = "call_graph.dot"):
         """导出为DOT格式"""
-        nx.drawing.nx_pydot.write_dot(self.graph, output_path)
-        return output_path
\ No newline at end of file
+        import networkx as nx
+        
+        nx.drawing.nx_pydot.write_dot(self.to_networkx(), output_path)
+        return output_path
+
+
+class _EnclosingVisitor(ast.NodeVisitor):
+    """记录每个调用所在函数的访问器（类方法记为 类名.方法名）"""
+    
+    def __init__(self, analyzer: CallGraphAnalyzer):
+        self.analyzer = analyzer
+        self.class_stack: List[str] = []
+        self.func_stack: List[str] = []
+    
+    def visit_ClassDef(self, node: ast.ClassDef):
+        self.class_stack.append(node.name)
+        self.generic_visit(node)
+        self.class_stack.pop()
+    
+    def visit_FunctionDef(self, node: ast.FunctionDef):
+        if self.class_stack:
+            self.func_stack.append(sys.intern(f"{self.class_stack[-1]}.{node.name}"))
+        else:
+            self.func_stack.append(node.name)
+        self.generic_visit(node)
+        self.func_stack.pop()
+    
+    def visit_Call(self, node: ast.Call):
+        caller = self.func_stack[-1] if self.func_stack else None
+        callee = self.analyzer._extract_callee_name(node)
+        
+        if caller and callee:
+            self.analyzer.function_calls[caller].add(callee)
+        
+        self.generic_visit(node)
@@ -3,11 +3,18 @@
 """
 
 import ast
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
+import logging
+from collections import Counter, defaultdict
+from functools import partial
+from typing import Callable, List, Dict, Any, FrozenSet, Optional, Tuple
 
 from pyanalyzer.core.ast_parser import ASTParser
-from pyanalyzer.patterns.base_patterns import PATTERNS, Defect, Severity
+from pyanalyzer.patterns.base_patterns import PATTERNS, Defect, Severity, source_may_match
+
+logger = logging.getLogger(__name__)
+
+# 配置中的严重级别名称 -> Severity
+_SEVERITY_BY_NAME = {severity.value: severity for severity in Severity}
 
 
 class DefectDetector:
@@ -18,15 +25,82 @@ class DefectDetector:
         self.config = config
         self.enabled_patterns = config.get("patterns", {}).get("enabled", [])
         self.thresholds = config.get("patterns", {}).get("thresholds", {})
+        # 最近一次检测结果：(缓存键, 缺陷列表)
+        self._last_result: Optional[Tuple[Tuple, List[Defect]]] = None
+        self._build_dispatch()
+    
+    def _build_dispatch(self):
+        """按节点类型预先建立检测器分派表，并绑定文件路径、解析器和阈值"""
+        # 建表时的启用模式，enabled_patterns之后被修改时据此重建
+        self._dispatch_patterns: Tuple[str, ...] = tuple(self.enabled_patterns)
+        # 节点类型 -> [(模式名, 检测器)]（按启用顺序）
+        self._dispatch: Dict[type, List[Tuple[str, Callable]]] = defaultdict(list)
+        # 未声明node_types的检测器需要检查每个节点
+        self._generic_detectors: List[Tuple[str, Callable]] = []
+        # 模式名 -> 被调用名称集合，这些检测器只在名称匹配的调用节点上运行
+        self._call_filters: Dict[str, FrozenSet[str]] = {}
+        
+        for pattern_name in self.enabled_patterns:
+            if pattern_name not in PATTERNS:
+                continue
+            pattern = PATTERNS[pattern_name]
+            # 源码中没有出现必要关键词的模式直接跳过
+            if not source_may_match(pattern.get("source_filter"), self.parser.source_code):
+                continue
+            
+            # 传递阈值参数给需要它的检测器
+            if pattern_name == "long_function":
+                threshold = self.thresholds.get("function_length", 50)
+                detector = partial(pattern["detector"], file_path=self.parser.file_path,
+                                   parser=self.parser, threshold=threshold)
+            elif pattern_name == "high_complexity":
+                threshold = self.thresholds.get("cyclomatic_complexity", 10)
+                detector = partial(pattern["detector"], file_path=self.parser.file_path,
+                                   parser=self.parser, threshold=threshold)
+            else:
+                detector = partial(pattern["detector"], file_path=self.parser.file_path,
+                                   parser=self.parser)
+            
+            if pattern.get("call_names") is not None:
+                self._call_filters[pattern_name] = pattern["call_names"]
+            
+            node_types = pattern.get("node_types")
+            if node_types is None:
+                self._generic_detectors.append((pattern_name, detector))
+            else:
+                for node_type in node_types:
+                    self._dispatch[node_type].append((pattern_name, detector))
+        
+        self._dispatch = dict(self._dispatch)
         
     def detect_all(self) -> List[Defect]:
-        """检测所有缺陷"""
+        """检测所有缺陷（同一AST和配置下重复调用直接返回上次结果）"""
+        # 与基线一样在每次检测时读取enabled_patterns，构造后修改的列表同样生效
+        if tuple(self.enabled_patterns) != self._dispatch_patterns:
+            self._build_dispatch()
+        severity_filter = self.config.get("reporting", {}).get("severity_filter", "medium").lower()
+        # 缓存键使用分派表实际对应的模式元组（保留启用顺序，缺陷顺序随之变化）
+        cache_key = (id(self.parser.ast_tree), self._dispatch_patterns, severity_filter)
+        if self._last_result is not None and self._last_result[0] == cache_key:
+            return list(self._last_result[1])
+        
+        defects = self._run_detection(_SEVERITY_BY_NAME[severity_filter])
+        self._last_result = (cache_key, defects)
+        return list(defects)
+    
+    def _run_detection(self, min_severity: Severity) -> List[Defect]:
+        """执行检测（节点检测只遍历一次AST，未使用变量/导入复用解析时收集的名称）"""
         all_defects = []
         
-        # 遍历AST树
-        for node in ast.walk(self.parser.ast_tree):
-            defects = self._detect_node_defects(node)
-            all_defects.extend(defects)
+        # 只访问有检测器关心的节点类型，节点分组由解析器缓存并与模式匹配引擎共享
+        nodes_by_type = self.parser.nodes_by_type
+        for node_type, detectors in self._dispatch.items():
+            nodes = nodes_by_type.get(node_type)
+            if nodes:
+                self._detect_node_defects(nodes, detectors, all_defects)
+        if self._generic_detectors:
+            all_nodes = [node for nodes in nodes_by_type.values() for node in nodes]
+            self._detect_node_defects(all_nodes, self._generic_detectors, all_defects)
         
         # 特殊检测：未使用变量
         if "unused_variable" in self.enabled_patterns:
@@ -38,123 +112,73 @@ class DefectDetector:
             import_defects = self._detect_unused_imports()
             all_defects.extend(import_defects)
         
-        # 过滤严重级别
-        min_severity = Severity[self.config.get("reporting", {}).get("severity_filter", "medium").upper()]
+        # 过滤严重级别（直接比较整数rank）
+        min_rank = min_severity.rank
         filtered_defects = [
             defect for defect in all_defects 
-            if self._get_severity_value(defect.severity) >= self._get_severity_value(min_severity)
+            if defect.severity.rank >= min_rank
         ]
         
         return filtered_defects
     
-    def _detect_node_defects(self, node: ast.AST) -> List[Defect]:
-        """检测单个节点的缺陷"""
-        defects = []
-        
-        for pattern_name in self.enabled_patterns:
-            if pattern_name in PATTERNS:
-                pattern = PATTERNS[pattern_name]
-                detector = pattern["detector"]
-                
+    def _detect_node_defects(self, nodes: List[ast.AST], detectors: List[Tuple[str, Callable]],
+                             defects: List[Defect]):
+        """在一组节点上运行检测器（分派表保证检测器只收到其声明的节点类型）"""
+        call_filters = self._call_filters
+        for pattern_name, detector in detectors:
+            call_names = call_filters.get(pattern_name)
+            if call_names is not None:
+                # 按被调用名称预先筛选调用节点，检测器只在可能命中的调用上运行
+                targets = [node for node, name in self.parser.named_calls if name in call_names]
+            else:
+                targets = nodes
+            for node in targets:
                 try:
-                    # 传递阈值参数给需要它的检测器
-                    if pattern_name in ["long_function", "high_complexity"]:
-                        threshold = self.thresholds.get(
-                            "function_length" if pattern_name == "long_function" else "cyclomatic_complexity",
-                            50 if pattern_name == "long_function" else 10
-                        )
-                        result = detector(node, self.parser.file_path, self.parser, threshold)
-                    else:
-                        result = detector(node, self.parser.file_path, self.parser)
-                    
-                    if result:
-                        defects.extend(result)
-                except Exception as e:
-                    # 跳过检测器错误
+                    result = detector(node)
+                except Exception:
+                    # 跳过检测器出错的节点，记录后继续检测后续节点
+                    logger.debug("检测器 %s 在第%s行出错", pattern_name,
+                                 getattr(node, "lineno", "?"), exc_info=True)
                     continue
-        
-        return defects
+                if result:
+                    defects.extend(result)
     
     def _detect_unused_variables(self) -> List[Defect]:
         """检测未使用的变量"""
-        defects = []
-        unused_vars = self.parser.find_unused_variables()
-        
-        for var_info in unused_vars:
-            for line in var_info["lines"]:
-                defects.append(Defect(
-                    pattern="unused_variable",
-                    description=f"变量 '{var_info['variable']}' 定义了但未使用",
-                    severity=Severity.LOW,
-                    line=line,
-                    file_path=self.parser.file_path,
-                    context=var_info["variable"],
-                    suggestion="删除未使用的变量或添加使用它的代码"
-                ))
-        
-        return defects
+        file_path = self.parser.file_path
+        return [
+            Defect("unused_variable", f"变量 '{var_info['variable']}' 定义了但未使用", Severity.LOW,
+                   line, file_path, var_info["variable"], "删除未使用的变量或添加使用它的代码")
+            for var_info in self.parser.find_unused_variables()
+            for line in var_info["lines"]
+        ]
     
     def _detect_unused_imports(self) -> List[Defect]:
         """检测未使用的导入"""
         defects = []
         
-        # 获取所有使用的名称
-        used_names = set()
-        for node in ast.walk(self.parser.ast_tree):
-            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
-                used_names.add(node.id)
+        # 使用的名称已在解析器的提取遍历中收集，无需再次遍历AST
+        used_names = self.parser.loaded_names
+        file_path = self.parser.file_path
         
-        # 检查导入是否被使用
+        # 按导入实际绑定的名称（已在解析时处理别名和点号）批量求出未使用的名称
         for import_info in self.parser.imports:
-            if import_info["type"] == "import":
-                for name in import_info["names"]:
-                    # 检查导入的模块是否被使用
-                    if name not in used_names:
-                        # 检查是否有别名
-                        actual_name = name.split(" as ")[0] if " as " in name else name
-                        if actual_name not in used_names:
-                            defects.append(Defect(
-                                pattern="unused_import",
-                                description=f"未使用的导入: {name}",
-                                severity=Severity.LOW,
-                                line=import_info["lineno"],
-                                file_path=self.parser.file_path,
-                                context=name,
-                                suggestion="删除未使用的导入"
-                            ))
-            elif import_info["type"] == "import_from":
-                for name in import_info["names"]:
-                    # 检查导入的名称是否被使用
-                    if name not in used_names:
-                        defects.append(Defect(
-                            pattern="unused_import",
-                            description=f"未使用的导入: {name}",
-                            severity=Severity.LOW,
-                            line=import_info["lineno"],
-                            file_path=self.parser.file_path,
-                            context=name,
-                            suggestion="删除未使用的导入"
-                        ))
+            effective_names = import_info["effective_names"]
+            unused = set(effective_names) - used_names
+            unused.discard(None)
+            if not unused:
+                continue
+            
+            lineno = import_info["lineno"]
+            defects.extend([
+                Defect("unused_import", f"未使用的导入: {name}", Severity.LOW,
+                       lineno, file_path, name, "删除未使用的导入")
+                for name, effective_name in zip(import_info["names"], effective_names)
+                if effective_name in unused
+            ])
         
         return defects
     
-    def _get_severity_value(self, severity: Severity) -> int:
-        """将严重程度转换为数值"""
-        severity_values = {
-            Severity.LOW: 1,
-            Severity.MEDIUM: 2,
-            Severity.HIGH: 3,
-            Severity.CRITICAL: 4
-        }
-        return severity_values.get(severity, 0)
-    
     def get_pattern_statistics(self) -> Dict[str, int]:
-        """获取缺陷模式统计"""
-        defects = self.detect_all()
-        stats = {}
-        
-        for defect in defects:
-            pattern = defect.pattern
-            stats[pattern] = stats.get(pattern, 0) + 1
-        
-        return stats
\ No newline at end of file
+        """获取缺陷模式统计（复用detect_all的缓存结果）"""
+        return dict(Counter(defect.pattern for defect in self.detect_all()))
\ No newline at end of file
@@ -4,16 +4,110 @@
 """
 
 import ast
+import logging
 import re
-from typing import List, Dict, Any, Optional, Tuple, Set
+import sys
+from typing import List, Dict, Any, FrozenSet, Optional, Tuple, Set
 from dataclasses import dataclass
-from collections import defaultdict
+from collections import Counter, defaultdict
 
-from pyanalyzer.patterns.base_patterns import Defect, Severity, PATTERNS
+from pyanalyzer.patterns.base_patterns import Defect, Severity, PATTERNS, source_may_match
 from pyanalyzer.patterns.security_patterns import SECURITY_PATTERNS
 from pyanalyzer.patterns.performance_patterns import PERFORMANCE_PATTERNS
 
 
+logger = logging.getLogger(__name__)
+
+# 各模式的修复建议（模块级常量，避免每次调用重新构造）
+_SUGGESTIONS: Dict[str, Tuple[str, ...]] = {
+    'null_dereference': (
+        "添加空值检查：if obj is not None:",
+        "使用安全导航操作符（Python 3.8+）：obj?.attribute",
+        "提供默认值：obj.attr if obj else default_value",
+    ),
+    'resource_leak': (
+        "使用with语句自动管理资源：with open('file.txt') as f:",
+        "确保在finally块中关闭资源",
+        "使用上下文管理器包装资源",
+    ),
+    'sql_injection': (
+        "使用参数化查询：cursor.execute('SELECT * FROM users WHERE name = ?', (name,))",
+        "使用ORM框架（如SQLAlchemy）",
+        "对用户输入进行严格的验证和转义",
+    ),
+    'hardcoded_password': (
+        "将密码移到环境变量中：os.getenv('PASSWORD')",
+        "使用配置文件（如JSON、YAML）",
+        "使用密钥管理服务（如AWS Secrets Manager）",
+    ),
+    'division_by_zero': (
+        "添加除数检查：if divisor != 0:",
+        "使用try-except捕获ZeroDivisionError",
+        "提供默认值或合理的错误处理",
+    ),
+    'long_function': (
+        "将函数拆分为多个更小的函数",
+        "提取重复代码为辅助函数",
+        "考虑使用类来组织相关功能",
+    ),
+    'high_complexity': (
+        "减少条件分支的数量",
+        "使用策略模式替换复杂的条件逻辑",
+        "将复杂逻辑提取到单独的函数中",
+    ),
+}
+
+_DEFAULT_SUGGESTIONS = ("重构代码以提高可读性和可维护性",)
+
+
+def _build_pattern_tables():
+    """合并所有模式，并按节点类型建立检测器分派表"""
+    all_patterns = {}
+    pattern_meta: Dict[str, Tuple[str, Optional[Severity], str]] = {}
+    dispatch_by_type: Dict[type, List[Tuple[str, Any, bool]]] = defaultdict(list)
+    generic_patterns: List[Tuple[str, Any, bool]] = []
+    source_filters: Dict[str, Any] = {}
+    call_names: Dict[str, FrozenSet[str]] = {}
+    
+    for category, patterns in (('basic', PATTERNS),
+                               ('security', SECURITY_PATTERNS),
+                               ('performance', PERFORMANCE_PATTERNS)):
+        all_patterns.update(patterns)
+        for pattern_name, pattern in patterns.items():
+            pattern_name = sys.intern(pattern_name)
+            # 基础模式是字典（检测器接收parser），安全/性能模式是数据类（检测器只接收节点和路径）
+            if isinstance(pattern, dict):
+                severity = pattern.get('severity')
+                description = pattern.get('description', '')
+                entry = (pattern_name, pattern['detector'], True)
+                node_types = pattern.get('node_types')
+                if pattern.get('source_filter') is not None:
+                    source_filters[pattern_name] = pattern['source_filter']
+                if pattern.get('call_names') is not None:
+                    call_names[pattern_name] = pattern['call_names']
+            else:
+                severity = pattern.severity
+                description = pattern.description
+                entry = (pattern_name, pattern.detector, False)
+                node_types = pattern.node_types
+                if pattern.call_names is not None:
+                    call_names[pattern_name] = pattern.call_names
+            pattern_meta[pattern_name] = (category, severity, description)
+            
+            if node_types is None:
+                generic_patterns.append(entry)
+            else:
+                for node_type in node_types:
+                    dispatch_by_type[node_type].append(entry)
+    
+    return (all_patterns, pattern_meta, dict(dispatch_by_type), generic_patterns,
+            source_filters, call_names)
+
+
+(_ALL_PATTERNS, _PATTERN_META, _DISPATCH_BY_TYPE, _GENERIC_PATTERNS,
+ _SOURCE_FILTERS, _CALL_NAMES) = _build_pattern_tables()
+
+
 @dataclass
 class PatternMatch:
     """模式匹配结果"""
@@ -28,74 +122,102 @@ class PatternMatcher:
     
     def __init__(self, config: Dict[str, Any]):
         self.config = config
-        self.patterns = {}
         self._load_patterns()
         
     def _load_patterns(self):
-        """加载所有模式"""
-        # 合并所有模式
-        self.patterns.update(PATTERNS)
-        self.patterns.update(SECURITY_PATTERNS)
-        self.patterns.update(PERFORMANCE_PATTERNS)
+        """加载所有模式（分派表在模块导入时建立一次，所有实例共享）"""
+        self.patterns = dict(_ALL_PATTERNS)
+        # 模式名 -> (分类, 严重程度, 描述)
+        self._pattern_meta = _PATTERN_META
+        # 节点类型 -> [(模式名, 检测器, 是否需要parser参数)]
+        self._dispatch_by_type = _DISPATCH_BY_TYPE
+        # 未声明node_types的模式需要检查所有节点
+        self._generic_patterns = _GENERIC_PATTERNS
         
     def match_all(self, parser, enabled_patterns: List[str] = None) -> List[PatternMatch]:
-        """匹配所有模式"""
+        """匹配所有模式（只在检测器声明关心的节点类型上调用检测器）"""
         matches = []
+        enabled = None if enabled_patterns is None else set(enabled_patterns)
+        
+        # 源码预筛选：必要关键词未出现的模式不在本文件上运行
+        skipped = {
+            pattern_name for pattern_name, source_filter in _SOURCE_FILTERS.items()
+            if not source_may_match(source_filter, parser.source_code)
+        }
         
-        if enabled_patterns is None:
-            enabled_patterns = list(self.patterns.keys())
+        # 复用解析器缓存的节点分组，与缺陷检测器共享同一次遍历
+        nodes_by_type = parser.nodes_by_type
+        groups = [
+            (nodes_by_type[node_type], entries)
+            for node_type, entries in self._dispatch_by_type.items()
+            if node_type in nodes_by_type
+        ]
+        if self._generic_patterns:
+            all_nodes = [node for nodes in nodes_by_type.values() for node in nodes]
+            groups.append((all_nodes, self._generic_patterns))
         
-        # 遍历AST树
-        for node in ast.walk(parser.ast_tree):
-            for pattern_name in enabled_patterns:
-                if pattern_name not in self.patterns:
+        for nodes, entries in groups:
+            for pattern_name, detector, takes_parser in entries:
+                if enabled is not None and pattern_name not in enabled:
                     continue
-                    
-                pattern = self.patterns[pattern_name]
-                
-                try:
-                    # 调用检测器
-                    detector = pattern['detector']
-                    result = detector(node, parser.file_path, parser)
-                    
-                    if result:
-                        matches.append(PatternMatch(
-                            pattern_name=pattern_name,
-                            node=node,
-                            context={
-                                'severity': pattern['severity'],
-                                'description': pattern['description'],
-                                'detector_result': result
-                            }
-                        ))
-                        
-                except Exception as e:
-                    # 跳过有错误的检测器
+                if pattern_name in skipped:
                     continue
+                call_names = _CALL_NAMES.get(pattern_name)
+                if call_names is not None:
+                    # 按被调用名称预先筛选调用节点，检测器只在可能命中的调用上运行
+                    targets = [node for node, name in parser.named_calls if name in call_names]
+                else:
+                    targets = nodes
+                self._match_pattern(parser, targets, pattern_name, detector, takes_parser, matches)
         
         return matches
     
+    def _match_pattern(self, parser, nodes: List[ast.AST], pattern_name: str,
+                       detector, takes_parser: bool, matches: List[PatternMatch]):
+        """在一组节点上运行单个模式的检测器"""
+        _, severity, description = self._pattern_meta[pattern_name]
+        file_path = parser.file_path
+        
+        for node in nodes:
+            try:
+                if takes_parser:
+                    result = detector(node, file_path, parser)
+                else:
+                    result = detector(node, file_path)
+            except Exception:
+                # 跳过检测器出错的节点，记录后继续匹配后续节点
+                logger.debug("模式 %s 在第%s行出错", pattern_name,
+                             getattr(node, "lineno", "?"), exc_info=True)
+                continue
+            
+            if result:
+                matches.append(PatternMatch(
+                    pattern_name=pattern_name,
+                    node=node,
+                    context={
+                        'severity': severity,
+                        'description': description,
+                        'detector_result': result
+                    }
+                ))
+    
     def get_pattern_info(self, pattern_name: str) -> Optional[Dict[str, Any]]:
         """获取模式信息"""
-        if pattern_name in self.patterns:
-            pattern = self.patterns[pattern_name]
+        meta = self._pattern_meta.get(pattern_name)
+        if meta is not None:
+            category, severity, description = meta
             return {
                 'name': pattern_name,
-                'description': pattern.get('description', ''),
-                'severity': pattern.get('severity'),
-                'category': self._get_pattern_category(pattern_name)
+                'description': description,
+                'severity': severity,
+                'category': category
             }
         return None
     
     def _get_pattern_category(self, pattern_name: str) -> str:
         """获取模式分类"""
-        if pattern_name in PATTERNS:
-            return 'basic'
-        elif pattern_name in SECURITY_PATTERNS:
-            return 'security'
-        elif pattern_name in PERFORMANCE_PATTERNS:
-            return 'performance'
-        return 'other'
+        meta = self._pattern_meta.get(pattern_name)
+        return meta[0] if meta is not None else 'other'
     
     def categorize_matches(self, matches: List[PatternMatch]) -> Dict[str, List[PatternMatch]]:
         """按类别分类匹配结果"""
@@ -111,121 +233,38 @@ class PatternMatcher:
                           min_severity: Severity = Severity.LOW) -> List[PatternMatch]:
         """按严重程度过滤匹配"""
         filtered = []
+        pattern_meta = self._pattern_meta
+        min_rank = min_severity.rank
         
         for match in matches:
-            pattern_info = self.get_pattern_info(match.pattern_name)
-            if pattern_info and pattern_info['severity']:
-                if self._get_severity_value(pattern_info['severity']) >= self._get_severity_value(min_severity):
+            meta = pattern_meta.get(match.pattern_name)
+            if meta is not None and meta[1]:
+                if meta[1].rank >= min_rank:
                     filtered.append(match)
         
         return filtered
     
-    def _get_severity_value(self, severity: Severity) -> int:
-        """获取严重程度数值"""
-        severity_map = {
-            Severity.LOW: 1,
-            Severity.MEDIUM: 2,
-            Severity.HIGH: 3,
-            Severity.CRITICAL: 4
-        }
-        return severity_map.get(severity, 0)
-    
     def generate_pattern_summary(self, matches: List[PatternMatch]) -> Dict[str, Any]:
         """生成模式统计摘要"""
-        summary = {
-            'total_matches': len(matches),
-            'by_category': defaultdict(int),
-            'by_severity': defaultdict(int),
-            'by_pattern': defaultdict(int),
-            'files_affected': set(),
-            'lines_affected': set()
-        }
+        pattern_meta = self._pattern_meta
+        metas = [pattern_meta.get(match.pattern_name, ('other', None, '')) for match in matches]
         
-        for match in matches:
-            pattern_info = self.get_pattern_info(match.pattern_name)
-            
+        return {
+            'total_matches': len(matches),
             # 按类别统计
-            category = self._get_pattern_category(match.pattern_name)
-            summary['by_category'][category] += 1
-            
+            'by_category': Counter(category for category, _, _ in metas),
             # 按严重程度统计
-            if pattern_info and pattern_info['severity']:
-                severity = pattern_info['severity'].value
-                summary['by_severity'][severity] += 1
-            
+            'by_severity': Counter(severity.value for _, severity, _ in metas if severity),
             # 按模式统计
-            summary['by_pattern'][match.pattern_name] += 1
-            
+            'by_pattern': Counter(match.pattern_name for match in matches),
+            'files_affected': set(),
             # 记录受影响的行
-            if hasattr(match.node, 'lineno'):
-                summary['lines_affected'].add(match.node.lineno)
-        
-        # 转换为常规字典
-        summary['by_category'] = dict(summary['by_category'])
-        summary['by_severity'] = dict(summary['by_severity'])
-        summary['by_pattern'] = dict(summary['by_pattern'])
-        
-        return summary
+            'lines_affected': {match.node.lineno for match in matches if hasattr(match.node, 'lineno')}
+        }
     
     def suggest_fixes(self, match: PatternMatch) -> List[str]:
         """为匹配的模式提供修复建议"""
-        pattern_name = match.pattern_name
-        suggestions = []
-        
-        # 根据模式提供具体的修复建议
-        if pattern_name == 'null_dereference':
-            suggestions = [
-                "添加空值检查：if obj is not None:",
-                "使用安全导航操作符（Python 3.8+）：obj?.attribute",
-                "提供默认值：obj.attr if obj else default_value"
-            ]
-        
-        elif pattern_name == 'resource_leak':
-            suggestions = [
-                "使用with语句自动管理资源：with open('file.txt') as f:",
-                "确保在finally块中关闭资源",
-                "使用上下文管理器包装资源"
-            ]
-        
-        elif pattern_name == 'sql_injection':
-            suggestions = [
-                "使用参数化查询：cursor.execute('SELECT * FROM users WHERE name = ?', (name,))",
-                "使用ORM框架（如SQLAlchemy）",
-                "对用户输入进行严格的验证和转义"
-            ]
-        
-        elif pattern_name == 'hardcoded_password':
-            suggestions = [
-                "将密码移到环境变量中：os.getenv('PASSWORD')",
-                "使用配置文件（如JSON、YAML）",
-                "使用密钥管理服务（如AWS Secrets Manager）"
-            ]
-        
-        elif pattern_name == 'division_by_zero':
-            suggestions = [
-                "添加除数检查：if divisor != 0:",
-                "使用try-except捕获ZeroDivisionError",
-                "提供默认值或合理的错误处理"
-            ]
-        
-        elif pattern_name == 'long_function':
-            suggestions = [
-                "将函数拆分为多个更小的函数",
-                "提取重复代码为辅助函数",
-                "考虑使用类来组织相关功能"
-            ]
-        
-        elif pattern_name == 'high_complexity':
-            suggestions = [
-                "减少条件分支的数量",
-                "使用策略模式替换复杂的条件逻辑",
-                "将复杂逻辑提取到单独的函数中"
-            ]
-        
-        else:
-            suggestions = ["重构代码以提高可读性和可维护性"]
-        
-        return suggestions
+        return list(_SUGGESTIONS.get(match.pattern_name, _DEFAULT_SUGGESTIONS))
     
     def validate_pattern_config(self, enabled_patterns: List[str]) -> Tuple[List[str], List[str]]:
         """验证模式配置"""
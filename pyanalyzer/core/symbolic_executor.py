@@ -3,6 +3,7 @@
 """
 
 import ast
+import operator
 import z3
 from typing import Dict, List, Any, Optional, Set, Tuple
 from dataclasses import dataclass
@@ -12,6 +13,32 @@ from pyanalyzer.core.ast_parser import ASTParser
 from pyanalyzer.patterns.base_patterns import Defect, Severity
 
 
+# 二元运算符 -> 运算函数（Python数值与Z3表达式通用）
+_BINOP_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+# 比较运算符 -> 比较函数
+_COMPARE_OPERATORS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+
+def _expr_key(expr) -> Any:
+    """Z3表达式按内部ID作为缓存键（结构相同的表达式ID相同），Python常量按值"""
+    if isinstance(expr, z3.AstRef):
+        return expr.get_id()
+    return ("const", expr)
+
+
 @dataclass
 class SymbolicVariable:
     """符号变量"""
@@ -28,8 +55,13 @@ class SymbolicExecutor:
         self.max_depth = max_depth
         self.solver = Solver()
         self.variables: Dict[str, SymbolicVariable] = {}
-        self.path_constraints = []
+        # 路径约束只保存在求解器的断言栈中；_path_state标识当前约束集合
+        self._path_state = 0
+        self._state_counter = 0
+        self._state_stack: List[int] = []
         self.defects: List[Defect] = []
+        # (路径状态, 除数ID) -> 求解结果；值中保留除数引用，避免Z3对象ID被复用
+        self._div_check_cache: Dict[Tuple, Tuple[Any, Any]] = {}
         
     def analyze(self) -> List[Defect]:
         """执行符号分析"""
@@ -44,6 +76,9 @@ class SymbolicExecutor:
     
     def _analyze_function(self, func_info):
         """分析单个函数"""
+        # 函数内的约束都在独立作用域中，分析结束后弹出即可恢复求解器
+        self.solver.push()
+        
         # 为函数参数创建符号变量
         for arg_name in func_info.args:
             self._create_symbolic_variable(arg_name, 'int')  # 简化：假设所有参数都是整数
@@ -55,9 +90,11 @@ class SymbolicExecutor:
         self._check_path_constraints()
         
         # 重置状态
+        self.solver.pop(self.solver.num_scopes())
         self.variables.clear()
-        self.path_constraints.clear()
-        self.solver.reset()
+        self._path_state = 0
+        self._state_stack.clear()
+        self._div_check_cache.clear()
     
     def _create_symbolic_variable(self, name: str, var_type: str) -> SymbolicVariable:
         """创建符号变量"""
@@ -90,34 +127,51 @@ class SymbolicExecutor:
         elif isinstance(node, ast.Compare):
             self._analyze_comparison(node)
     
+    def _add_constraint(self, constraint):
+        """添加路径约束（直接加入求解器）"""
+        self.solver.add(constraint)
+        self._state_counter += 1
+        self._path_state = self._state_counter
+    
+    def _enter_branch(self, condition):
+        """进入分支：求解器开新作用域并加入分支条件"""
+        self.solver.push()
+        self._state_stack.append(self._path_state)
+        self._add_constraint(condition)
+    
+    def _exit_branch(self):
+        """离开分支：丢弃分支内加入的所有约束"""
+        self.solver.pop()
+        self._path_state = self._state_stack.pop()
+    
     def _analyze_if_statement(self, node: ast.If, depth: int):
         """分析if语句"""
         # 解析条件
         condition = self._parse_expression(node.test)
-        if condition:
+        if condition is not None:
             # then分支
-            self.path_constraints.append(condition)
+            self._enter_branch(condition)
             for stmt in node.body:
                 self._traverse_ast(stmt, depth + 1)
-            self.path_constraints.pop()
+            self._exit_branch()
             
             # else分支（如果有）
             if node.orelse:
-                self.path_constraints.append(Not(condition))
+                self._enter_branch(Not(condition))
                 for stmt in node.orelse:
                     self._traverse_ast(stmt, depth + 1)
-                self.path_constraints.pop()
+                self._exit_branch()
     
     def _analyze_while_loop(self, node: ast.While, depth: int):
         """分析while循环"""
         # 解析循环条件
         condition = self._parse_expression(node.test)
-        if condition:
+        if condition is not None:
             # 循环体（最多执行一次以避免无限展开）
-            self.path_constraints.append(condition)
+            self._enter_branch(condition)
             for stmt in node.body[:3]:  # 只分析前几条语句
                 self._traverse_ast(stmt, depth + 1)
-            self.path_constraints.pop()
+            self._exit_branch()
     
     def _analyze_assignment(self, node: ast.Assign):
         """分析赋值语句"""
@@ -126,10 +180,10 @@ class SymbolicExecutor:
                 var_name = target.id
                 value = self._parse_expression(node.value)
                 
-                if value and var_name in self.variables:
+                if value is not None and var_name in self.variables:
                     # 添加约束：变量等于值
                     constraint = (self.variables[var_name].z3_var == value)
-                    self.path_constraints.append(constraint)
+                    self._add_constraint(constraint)
     
     def _analyze_binary_operation(self, node: ast.BinOp):
         """分析二元运算"""
@@ -140,57 +194,30 @@ class SymbolicExecutor:
             return None
         
         op_type = type(node.op)
-        
-        if op_type == ast.Add:
-            return left + right
-        elif op_type == ast.Sub:
-            return left - right
-        elif op_type == ast.Mult:
-            return left * right
-        elif op_type == ast.Div:
+        if op_type is ast.Div:
             # 检查除以零
             self._check_division_by_zero(right, node.lineno)
-            return left / right
-        elif op_type == ast.Eq:
-            return left == right
-        elif op_type == ast.NotEq:
-            return left != right
-        elif op_type == ast.Lt:
-            return left < right
-        elif op_type == ast.LtE:
-            return left <= right
-        elif op_type == ast.Gt:
-            return left > right
-        elif op_type == ast.GtE:
-            return left >= right
-        elif op_type == ast.And:
-            return And(left, right)
-        elif op_type == ast.Or:
-            return Or(left, right)
         
-        return None
+        op = _BINOP_OPERATORS.get(op_type)
+        return op(left, right) if op is not None else None
     
     def _parse_expression(self, node: ast.AST):
-        """解析表达式为Z3表达式"""
-        if isinstance(node, ast.Num):
-            return node.n
-        elif isinstance(node, ast.Constant):
-            if isinstance(node.value, (int, float)):
-                return node.value
-        elif isinstance(node, ast.Name):
-            if node.id in self.variables:
-                return self.variables[node.id].z3_var
-        elif isinstance(node, ast.BinOp):
-            return self._analyze_binary_operation(node)
-        elif isinstance(node, ast.Compare):
-            return self._analyze_comparison(node)
-        elif isinstance(node, ast.BoolOp):
-            return self._analyze_boolean_operation(node)
-        elif isinstance(node, ast.UnaryOp):
-            return self._analyze_unary_operation(node)
-        
+        """解析表达式为Z3表达式（按节点类型查表分派）"""
+        handler = self._EXPR_HANDLERS.get(type(node))
+        return handler(self, node) if handler is not None else None
+    
+    def _parse_constant(self, node: ast.Constant):
+        """解析数值常量"""
+        # bool是int的子类，与原先的isinstance判断保持一致
+        if isinstance(node.value, (int, float)):
+            return node.value
         return None
     
+    def _parse_name(self, node: ast.Name):
+        """解析变量名"""
+        var = self.variables.get(node.id)
+        return var.z3_var if var is not None else None
+    
     def _analyze_comparison(self, node: ast.Compare):
         """分析比较运算"""
         if len(node.ops) != 1 or len(node.comparators) != 1:
@@ -202,22 +229,8 @@ class SymbolicExecutor:
         if left is None or right is None:
             return None
         
-        op_type = type(node.ops[0])
-        
-        if op_type == ast.Eq:
-            return left == right
-        elif op_type == ast.NotEq:
-            return left != right
-        elif op_type == ast.Lt:
-            return left < right
-        elif op_type == ast.LtE:
-            return left <= right
-        elif op_type == ast.Gt:
-            return left > right
-        elif op_type == ast.GtE:
-            return left >= right
-        
-        return None
+        op = _COMPARE_OPERATORS.get(type(node.ops[0]))
+        return op(left, right) if op is not None else None
     
     def _analyze_boolean_operation(self, node: ast.BoolOp):
         """分析布尔运算"""
@@ -253,20 +266,25 @@ class SymbolicExecutor:
         
         return None
     
+    # 表达式节点类型 -> 解析方法
+    _EXPR_HANDLERS = {
+        ast.Constant: _parse_constant,
+        ast.Name: _parse_name,
+        ast.BinOp: _analyze_binary_operation,
+        ast.Compare: _analyze_comparison,
+        ast.BoolOp: _analyze_boolean_operation,
+        ast.UnaryOp: _analyze_unary_operation,
+    }
+    
     def _check_division_by_zero(self, divisor, line: int):
-        """检查除以零"""
-        # 尝试证明除数不可能为零
-        self.solver.push()
-        
-        # 添加当前路径约束
-        for constraint in self.path_constraints:
-            self.solver.add(constraint)
-        
-        # 添加除数等于零的约束
-        self.solver.add(divisor == 0)
-        
-        # 检查是否可满足
-        result = self.solver.check()
+        """检查除以零（相同路径约束下的相同除数只求解一次）"""
+        cache_key = (self._path_state, _expr_key(divisor))
+        cached = self._div_check_cache.get(cache_key)
+        if cached is not None:
+            result = cached[0]
+        else:
+            result = self._solve_division_by_zero(divisor)
+            self._div_check_cache[cache_key] = (result, divisor)
         
         if result == sat:
             # 存在路径使得除数为零
@@ -278,15 +296,24 @@ class SymbolicExecutor:
                 file_path=self.parser.file_path,
                 suggestion="添加除数非零检查"
             ))
+    
+    def _solve_division_by_zero(self, divisor):
+        """求解当前路径约束下除数是否可能为零"""
+        # 尝试证明除数不可能为零（当前路径约束已在求解器中）
+        self.solver.push()
+        
+        # 添加除数等于零的约束
+        self.solver.add(divisor == 0)
+        
+        # 检查是否可满足
+        result = self.solver.check()
         
         self.solver.pop()
+        return result
     
     def _check_path_constraints(self):
         """检查路径约束"""
-        # 检查约束是否可满足
-        for constraint in self.path_constraints:
-            self.solver.add(constraint)
-        
+        # 检查约束是否可满足（约束已在遍历时增量加入求解器）
         result = self.solver.check()
         
         if result == unsat:
@@ -299,8 +326,6 @@ class SymbolicExecutor:
                 file_path=self.parser.file_path,
                 suggestion="检查逻辑条件是否矛盾"
             ))
-        
-        self.solver.reset()
     
     def find_test_inputs(self, func_name: str) -> Dict[str, Any]:
         """为函数生成测试输入"""
@@ -310,26 +335,32 @@ class SymbolicExecutor:
         if not func:
             return test_inputs
         
-        # 为每个路径生成输入
+        arg_vars = [
+            (var_name, var.z3_var) for var_name, var in self.variables.items()
+            if var_name in func.args
+        ]
+        
+        # 当前路径约束已在求解器中，每次求解后加入阻塞子句排除已得到的输入，得到不同的解
+        self.solver.push()
+        
         for i in range(3):  # 生成最多3组输入
-            self.solver.reset()
+            if self.solver.check() != sat:
+                break
             
-            # 添加路径约束
-            for constraint in self.path_constraints[:i+1]:
-                self.solver.add(constraint)
+            model = self.solver.model()
+            inputs = {}
+            blocking = []
+            for var_name, z3_var in arg_vars:
+                value = model[z3_var]
+                if value is not None:
+                    inputs[var_name] = value
+                    blocking.append(z3_var != value)
             
-            if self.solver.check() == sat:
-                model = self.solver.model()
-                inputs = {}
-                
-                for var_name, var in self.variables.items():
-                    if var_name in func.args:
-                        z3_var = var.z3_var
-                        if z3_var in model:
-                            value = model[z3_var]
-                            inputs[var_name] = value
-                
-                if inputs:
-                    test_inputs[f"path_{i+1}"] = inputs
+            if not inputs:
+                break
+            test_inputs[f"path_{i+1}"] = inputs
+            self.solver.add(Or(blocking))
+        
+        self.solver.pop()
         
-        return test_inputs
\ No newline at end of file
+        return test_inputs
@@ -6,20 +6,54 @@ import ast
 import re
 from typing import Dict, List, Any, Callable, Optional
 from enum import Enum
+import sys
 from dataclasses import dataclass
 
 
 class Severity(Enum):
-    """缺陷严重程度"""
+    """缺陷严重程度（按rank直接比较大小，value保持字符串用于报告输出）"""
     LOW = "low"
     MEDIUM = "medium"
     HIGH = "high"
     CRITICAL = "critical"
+    
+    # 成员是单例且按身份比较相等，直接用对象身份哈希（C实现），避免Enum按名称计算哈希
+    __hash__ = object.__hash__
+    
+    def __lt__(self, other):
+        if type(other) is Severity:
+            return self.rank < other.rank
+        return NotImplemented
+    
+    def __le__(self, other):
+        if type(other) is Severity:
+            return self.rank <= other.rank
+        return NotImplemented
+    
+    def __gt__(self, other):
+        if type(other) is Severity:
+            return self.rank > other.rank
+        return NotImplemented
+    
+    def __ge__(self, other):
+        if type(other) is Severity:
+            return self.rank >= other.rank
+        return NotImplemented
+
 
+# 严重程度数值：LOW=1 ... CRITICAL=4
+for _rank, _severity in enumerate(Severity, 1):
+    _severity.rank = _rank
+del _rank, _severity
 
-@dataclass
+
+# 大型项目中缺陷对象数量很多，Python 3.10+使用__slots__去掉实例__dict__
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class Defect:
-    """缺陷信息"""
+    """缺陷信息（不可变，可哈希，便于用集合去重）"""
     pattern: str
     description: str
     severity: Severity
@@ -27,6 +61,51 @@ class Defect:
     file_path: str
     context: Optional[str] = None
     suggestion: Optional[str] = None
+    
+    def __reduce__(self):
+        # 按位置参数序列化，进程间传递时不必携带字段名字典
+        return (_restore_defect, (self.pattern, self.description, self.severity, self.line,
+                                  self.file_path, self.context, self.suggestion))
+
+
+def _restore_defect(pattern: str, description: str, severity: Severity, line: int,
+                    file_path: str, context: Optional[str], suggestion: Optional[str]) -> Defect:
+    """反序列化缺陷
+    
+    工作进程传回的缺陷中，模式名、描述和建议多来自固定的词汇，驻留后各文件的缺陷共享同一字符串对象，
+    汇总大量缺陷时节省内存，按模式统计时字典查找可直接按对象比较
+    """
+    return Defect(sys.intern(pattern), sys.intern(description), severity, line, file_path, context,
+                  sys.intern(suggestion) if suggestion is not None else None)
+
+
+# 检测器使用的名称集合，模块级常量避免每次调用重新构造
+_RESOURCE_FUNCTIONS = frozenset({'open', 'connect', 'start', 'create'})
+_SQL_FUNCTIONS = frozenset({'execute', 'executemany', 'query', 'raw'})
+
+# 密码相关关键词，编译为单个正则
+_PASSWORD_KEYWORDS_RE = re.compile('|'.join(map(re.escape, (
+    'password', 'passwd', 'pwd', 'secret', 'key',
+    'token', 'auth', 'credential', 'apikey', 'apisecret'
+))))
+
+# SQL参数中的字符串拼接痕迹：+、%或format(，一次扫描同时查找
+_CONCAT_MARKERS_RE = re.compile(r"[+%]|format\(")
+
+
+def source_may_match(source_filter: Optional["re.Pattern"], source_code: str) -> bool:
+    """源码预筛选：模式的source_filter在源码中没有出现时，该模式不可能报告缺陷
+    
+    非ASCII源码中的标识符会经过NFKC规范化，与源码文本不一定一致，此时不筛选
+    """
+    if source_filter is None or not source_code.isascii():
+        return True
+    return source_filter.search(source_code) is not None
+
+
+def _is_none(node: ast.AST) -> bool:
+    """节点是否为None常量"""
+    return isinstance(node, ast.Constant) and node.value is None
 
 
 # 缺陷检测器函数类型
@@ -38,51 +117,47 @@ class BasePatterns:
     
     @staticmethod
     def detect_null_dereference(node: ast.AST, file_path: str, parser: 'ASTParser') -> Optional[List[Defect]]:
-        """检测空指针解引用"""
-        defects = []
-        
+        """检测空指针解引用（该检测器在每个属性、下标和调用节点上运行，未发现缺陷时不分配列表）"""
         if isinstance(node, ast.Attribute):
-            # 检查 obj.attr 中的 obj 是否为 None
-            value = ast.unparse(node.value)
-            if value == 'None':
-                defects.append(Defect(
+            # 检查 obj.attr 中的 obj 是否为 None（直接检查节点，避免对每个节点unparse）
+            if _is_none(node.value):
+                return [Defect(
                     pattern="null_dereference",
                     description="访问None对象的属性",
                     severity=Severity.HIGH,
                     line=node.lineno,
                     file_path=file_path,
-                    context=ast.unparse(node),
-                    suggestion=f"在访问属性前检查 {value} 是否为None"
-                ))
+                    context=parser.source_segment(node),
+                    suggestion="在访问属性前检查 None 是否为None"
+                )]
         
         elif isinstance(node, ast.Subscript):
             # 检查 container[index] 中的 container 是否为 None
-            value = ast.unparse(node.value)
-            if value == 'None':
-                defects.append(Defect(
+            if _is_none(node.value):
+                return [Defect(
                     pattern="null_dereference",
                     description="访问None对象的元素",
                     severity=Severity.HIGH,
                     line=node.lineno,
                     file_path=file_path,
-                    context=ast.unparse(node),
-                    suggestion=f"在访问元素前检查 {value} 是否为None"
-                ))
+                    context=parser.source_segment(node),
+                    suggestion="在访问元素前检查 None 是否为None"
+                )]
         
         elif isinstance(node, ast.Call):
             # 检查 func() 中的 func 是否为 None
-            if isinstance(node.func, ast.Name) and node.func.id == 'None':
-                defects.append(Defect(
+            if _is_none(node.func):
+                return [Defect(
                     pattern="null_dereference",
                     description="调用None对象",
                     severity=Severity.HIGH,
                     line=node.lineno,
                     file_path=file_path,
-                    context=ast.unparse(node),
+                    context=parser.source_segment(node),
                     suggestion="在调用前检查函数是否为None"
-                ))
+                )]
         
-        return defects if defects else None
+        return None
     
     @staticmethod
     def detect_resource_leak(node: ast.AST, file_path: str, parser: 'ASTParser') -> Optional[List[Defect]]:
@@ -101,8 +176,7 @@ class BasePatterns:
             elif isinstance(node.func, ast.Attribute):
                 func_name = node.func.attr
             
-            resource_functions = {'open', 'connect', 'start', 'create'}
-            if func_name in resource_functions:
+            if func_name in _RESOURCE_FUNCTIONS:
                 # 查找父作用域，检查是否有对应的关闭操作
                 defects.append(Defect(
                     pattern="resource_leak",
@@ -110,7 +184,7 @@ class BasePatterns:
                     severity=Severity.MEDIUM,
                     line=node.lineno,
                     file_path=file_path,
-                    context=ast.unparse(node),
+                    context=parser.source_segment(node),
                     suggestion=f"使用with语句或确保调用close()方法"
                 ))
         
@@ -129,15 +203,16 @@ class BasePatterns:
         
         if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Div, ast.FloorDiv, ast.Mod)):
             # 检查除数是否为0
-            right_expr = ast.unparse(node.right)
-            if right_expr == '0' or right_expr == '0.0':
+            right = node.right
+            if (isinstance(right, ast.Constant) and type(right.value) in (int, float)
+                    and right.value == 0):
                 defects.append(Defect(
                     pattern="division_by_zero",
                     description="除以零",
                     severity=Severity.HIGH,
                     line=node.lineno,
                     file_path=file_path,
-                    context=ast.unparse(node),
+                    context=parser.source_segment(node),
                     suggestion="检查除数是否可能为零"
                 ))
         
@@ -152,30 +227,22 @@ class BasePatterns:
         if isinstance(node, ast.Constant) and isinstance(node.value, str):
             text = node.value.lower()
             
-            # 密码相关关键词
-            password_keywords = {
-                'password', 'passwd', 'pwd', 'secret', 'key',
-                'token', 'auth', 'credential', 'apikey', 'apisecret'
-            }
-            
             # 检查变量名或上下文
             parent = getattr(node, 'parent', None)
             if parent and isinstance(parent, ast.Assign):
                 for target in parent.targets:
                     if isinstance(target, ast.Name):
-                        var_name = target.id.lower()
-                        for keyword in password_keywords:
-                            if keyword in var_name:
-                                defects.append(Defect(
-                                    pattern="hardcoded_password",
-                                    description="发现硬编码的密码/密钥",
-                                    severity=Severity.CRITICAL,
-                                    line=node.lineno,
-                                    file_path=file_path,
-                                    context=ast.unparse(parent),
-                                    suggestion="使用环境变量或配置文件存储敏感信息"
-                                ))
-                                break
+                        # 一次正则扫描匹配所有关键词
+                        if _PASSWORD_KEYWORDS_RE.search(target.id.lower()):
+                            defects.append(Defect(
+                                pattern="hardcoded_password",
+                                description="发现硬编码的密码/密钥",
+                                severity=Severity.CRITICAL,
+                                line=node.lineno,
+                                file_path=file_path,
+                                context=parser.source_segment(parent),
+                                suggestion="使用环境变量或配置文件存储敏感信息"
+                            ))
         
         return defects if defects else None
     
@@ -192,21 +259,20 @@ class BasePatterns:
             elif isinstance(node.func, ast.Attribute):
                 func_name = node.func.attr
             
-            sql_functions = {'execute', 'executemany', 'query', 'raw'}
-            db_modules = {'sqlite3', 'psycopg2', 'mysql', 'pymysql'}
-            
-            if func_name in sql_functions:
+            if func_name in _SQL_FUNCTIONS:
                 # 检查参数中是否有字符串拼接
                 for arg in node.args:
-                    arg_str = ast.unparse(arg)
-                    if '+' in arg_str or '%' in arg_str or 'format(' in arg_str:
+                    # 单个变量名不可能包含拼接，无需unparse
+                    if isinstance(arg, ast.Name):
+                        continue
+                    if _CONCAT_MARKERS_RE.search(ast.unparse(arg)):
                         defects.append(Defect(
                             pattern="sql_injection",
                             description="潜在的SQL注入漏洞",
                             severity=Severity.CRITICAL,
                             line=node.lineno,
                             file_path=file_path,
-                            context=ast.unparse(node),
+                            context=parser.source_segment(node),
                             suggestion="使用参数化查询或ORM"
                         ))
         
@@ -219,15 +285,16 @@ class BasePatterns:
         
         if isinstance(node, ast.While):
             # 检查while条件是否为常量True
-            test = ast.unparse(node.test)
-            if test == 'True' or test == '1':
+            test = node.test
+            if isinstance(test, ast.Constant) and (
+                    test.value is True or (type(test.value) is int and test.value == 1)):
                 defects.append(Defect(
                     pattern="potential_loop_infinite",
                     description="可能无限循环",
                     severity=Severity.MEDIUM,
                     line=node.lineno,
                     file_path=file_path,
-                    context=ast.unparse(node),
+                    context=parser.source_segment(node),
                     suggestion="确保循环有终止条件或添加超时机制"
                 ))
         
@@ -235,34 +302,27 @@ class BasePatterns:
     
     @staticmethod
     def detect_missing_type_hints(node: ast.AST, file_path: str, parser: 'ASTParser') -> Optional[List[Defect]]:
-        """检测缺少类型注解"""
-        defects = []
+        """检测缺少类型注解（参数全部有注解且有返回注解时不分配列表）"""
+        if not isinstance(node, ast.FunctionDef):
+            return None
         
-        if isinstance(node, ast.FunctionDef):
-            # 检查函数是否有返回类型注解
-            if not node.returns:
-                defects.append(Defect(
-                    pattern="missing_type_hints",
-                    description="函数缺少返回类型注解",
-                    severity=Severity.LOW,
-                    line=node.lineno,
-                    file_path=file_path,
-                    context=node.name,
-                    suggestion=f"添加返回类型注解: def {node.name}(...) -> ReturnType:"
-                ))
-            
-            # 检查参数是否有类型注解
-            for arg in node.args.args:
-                if not arg.annotation:
-                    defects.append(Defect(
-                        pattern="missing_type_hints",
-                        description=f"参数'{arg.arg}'缺少类型注解",
-                        severity=Severity.LOW,
-                        line=node.lineno,
-                        file_path=file_path,
-                        context=node.name,
-                        suggestion=f"添加类型注解: {arg.arg}: Type"
-                    ))
+        name = node.name
+        line = node.lineno
+        
+        # 检查参数是否有类型注解（只为缺少注解的参数构造缺陷）
+        defects = [
+            Defect("missing_type_hints", f"参数'{arg.arg}'缺少类型注解", Severity.LOW, line, file_path,
+                   name, f"添加类型注解: {arg.arg}: Type")
+            for arg in node.args.args
+            if not arg.annotation
+        ]
+        
+        # 检查函数是否有返回类型注解（返回注解缺陷排在参数缺陷之前）
+        if not node.returns:
+            defects.insert(0, Defect(
+                "missing_type_hints", "函数缺少返回类型注解", Severity.LOW, line, file_path,
+                name, f"添加返回类型注解: def {name}(...) -> ReturnType:"
+            ))
         
         return defects if defects else None
     
@@ -296,8 +356,8 @@ class BasePatterns:
         defects = []
         
         if isinstance(node, ast.FunctionDef):
-            # 在ASTParser中计算复杂度
-            func = parser.get_function_by_name(node.name)
+            # 复杂度已在ASTParser的提取遍历中计算，按节点查找避免同名函数混淆
+            func = parser.get_function_by_node(node)
             if func and func.complexity > threshold:
                 defects.append(Defect(
                     pattern="high_complexity",
@@ -313,50 +373,68 @@ class BasePatterns:
 
 
 # 所有可用的缺陷模式
+# node_types: 检测器可能报告缺陷的节点类型，检测器只会在这些节点上调用
+# source_filter: 报告缺陷的必要条件在源码文本中的正则，未出现时整个文件跳过该检测器
+# call_names: 检测器只可能在被调用名称（函数名或属性名）属于该集合的调用节点上报告缺陷
 PATTERNS = {
     "null_dereference": {
         "description": "空指针解引用",
         "severity": Severity.HIGH,
-        "detector": BasePatterns.detect_null_dereference
+        "detector": BasePatterns.detect_null_dereference,
+        "node_types": (ast.Attribute, ast.Subscript, ast.Call)
     },
     "resource_leak": {
         "description": "资源泄漏",
         "severity": Severity.MEDIUM,
-        "detector": BasePatterns.detect_resource_leak
+        "detector": BasePatterns.detect_resource_leak,
+        "node_types": (ast.Call,),
+        "call_names": _RESOURCE_FUNCTIONS,
+        "source_filter": re.compile('|'.join(sorted(_RESOURCE_FUNCTIONS)))
     },
     "division_by_zero": {
         "description": "除以零",
         "severity": Severity.HIGH,
-        "detector": BasePatterns.detect_division_by_zero
+        "detector": BasePatterns.detect_division_by_zero,
+        "node_types": (ast.BinOp,)
     },
     "hardcoded_password": {
         "description": "硬编码密码",
         "severity": Severity.CRITICAL,
-        "detector": BasePatterns.detect_hardcoded_password
+        "detector": BasePatterns.detect_hardcoded_password,
+        "node_types": (ast.Constant,),
+        "source_filter": re.compile(_PASSWORD_KEYWORDS_RE.pattern, re.IGNORECASE)
     },
     "sql_injection": {
         "description": "SQL注入漏洞",
         "severity": Severity.CRITICAL,
-        "detector": BasePatterns.detect_sql_injection
+        "detector": BasePatterns.detect_sql_injection,
+        "node_types": (ast.Call,),
+        "call_names": _SQL_FUNCTIONS,
+        "source_filter": re.compile('|'.join(sorted(_SQL_FUNCTIONS)))
     },
     "potential_loop_infinite": {
         "description": "可能无限循环",
         "severity": Severity.MEDIUM,
-        "detector": BasePatterns.detect_infinite_loop
+        "detector": BasePatterns.detect_infinite_loop,
+        "node_types": (ast.While,),
+        "source_filter": re.compile(r"\bwhile\b")
     },
     "missing_type_hints": {
         "description": "缺少类型注解",
         "severity": Severity.LOW,
-        "detector": BasePatterns.detect_missing_type_hints
+        "detector": BasePatterns.detect_missing_type_hints,
+        "node_types": (ast.FunctionDef,)
     },
     "long_function": {
         "description": "函数过长",
         "severity": Severity.MEDIUM,
-        "detector": BasePatterns.detect_long_function
+        "detector": BasePatterns.detect_long_function,
+        "node_types": (ast.FunctionDef,)
     },
     "high_complexity": {
         "description": "高圈复杂度",
         "severity": Severity.MEDIUM,
-        "detector": BasePatterns.detect_high_complexity
+        "detector": BasePatterns.detect_high_complexity,
+        "node_types": (ast.FunctionDef,)
     }
 }
\ No newline at end of file
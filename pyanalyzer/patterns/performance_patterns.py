@@ -3,19 +3,91 @@
 """
 
 import ast
-from typing import List, Optional
+from typing import FrozenSet, List, Optional, Tuple
 from dataclasses import dataclass
 
-from pyanalyzer.patterns.base_patterns import Defect, Severity
+from pyanalyzer.patterns.base_patterns import Defect, Severity, _DATACLASS_SLOTS
 
 
-@dataclass
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class PerformancePattern:
     """性能模式"""
     name: str
     description: str
     severity: Severity
     detector: callable
+    # 检测器可能报告缺陷的节点类型，None表示检查所有节点
+    node_types: Optional[Tuple[type, ...]] = None
+    # 检测器只可能在被调用名称属于该集合的调用节点上报告缺陷，驱动据此预先筛选调用节点
+    call_names: Optional[FrozenSet[str]] = None
+
+
+_LOOP_TYPES = (ast.For, ast.While, ast.AsyncFor)
+
+_COPY_FUNCTIONS = frozenset({'copy', 'deepcopy', 'list', '[:]'})
+
+_FUNCTION_TYPES = (ast.FunctionDef, ast.AsyncFunctionDef)
+# AST节点类不会被子类化，遍历热路径上按type(node)精确查集合
+_LOOP_TYPE_SET = frozenset(_LOOP_TYPES)
+_FUNCTION_TYPE_SET = frozenset(_FUNCTION_TYPES)
+
+# 子树遍历结果缓存在函数节点自身的属性上，随AST一起释放，不同的树之间互不影响：
+# _perf_walk: [(子孙节点, 循环嵌套深度)]，多个检测器共享同一次子树遍历
+# _perf_walk_span: (外层遍历结果, 起始下标, 结束下标, 函数所在循环深度)，
+# 外层函数遍历时顺带记录，嵌套函数直接从外层结果中切出，不再重新遍历
+
+
+class _SubtreeEnd:
+    """遍历栈中的嵌套函数结束标记，子节点全部处理完后才会弹出"""
+    
+    def __init__(self, func: ast.AST, start: int, base: int):
+        self.func = func
+        self.start = start
+        self.base = base
+
+
+def _walk(node: ast.AST) -> List[Tuple[ast.AST, int]]:
+    """先序遍历节点子树，返回(节点, 所在循环嵌套深度)列表，同一节点只遍历一次"""
+    result = getattr(node, '_perf_walk', None)
+    if result is not None:
+        return result
+    
+    span = getattr(node, '_perf_walk_span', None)
+    if span is not None:
+        del node._perf_walk_span
+        items, start, end, base = span
+        if base:
+            result = [(child, depth - base) for child, depth in items[start:end]]
+        else:
+            result = items[start:end]
+    else:
+        result = _walk_subtree(node)
+    
+    node._perf_walk = result
+    return result
+
+
+def _walk_subtree(node: ast.AST) -> List[Tuple[ast.AST, int]]:
+    """用显式栈先序遍历子树，同时记录其中嵌套函数的子树区间"""
+    result = []
+    iter_child_nodes = ast.iter_child_nodes
+    stack = [(node, 0)]
+    while stack:
+        current, depth = stack.pop()
+        node_type = type(current)
+        if node_type is _SubtreeEnd:
+            func = current.func
+            if not hasattr(func, '_perf_walk'):
+                func._perf_walk_span = (result, current.start, len(result), current.base)
+            continue
+        if node_type in _LOOP_TYPE_SET:
+            depth += 1
+        elif node_type in _FUNCTION_TYPE_SET and current is not node:
+            stack.append((_SubtreeEnd(current, len(result), depth), depth))
+        result.append((current, depth))
+        stack.extend((child, depth) for child in reversed(list(iter_child_nodes(current))))
+    
+    return result
 
 
 class PerformancePatterns:
@@ -26,51 +98,40 @@ class PerformancePatterns:
         """检测嵌套循环"""
         defects = []
         
-        def count_nested_loops(node: ast.AST, depth: int = 0):
-            """递归计算嵌套深度"""
-            if isinstance(node, (ast.For, ast.While, ast.AsyncFor)):
-                depth += 1
-                if depth >= 3:  # 超过3层嵌套
+        if isinstance(node, _FUNCTION_TYPES):
+            for child, depth in _walk(node):
+                if depth >= 3 and type(child) in _LOOP_TYPE_SET:  # 超过3层嵌套
                     defects.append(Defect(
                         pattern="deep_nested_loops",
                         description=f"深度嵌套循环（{depth}层）",
                         severity=Severity.MEDIUM,
-                        line=node.lineno,
+                        line=child.lineno,
                         file_path=file_path,
-                        context=ast.unparse(node),
+                        context=ast.unparse(child),
                         suggestion="考虑重构以减少嵌套深度，使用函数提取"
                     ))
-            
-            for child in ast.iter_child_nodes(node):
-                count_nested_loops(child, depth)
-        
-        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
-            count_nested_loops(node)
         
         return defects if defects else None
     
     @staticmethod
     def detect_string_concatenation_in_loop(node: ast.AST, file_path: str) -> Optional[List[Defect]]:
         """检测循环中的字符串拼接"""
-        defects = []
-        
         if isinstance(node, ast.For):
-            # 检查循环体中是否有字符串拼接
+            # 检查循环体中是否有字符串拼接，找到第一处即返回（AST节点类不会被子类化，按类型精确比较）
             for stmt in node.body:
-                if isinstance(stmt, ast.AugAssign) and isinstance(stmt.op, ast.Add):
-                    if isinstance(stmt.target, ast.Name):
-                        defects.append(Defect(
-                            pattern="string_concat_in_loop",
-                            description="循环中使用字符串拼接",
-                            severity=Severity.MEDIUM,
-                            line=node.lineno,
-                            file_path=file_path,
-                            context=ast.unparse(node),
-                            suggestion="使用列表和join()方法"
-                        ))
-                        break
+                if (type(stmt) is ast.AugAssign and type(stmt.op) is ast.Add
+                        and type(stmt.target) is ast.Name):
+                    return [Defect(
+                        pattern="string_concat_in_loop",
+                        description="循环中使用字符串拼接",
+                        severity=Severity.MEDIUM,
+                        line=node.lineno,
+                        file_path=file_path,
+                        context=ast.unparse(node),
+                        suggestion="使用列表和join()方法"
+                    )]
         
-        return defects if defects else None
+        return None
     
     @staticmethod
     def detect_unnecessary_computation(node: ast.AST, file_path: str) -> Optional[List[Defect]]:
@@ -83,9 +144,8 @@ class PerformancePatterns:
             
             for stmt in node.body:
                 if isinstance(stmt, ast.Assign):
-                    # 检查赋值是否依赖循环变量
-                    deps = PerformancePatterns._get_dependencies(stmt.value)
-                    if not deps:
+                    # 检查赋值是否依赖循环变量（只需知道是否引用了任何变量）
+                    if not PerformancePatterns._has_dependencies(stmt.value):
                         # 不依赖循环变量，可能可以提到循环外
                         loop_invariants.update([target.id for target in stmt.targets 
                                               if isinstance(target, ast.Name)])
@@ -114,6 +174,18 @@ class PerformancePatterns:
         
         return deps
     
+    @staticmethod
+    def _has_dependencies(node: ast.AST) -> bool:
+        """表达式是否引用了任何变量，找到第一个名称即返回"""
+        iter_child_nodes = ast.iter_child_nodes
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if type(current) is ast.Name:
+                return True
+            stack.extend(iter_child_nodes(current))
+        return False
+    
     @staticmethod
     def detect_large_list_comprehension(node: ast.AST, file_path: str) -> Optional[List[Defect]]:
         """检测过大的列表推导式"""
@@ -141,13 +213,14 @@ class PerformancePatterns:
         defects = []
         
         if isinstance(node, ast.FunctionDef):
-            global_accesses = 0
-            for child in ast.walk(node):
-                if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load):
-                    # 检查是否访问全局变量
-                    # 简化检查：假设所有非局部变量都是全局的
-                    if child.id not in [arg.arg for arg in node.args.args]:
-                        global_accesses += 1
+            # 检查是否访问全局变量
+            # 简化检查：假设所有非局部变量都是全局的
+            arg_names = frozenset(arg.arg for arg in node.args.args)
+            global_accesses = sum(
+                1 for child, _ in _walk(node)
+                if isinstance(child, ast.Name) and isinstance(child.ctx, ast.Load)
+                and child.id not in arg_names
+            )
             
             if global_accesses > 5:  # 频繁访问全局变量
                 defects.append(Defect(
@@ -167,17 +240,10 @@ class PerformancePatterns:
         """检测低效的数据结构使用"""
         defects = []
         
-        if isinstance(node, ast.Call):
-            func_name = ""
-            if isinstance(node.func, ast.Name):
-                func_name = node.func.id
-            elif isinstance(node.func, ast.Attribute):
-                func_name = node.func.attr
-            
-            # 检查列表的in操作（O(n)）
-            if func_name == 'in' and isinstance(node.func, ast.Name):
-                # 检查左侧是否为列表
-                if len(node.args) > 0 and isinstance(node.args[0], ast.List):
+        if isinstance(node, ast.Compare):
+            # 检查对列表字面量的in / not in成员测试（O(n)）
+            for op, comparator in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)) and isinstance(comparator, ast.List):
                     defects.append(Defect(
                         pattern="inefficient_membership_test",
                         description="在列表中使用in操作符（O(n)）",
@@ -202,9 +268,7 @@ class PerformancePatterns:
             elif isinstance(node.func, ast.Attribute):
                 func_name = node.func.attr
             
-            copy_functions = {'copy', 'deepcopy', 'list', '[:]'}
-            
-            if func_name in copy_functions:
+            if func_name in _COPY_FUNCTIONS:
                 # 检查是否真的需要拷贝
                 parent = getattr(node, 'parent', None)
                 if parent and isinstance(parent, ast.For):
@@ -228,42 +292,50 @@ PERFORMANCE_PATTERNS = {
         name="deep_nested_loops",
         description="深度嵌套循环",
         severity=Severity.MEDIUM,
-        detector=PerformancePatterns.detect_nested_loops
+        detector=PerformancePatterns.detect_nested_loops,
+        node_types=(ast.FunctionDef, ast.AsyncFunctionDef)
     ),
     "string_concat_in_loop": PerformancePattern(
         name="string_concat_in_loop",
         description="循环中字符串拼接",
         severity=Severity.MEDIUM,
-        detector=PerformancePatterns.detect_string_concatenation_in_loop
+        detector=PerformancePatterns.detect_string_concatenation_in_loop,
+        node_types=(ast.For,)
     ),
     "loop_invariant_code": PerformancePattern(
         name="loop_invariant_code",
         description="循环中不变的计算",
         severity=Severity.LOW,
-        detector=PerformancePatterns.detect_unnecessary_computation
+        detector=PerformancePatterns.detect_unnecessary_computation,
+        node_types=(ast.For,)
     ),
     "complex_list_comprehension": PerformancePattern(
         name="complex_list_comprehension",
         description="复杂的列表推导式",
         severity=Severity.LOW,
-        detector=PerformancePatterns.detect_large_list_comprehension
+        detector=PerformancePatterns.detect_large_list_comprehension,
+        node_types=(ast.ListComp,)
     ),
     "frequent_global_access": PerformancePattern(
         name="frequent_global_access",
         description="频繁访问全局变量",
         severity=Severity.LOW,
-        detector=PerformancePatterns.detect_global_variable_access
+        detector=PerformancePatterns.detect_global_variable_access,
+        node_types=(ast.FunctionDef,)
     ),
     "inefficient_membership_test": PerformancePattern(
         name="inefficient_membership_test",
         description="低效的成员测试",
         severity=Severity.MEDIUM,
-        detector=PerformancePatterns.detect_inefficient_data_structure
+        detector=PerformancePatterns.detect_inefficient_data_structure,
+        node_types=(ast.Compare,)
     ),
     "unnecessary_copy": PerformancePattern(
         name="unnecessary_copy",
         description="不必要的拷贝",
         severity=Severity.LOW,
-        detector=PerformancePatterns.detect_copy_instead_of_view
+        detector=PerformancePatterns.detect_copy_instead_of_view,
+        node_types=(ast.Call,),
+        call_names=_COPY_FUNCTIONS
     ),
 }
\ No newline at end of file
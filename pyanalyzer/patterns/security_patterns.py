@@ -4,24 +4,90 @@
 
 import ast
 import re
-from typing import List, Optional
+from pathlib import Path
+from typing import FrozenSet, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 
-from pyanalyzer.patterns.base_patterns import Defect, Severity
+from pyanalyzer.patterns.base_patterns import Defect, Severity, _DATACLASS_SLOTS, source_may_match
+from pyanalyzer.utils.parallel import parallel_map
 
 
-@dataclass
+# 检测器使用的名称集合，模块级常量避免每次调用重新构造
+_UNSAFE_DESERIALIZERS = frozenset({
+    'pickle.loads', 'pickle.load',
+    'marshal.loads', 'marshal.load',
+    'yaml.load', 'yaml.safe_load',
+    'eval', 'exec'
+})
+_SHELL_FUNCTIONS = frozenset({
+    'os.system', 'subprocess.call', 'subprocess.Popen', 'os.popen',
+    'system', 'call', 'Popen', 'popen'
+})
+_FILE_FUNCTIONS = frozenset({'open', 'os.open', 'os.remove', 'os.rename', 'shutil.copy'})
+_WEAK_ALGORITHMS = frozenset({
+    'md5', 'sha1', 'DES', 'RC4',
+    'hashlib.md5', 'hashlib.sha1',
+    'Crypto.Cipher.DES', 'Crypto.Cipher.ARC4'
+})
+_INSECURE_RANDOM = frozenset({'random.random', 'random.randint', 'random.choice'})
+_XML_PARSERS = frozenset({
+    'xml.etree.ElementTree.parse', 'xml.etree.ElementTree.fromstring',
+    'lxml.etree.parse', 'lxml.etree.fromstring',
+    'minidom.parse', 'minidom.parseString'
+})
+
+# 安全相关变量名关键词，编译为单个正则
+_SECURITY_KEYWORDS_RE = re.compile('token|key|secret|password|salt')
+# 相对路径或路径分隔符，一次扫描代替多次子串查找
+_PATH_SEPARATOR_RE = re.compile(r'\.\.|[/\\]')
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class SecurityPattern:
     """安全模式"""
     name: str
     description: str
     severity: Severity
     detector: callable
+    # 检测器可能报告缺陷的节点类型，None表示检查所有节点
+    node_types: Optional[Tuple[type, ...]] = None
+    # 检测器只可能在被调用名称属于该集合的调用节点上报告缺陷，驱动据此预先筛选调用节点
+    call_names: Optional[FrozenSet[str]] = None
 
 
 class SecurityPatterns:
     """安全缺陷模式"""
     
+    @staticmethod
+    def scan_file(file_path: str) -> List[Defect]:
+        """对单个文件运行全部安全检测器，按源码顺序返回缺陷"""
+        # 核心模块依赖模式模块，在函数内导入避免循环导入
+        from pyanalyzer.core.ast_parser import ASTParser
+        
+        source_code = Path(file_path).read_bytes().decode('utf-8')
+        # 源码中没有出现任何被检测的函数名时，不可能有缺陷，跳过解析
+        if not source_may_match(_CALL_NAMES_RE, source_code):
+            return []
+        
+        parser = ASTParser(source_code, str(file_path))
+        patterns = list(SECURITY_PATTERNS.values())
+        
+        defects = []
+        for node, name in parser.named_calls:
+            for pattern in patterns:
+                if name in pattern.call_names:
+                    defects.extend(pattern.detector(node, str(file_path)) or ())
+        return defects
+    
+    @classmethod
+    def scan_files(cls, paths: Iterable[str], workers: Optional[int] = None) -> List[Defect]:
+        """按文件并行运行安全检测器，结果按文件顺序合并
+        
+        每个文件的解析与检测互不依赖，以文件为单位分发给进程池
+        """
+        results = parallel_map(cls.scan_file, list(paths), workers=workers)
+        return [defect for defects in results for defect in defects]
+    
     @staticmethod
     def detect_unsafe_deserialization(node: ast.AST, file_path: str) -> Optional[List[Defect]]:
         """检测不安全的反序列化"""
@@ -34,14 +100,7 @@ class SecurityPatterns:
             elif isinstance(node.func, ast.Attribute):
                 func_name = node.func.attr
             
-            unsafe_deserializers = {
-                'pickle.loads', 'pickle.load',
-                'marshal.loads', 'marshal.load',
-                'yaml.load', 'yaml.safe_load',
-                'eval', 'exec'
-            }
-            
-            if func_name in unsafe_deserializers:
+            if func_name in _UNSAFE_DESERIALIZERS:
                 defects.append(Defect(
                     pattern="unsafe_deserialization",
                     description=f"使用不安全的反序列化函数: {func_name}",
@@ -66,14 +125,10 @@ class SecurityPatterns:
             elif isinstance(node.func, ast.Attribute):
                 func_name = node.func.attr
             
-            shell_functions = {'os.system', 'subprocess.call', 'subprocess.Popen', 'os.popen'}
-            
-            if func_name in shell_functions or func_name in ['system', 'call', 'Popen', 'popen']:
-                # 检查参数中是否有用户输入
+            if func_name in _SHELL_FUNCTIONS:
+                # 检查参数中是否有用户输入（按结构判断，不把参数还原成源码字符串）
                 for arg in node.args:
-                    arg_str = ast.unparse(arg)
-                    # 检查是否有字符串拼接或变量
-                    if '+' in arg_str or any(char.isalpha() for char in arg_str if char not in ['"', "'", ' ']):
+                    if SecurityPatterns._has_dynamic_part(arg):
                         defects.append(Defect(
                             pattern="command_injection",
                             description="潜在的命令注入漏洞",
@@ -99,14 +154,11 @@ class SecurityPatterns:
             elif isinstance(node.func, ast.Attribute):
                 func_name = node.func.attr
             
-            file_functions = {'open', 'os.open', 'os.remove', 'os.rename', 'shutil.copy'}
-            
-            if func_name in file_functions:
+            if func_name in _FILE_FUNCTIONS:
                 # 检查参数中是否有用户控制的路径
                 if node.args:
-                    first_arg = ast.unparse(node.args[0])
                     # 检查是否有相对路径或用户输入
-                    if '..' in first_arg or '/' in first_arg or '\\' in first_arg:
+                    if SecurityPatterns._has_path_separator(node.args[0]):
                         # 检查是否使用了os.path.join进行安全连接
                         if not SecurityPatterns._is_safe_path_construction(node):
                             defects.append(Defect(
@@ -121,17 +173,35 @@ class SecurityPatterns:
         
         return defects if defects else None
     
+    @staticmethod
+    def _has_dynamic_part(arg: ast.AST) -> bool:
+        """检查参数中是否有字符串拼接或变量"""
+        for child in ast.walk(arg):
+            if isinstance(child, (ast.Name, ast.JoinedStr)):
+                return True
+            if isinstance(child, ast.BinOp) and isinstance(child.op, ast.Add):
+                return True
+        return False
+    
+    @staticmethod
+    def _has_path_separator(arg: ast.AST) -> bool:
+        """检查路径参数中是否有相对路径或路径分隔符（字符串常量或路径除法）"""
+        for child in ast.walk(arg):
+            if isinstance(child, ast.Constant) and isinstance(child.value, str):
+                if _PATH_SEPARATOR_RE.search(child.value):
+                    return True
+            elif isinstance(child, ast.BinOp) and isinstance(child.op, ast.Div):
+                return True
+        return False
+    
     @staticmethod
     def _is_safe_path_construction(node: ast.AST) -> bool:
         """检查是否使用安全的路径构建方式"""
-        # 检查是否使用了os.path.join
-        if isinstance(node, ast.Call):
-            if isinstance(node.func, ast.Attribute):
-                if node.func.attr == 'join' and isinstance(node.func.value, ast.Attribute):
-                    if node.func.value.attr == 'path' and isinstance(node.func.value.value, ast.Name):
-                        if node.func.value.value.id == 'os':
-                            return True
-        return False
+        # 检查是否使用了os.path.join（调用方只传入调用节点，先比较属性名以尽早排除）
+        func = node.func
+        return (isinstance(func, ast.Attribute) and func.attr == 'join'
+                and isinstance(func.value, ast.Attribute) and func.value.attr == 'path'
+                and isinstance(func.value.value, ast.Name) and func.value.value.id == 'os')
     
     @staticmethod
     def detect_weak_cryptography(node: ast.AST, file_path: str) -> Optional[List[Defect]]:
@@ -145,13 +215,7 @@ class SecurityPatterns:
             elif isinstance(node.func, ast.Attribute):
                 func_name = node.func.attr
             
-            weak_algorithms = {
-                'md5', 'sha1', 'DES', 'RC4',
-                'hashlib.md5', 'hashlib.sha1',
-                'Crypto.Cipher.DES', 'Crypto.Cipher.ARC4'
-            }
-            
-            if func_name in weak_algorithms:
+            if func_name in _WEAK_ALGORITHMS:
                 defects.append(Defect(
                     pattern="weak_cryptography",
                     description=f"使用弱加密算法: {func_name}",
@@ -176,17 +240,13 @@ class SecurityPatterns:
             elif isinstance(node.func, ast.Attribute):
                 func_name = node.func.attr
             
-            insecure_random = {'random.random', 'random.randint', 'random.choice'}
-            
-            if func_name in insecure_random:
+            if func_name in _INSECURE_RANDOM:
                 # 检查是否用于安全相关场景
                 parent = getattr(node, 'parent', None)
                 if parent and isinstance(parent, ast.Assign):
                     for target in parent.targets:
                         if isinstance(target, ast.Name):
-                            var_name = target.id.lower()
-                            security_keywords = {'token', 'key', 'secret', 'password', 'salt'}
-                            if any(keyword in var_name for keyword in security_keywords):
+                            if _SECURITY_KEYWORDS_RE.search(target.id.lower()):
                                 defects.append(Defect(
                                     pattern="insecure_random",
                                     description="使用不安全的随机数生成器",
@@ -212,13 +272,7 @@ class SecurityPatterns:
             elif isinstance(node.func, ast.Attribute):
                 func_name = node.func.attr
             
-            xml_parsers = {
-                'xml.etree.ElementTree.parse', 'xml.etree.ElementTree.fromstring',
-                'lxml.etree.parse', 'lxml.etree.fromstring',
-                'minidom.parse', 'minidom.parseString'
-            }
-            
-            if func_name in xml_parsers:
+            if func_name in _XML_PARSERS:
                 # 检查是否禁用了外部实体
                 # 这里简化检查，实际需要更复杂的分析
                 defects.append(Defect(
@@ -240,36 +294,56 @@ SECURITY_PATTERNS = {
         name="unsafe_deserialization",
         description="不安全的反序列化",
         severity=Severity.CRITICAL,
-        detector=SecurityPatterns.detect_unsafe_deserialization
+        detector=SecurityPatterns.detect_unsafe_deserialization,
+        node_types=(ast.Call,),
+        call_names=_UNSAFE_DESERIALIZERS
     ),
     "command_injection": SecurityPattern(
         name="command_injection",
         description="命令注入",
         severity=Severity.CRITICAL,
-        detector=SecurityPatterns.detect_command_injection
+        detector=SecurityPatterns.detect_command_injection,
+        node_types=(ast.Call,),
+        call_names=_SHELL_FUNCTIONS
     ),
     "path_traversal": SecurityPattern(
         name="path_traversal",
         description="路径遍历",
         severity=Severity.HIGH,
-        detector=SecurityPatterns.detect_path_traversal
+        detector=SecurityPatterns.detect_path_traversal,
+        node_types=(ast.Call,),
+        call_names=_FILE_FUNCTIONS
     ),
     "weak_cryptography": SecurityPattern(
         name="weak_cryptography",
         description="弱加密算法",
         severity=Severity.HIGH,
-        detector=SecurityPatterns.detect_weak_cryptography
+        detector=SecurityPatterns.detect_weak_cryptography,
+        node_types=(ast.Call,),
+        call_names=_WEAK_ALGORITHMS
     ),
     "insecure_random": SecurityPattern(
         name="insecure_random",
         description="不安全的随机数",
         severity=Severity.HIGH,
-        detector=SecurityPatterns.detect_insecure_random
+        detector=SecurityPatterns.detect_insecure_random,
+        node_types=(ast.Call,),
+        call_names=_INSECURE_RANDOM
     ),
     "potential_xxe": SecurityPattern(
         name="potential_xxe",
         description="潜在的XXE漏洞",
         severity=Severity.HIGH,
-        detector=SecurityPatterns.detect_xxe_vulnerability
+        detector=SecurityPatterns.detect_xxe_vulnerability,
+        node_types=(ast.Call,),
+        call_names=_XML_PARSERS
     ),
-}
\ No newline at end of file
+}
+
+# 所有安全检测器关注的被调用名称（调用节点上的名称不含点号），扫描文件前先在源码文本中查找
+_CALL_NAMES_RE = re.compile(r'\b(?:%s)\b' % '|'.join(sorted({
+    re.escape(name)
+    for pattern in SECURITY_PATTERNS.values()
+    for name in pattern.call_names
+    if name.isidentifier()
+})))
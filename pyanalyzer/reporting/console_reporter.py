@@ -2,82 +2,165 @@
 控制台报告生成器
 """
 
+import io
 import sys
+from collections import Counter, defaultdict
+from contextlib import contextmanager
 from datetime import datetime
+from functools import cached_property
 from typing import List, Dict, Any
 from pathlib import Path
 
 from pyanalyzer.patterns.base_patterns import Defect, Severity
+from pyanalyzer.utils.metrics import aggregate_project_metrics
+
+
+# 颜色代码
+_COLORS = {
+    'red': '\033[91m',
+    'green': '\033[92m',
+    'yellow': '\033[93m',
+    'blue': '\033[94m',
+    'magenta': '\033[95m',
+    'cyan': '\033[96m',
+    'white': '\033[97m',
+    'bold': '\033[1m',
+    'underline': '\033[4m',
+    'reset': '\033[0m',
+}
+
+# 严重程度颜色映射
+_SEVERITY_COLORS = {
+    Severity.CRITICAL: _COLORS['red'],
+    Severity.HIGH: _COLORS['magenta'],
+    Severity.MEDIUM: _COLORS['yellow'],
+    Severity.LOW: _COLORS['cyan'],
+}
+_RESET = _COLORS['reset']
+
+# 摘要中按严重程度从高到低输出：(严重程度, 大写名称, 颜色)
+_SEVERITY_ORDER = tuple(
+    (severity, severity.value.upper(), _SEVERITY_COLORS[severity])
+    for severity in (Severity.CRITICAL, Severity.HIGH, Severity.MEDIUM, Severity.LOW)
+)
+
+# 质量评分中各严重程度的权重
+_SEVERITY_WEIGHTS = (
+    (Severity.CRITICAL, 10),
+    (Severity.HIGH, 5),
+    (Severity.MEDIUM, 2),
+    (Severity.LOW, 1),
+)
+
+# 预先拼好的严重程度标签，逐条打印缺陷时无需重复拼接颜色代码
+_SEVERITY_TAGS = {
+    severity: f"{color}[{severity.value.upper()}]{_RESET}"
+    for severity, color in _SEVERITY_COLORS.items()
+}
+
+# 缺陷详情各行的前缀与后缀
+_LOCATION_PREFIX = f"     {_COLORS['yellow']}位置: "
+_DESCRIPTION_PREFIX = f"     {_COLORS['white']}描述: "
+_CONTEXT_PREFIX = f"     {_COLORS['cyan']}上下文: "
+_SUGGESTION_PREFIX = f"     {_COLORS['green']}建议: "
+
+# 按缺陷模式给出的改进建议（按输出顺序排列），新增规则只需在此添加
+_PATTERN_ADVICE = (
+    ("hardcoded_password", "移除硬编码的密码和密钥，使用环境变量"),
+    ("sql_injection", "修复SQL注入漏洞，使用参数化查询"),
+    ("null_dereference", "添加空值检查，使用Optional类型提示"),
+    ("resource_leak", "确保所有资源都正确关闭，使用with语句"),
+)
 
 
 class ConsoleReporter:
     """控制台报告生成器"""
     
+    # 颜色表在所有实例间共享，无需每次构造
+    COLORS = _COLORS
+    SEVERITY_COLORS = _SEVERITY_COLORS
+    
     def __init__(self, defects: List[Defect], metrics: List[Dict], config: Dict):
         self.defects = defects
         self.metrics = metrics
         self.config = config
-        self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        # 颜色代码
-        self.COLORS = {
-            'red': '\033[91m',
-            'green': '\033[92m',
-            'yellow': '\033[93m',
-            'blue': '\033[94m',
-            'magenta': '\033[95m',
-            'cyan': '\033[96m',
-            'white': '\033[97m',
-            'bold': '\033[1m',
-            'underline': '\033[4m',
-            'reset': '\033[0m',
-        }
-        
-        # 严重程度颜色映射
-        self.SEVERITY_COLORS = {
-            Severity.CRITICAL: self.COLORS['red'],
-            Severity.HIGH: self.COLORS['magenta'],
-            Severity.MEDIUM: self.COLORS['yellow'],
-            Severity.LOW: self.COLORS['cyan'],
-        }
         
+        # 一次遍历完成按严重程度、模式和文件的统计，各报告段直接复用
+        self._severity_counts: Dict[Severity, int] = Counter()
+        self._pattern_counts: Dict[str, int] = Counter()
+        self._defects_by_file: Dict[str, List[Defect]] = defaultdict(list)
+        for defect in defects:
+            self._severity_counts[defect.severity] += 1
+            self._pattern_counts[defect.pattern] += 1
+            self._defects_by_file[defect.file_path].append(defect)
+        
+        # 一次遍历汇总代码指标，打印指标、计算评分和生成建议时直接复用
+        project_metrics = aggregate_project_metrics(metrics)
+        self._total_lines = project_metrics["total_lines"]
+        self._total_functions = project_metrics["total_functions"]
+        self._total_classes = project_metrics["total_classes"]
+        self._avg_complexity = project_metrics["avg_cyclomatic_complexity"]
+        
+        # 输出缓冲区，None表示直接写到标准输出
+        self._buf = None
+    
+    @cached_property
+    def timestamp(self) -> str:
+        """报告生成时间，首次使用时（即生成报告时）才取当前时间"""
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
     def display(self):
         """显示报告到控制台"""
-        self._print_header()
-        self._print_summary()
-        self._print_defects_table()
-        self._print_metrics()
-        self._print_recommendations()
-        self._print_footer()
+        with self._buffered_output():
+            self._print_header()
+            self._print_summary()
+            self._print_defects_table()
+            self._print_metrics()
+            self._print_recommendations()
+            self._print_footer()
+    
+    @contextmanager
+    def _buffered_output(self):
+        """各段输出先写入缓冲区，结束时一次性写到标准输出，避免逐行print"""
+        self._buf = io.StringIO()
+        try:
+            yield
+            sys.stdout.write(self._buf.getvalue())
+        finally:
+            self._buf = None
+    
+    def _write(self, text: str = ""):
+        """输出一行"""
+        out = self._buf if self._buf is not None else sys.stdout
+        out.write(text)
+        out.write("\n")
     
     def _print_header(self):
         """打印头部信息"""
-        print("\n" + "="*80)
-        print(f"{self.COLORS['bold']}{self.COLORS['blue']}🔍 PyAnalyzer 代码分析报告{self.COLORS['reset']}")
-        print("="*80)
-        print(f"{self.COLORS['cyan']}生成时间: {self.timestamp}{self.COLORS['reset']}")
-        print(f"{self.COLORS['cyan']}配置文件: {self.config.get('__file__', '默认配置')}{self.COLORS['reset']}")
-        print("-"*80)
+        self._write("\n" + "="*80)
+        self._write(f"{self.COLORS['bold']}{self.COLORS['blue']}🔍 PyAnalyzer 代码分析报告{self.COLORS['reset']}")
+        self._write("="*80)
+        self._write(f"{self.COLORS['cyan']}生成时间: {self.timestamp}{self.COLORS['reset']}")
+        self._write(f"{self.COLORS['cyan']}配置文件: {self.config.get('__file__', '默认配置')}{self.COLORS['reset']}")
+        self._write("-"*80)
     
     def _print_summary(self):
         """打印摘要信息"""
         severity_counts = self._count_defects_by_severity()
         total_defects = len(self.defects)
         
-        print(f"\n{self.COLORS['bold']}📊 分析摘要{self.COLORS['reset']}")
-        print("-"*40)
+        self._write(f"\n{self.COLORS['bold']}📊 分析摘要{self.COLORS['reset']}")
+        self._write("-"*40)
         
         # 缺陷统计
-        print(f"{self.COLORS['white']}分析文件数: {len(self.metrics)}{self.COLORS['reset']}")
-        print(f"{self.COLORS['white']}发现缺陷总数: {total_defects}{self.COLORS['reset']}")
+        self._write(f"{self.COLORS['white']}分析文件数: {len(self.metrics)}{self.COLORS['reset']}")
+        self._write(f"{self.COLORS['white']}发现缺陷总数: {total_defects}{self.COLORS['reset']}")
         
         if total_defects > 0:
-            for severity in [Severity.CRITICAL, Severity.HIGH, Severity.MEDIUM, Severity.LOW]:
+            for severity, severity_name, color in _SEVERITY_ORDER:
                 count = severity_counts.get(severity, 0)
                 if count > 0:
-                    color = self.SEVERITY_COLORS.get(severity, self.COLORS['white'])
-                    severity_name = severity.value.upper()
-                    print(f"  {color}● {severity_name}: {count}{self.COLORS['reset']}")
+                    self._write(f"  {color}● {severity_name}: {count}{_RESET}")
         
         # 质量评分
         quality_score = self._calculate_quality_score()
@@ -87,78 +170,66 @@ class ConsoleReporter:
         elif quality_score < 80:
             quality_color = self.COLORS['yellow']
         
-        print(f"\n{self.COLORS['bold']}📈 质量评分: {quality_color}{quality_score:.1f}/100{self.COLORS['reset']}")
+        self._write(f"\n{self.COLORS['bold']}📈 质量评分: {quality_color}{quality_score:.1f}/100{self.COLORS['reset']}")
         
         if total_defects == 0:
-            print(f"\n{self.COLORS['green']}✅ 恭喜！未发现代码缺陷。{self.COLORS['reset']}")
+            self._write(f"\n{self.COLORS['green']}✅ 恭喜！未发现代码缺陷。{self.COLORS['reset']}")
     
     def _print_defects_table(self):
         """打印缺陷表格"""
         if not self.defects:
             return
         
-        print(f"\n{self.COLORS['bold']}🔎 缺陷详情{self.COLORS['reset']}")
-        print("-"*80)
-        
-        # 按文件分组缺陷
-        defects_by_file = {}
-        for defect in self.defects:
-            file_path = defect.file_path
-            if file_path not in defects_by_file:
-                defects_by_file[file_path] = []
-            defects_by_file[file_path].append(defect)
+        self._write(f"\n{self.COLORS['bold']}🔎 缺陷详情{self.COLORS['reset']}")
+        self._write("-"*80)
         
-        # 打印每个文件的缺陷
-        for file_path, defects in defects_by_file.items():
+        # 打印每个文件的缺陷（分组已在构造时完成）
+        for file_path, defects in self._defects_by_file.items():
             file_name = Path(file_path).name
-            print(f"\n{self.COLORS['underline']}{self.COLORS['white']}{file_name}{self.COLORS['reset']}")
+            self._write(f"\n{self.COLORS['underline']}{self.COLORS['white']}{file_name}{self.COLORS['reset']}")
             
             for defect in defects:
                 self._print_defect(defect)
     
     def _print_defect(self, defect: Defect):
         """打印单个缺陷"""
-        severity_color = self.SEVERITY_COLORS.get(defect.severity, self.COLORS['white'])
+        severity_tag = _SEVERITY_TAGS.get(defect.severity)
+        if severity_tag is None:
+            severity_tag = f"{_COLORS['white']}[{defect.severity.value.upper()}]{_RESET}"
         
-        # 缺陷标题
-        severity_str = defect.severity.value.upper()
-        print(f"\n  {severity_color}[{severity_str}]{self.COLORS['reset']} {defect.pattern}")
-        
-        # 缺陷详情
-        print(f"     {self.COLORS['yellow']}位置: {defect.file_path}:{defect.line}{self.COLORS['reset']}")
-        print(f"     {self.COLORS['white']}描述: {defect.description}{self.COLORS['reset']}")
+        # 缺陷标题与详情
+        lines = [
+            f"\n  {severity_tag} {defect.pattern}",
+            f"{_LOCATION_PREFIX}{defect.file_path}:{defect.line}{_RESET}",
+            f"{_DESCRIPTION_PREFIX}{defect.description}{_RESET}",
+        ]
         
         if defect.context:
             # 截断过长的上下文
             context = defect.context
             if len(context) > 100:
                 context = context[:97] + "..."
-            print(f"     {self.COLORS['cyan']}上下文: {context}{self.COLORS['reset']}")
+            lines.append(f"{_CONTEXT_PREFIX}{context}{_RESET}")
         
         if defect.suggestion:
-            print(f"     {self.COLORS['green']}建议: {defect.suggestion}{self.COLORS['reset']}")
+            lines.append(f"{_SUGGESTION_PREFIX}{defect.suggestion}{_RESET}")
+        
+        self._write("\n".join(lines))
     
     def _print_metrics(self):
         """打印代码指标"""
         if not self.metrics:
             return
         
-        print(f"\n{self.COLORS['bold']}📏 代码指标{self.COLORS['reset']}")
-        print("-"*40)
+        self._write(f"\n{self.COLORS['bold']}📏 代码指标{self.COLORS['reset']}")
+        self._write("-"*40)
         
-        # 计算总体指标
-        total_lines = sum(m.get("total_lines", 0) for m in self.metrics)
-        total_functions = sum(m.get("function_count", 0) for m in self.metrics)
-        total_classes = sum(m.get("class_count", 0) for m in self.metrics)
+        # 总体指标与平均复杂度已在构造时汇总
+        avg_complexity = self._avg_complexity
         
-        # 计算平均复杂度
-        complexities = [m.get("avg_cyclomatic_complexity", 0) 
-                       for m in self.metrics if m.get("avg_cyclomatic_complexity", 0) > 0]
-        avg_complexity = sum(complexities) / len(complexities) if complexities else 0
-        
-        print(f"{self.COLORS['white']}总代码行数: {total_lines}{self.COLORS['reset']}")
-        print(f"{self.COLORS['white']}函数数量: {total_functions}{self.COLORS['reset']}")
-        print(f"{self.COLORS['white']}类数量: {total_classes}{self.COLORS['reset']}")
+        self._write(f"{self.COLORS['white']}总代码行数: {self._total_lines}{self.COLORS['reset']}")
+        self._write(f"{self.COLORS['white']}函数数量: {self._total_functions}{self.COLORS['reset']}")
+        self._write(f"{self.COLORS['white']}类数量: {self._total_classes}{self.COLORS['reset']}")
         
         # 复杂度评估
         complexity_color = self.COLORS['green']
@@ -167,69 +238,53 @@ class ConsoleReporter:
         elif avg_complexity > 10:
             complexity_color = self.COLORS['yellow']
         
-        print(f"{self.COLORS['white']}平均圈复杂度: {complexity_color}{avg_complexity:.2f}{self.COLORS['reset']}")
+        self._write(f"{self.COLORS['white']}平均圈复杂度: {complexity_color}{avg_complexity:.2f}{self.COLORS['reset']}")
         
         # 复杂度解读
         if avg_complexity <= 10:
-            print(f"  {self.COLORS['green']}✓ 复杂度良好{self.COLORS['reset']}")
+            self._write(f"  {self.COLORS['green']}✓ 复杂度良好{self.COLORS['reset']}")
         elif avg_complexity <= 20:
-            print(f"  {self.COLORS['yellow']}⚠ 复杂度中等，建议重构{self.COLORS['reset']}")
+            self._write(f"  {self.COLORS['yellow']}⚠ 复杂度中等，建议重构{self.COLORS['reset']}")
         else:
-            print(f"  {self.COLORS['red']}✗ 复杂度过高，需要立即重构{self.COLORS['reset']}")
+            self._write(f"  {self.COLORS['red']}✗ 复杂度过高，需要立即重构{self.COLORS['reset']}")
     
     def _print_recommendations(self):
         """打印改进建议"""
         if not self.defects:
             return
         
-        print(f"\n{self.COLORS['bold']}💡 改进建议{self.COLORS['reset']}")
-        print("-"*40)
+        self._write(f"\n{self.COLORS['bold']}💡 改进建议{self.COLORS['reset']}")
+        self._write("-"*40)
         
         recommendations = self._generate_recommendations()
         
         for i, rec in enumerate(recommendations, 1):
-            print(f"{self.COLORS['white']}{i}. {rec}{self.COLORS['reset']}")
+            self._write(f"{self.COLORS['white']}{i}. {rec}{self.COLORS['reset']}")
     
     def _print_footer(self):
         """打印页脚"""
-        print("\n" + "="*80)
-        print(f"{self.COLORS['cyan']}分析完成！{self.COLORS['reset']}")
-        print(f"{self.COLORS['cyan']}使用 '--format html' 选项生成更详细的HTML报告{self.COLORS['reset']}")
-        print("="*80 + "\n")
+        self._write("\n" + "="*80)
+        self._write(f"{self.COLORS['cyan']}分析完成！{self.COLORS['reset']}")
+        self._write(f"{self.COLORS['cyan']}使用 '--format html' 选项生成更详细的HTML报告{self.COLORS['reset']}")
+        self._write("="*80 + "\n")
     
     def _count_defects_by_severity(self) -> Dict[Severity, int]:
         """按严重程度统计缺陷"""
-        counts = {}
-        for defect in self.defects:
-            sev = defect.severity
-            counts[sev] = counts.get(sev, 0) + 1
-        return counts
+        return self._severity_counts
     
     def _calculate_quality_score(self) -> float:
         """计算质量分数"""
         if not self.defects:
             return 100.0
         
-        # 基于缺陷数量和质量计算分数
-        total_defects = len(self.defects)
-        severity_counts = self._count_defects_by_severity()
-        
-        # 严重程度权重
-        severity_weights = {
-            Severity.CRITICAL: 10,
-            Severity.HIGH: 5,
-            Severity.MEDIUM: 2,
-            Severity.LOW: 1,
-        }
-        
-        # 计算加权缺陷分数
+        # 基于缺陷严重程度计算加权缺陷分数（计数已在构造时统计）
         weighted_score = sum(
-            count * severity_weights.get(severity, 1)
-            for severity, count in severity_counts.items()
+            self._severity_counts.get(severity, 0) * weight
+            for severity, weight in _SEVERITY_WEIGHTS
         )
         
         # 基于代码量归一化
-        total_lines = sum(m.get("total_lines", 0) for m in self.metrics)
+        total_lines = self._total_lines
         if total_lines == 0:
             total_lines = 1
         
@@ -254,30 +309,14 @@ class ConsoleReporter:
             recommendations.append("优先修复高危缺陷（空指针、资源泄漏、除以零等）")
         
         # 按缺陷模式建议
-        pattern_counts = {}
-        for defect in self.defects:
-            pattern = defect.pattern
-            pattern_counts[pattern] = pattern_counts.get(pattern, 0) + 1
-        
-        if "hardcoded_password" in pattern_counts:
-            recommendations.append("移除硬编码的密码和密钥，使用环境变量")
-        
-        if "sql_injection" in pattern_counts:
-            recommendations.append("修复SQL注入漏洞，使用参数化查询")
-        
-        if "null_dereference" in pattern_counts:
-            recommendations.append("添加空值检查，使用Optional类型提示")
-        
-        if "resource_leak" in pattern_counts:
-            recommendations.append("确保所有资源都正确关闭，使用with语句")
+        pattern_counts = self._pattern_counts
+        recommendations.extend(
+            advice for pattern, advice in _PATTERN_ADVICE if pattern in pattern_counts
+        )
         
         # 基于指标的建议
         if self.metrics:
-            complexities = [m.get("avg_cyclomatic_complexity", 0) 
-                          for m in self.metrics if m.get("avg_cyclomatic_complexity", 0) > 0]
-            avg_complexity = sum(complexities) / len(complexities) if complexities else 0
-            
-            if avg_complexity > 10:
+            if self._avg_complexity > 10:
                 recommendations.append("重构高复杂度函数，降低圈复杂度")
         
         # 通用建议
@@ -289,19 +328,18 @@ class ConsoleReporter:
     
     def print_simple(self):
         """打印简化版报告"""
-        total_defects = len(self.defects)
-        
-        if total_defects == 0:
-            print(f"{self.COLORS['green']}✅ 未发现缺陷{self.COLORS['reset']}")
-            return
-        
-        severity_counts = self._count_defects_by_severity()
-        
-        print(f"{self.COLORS['yellow']}⚠ 发现 {total_defects} 个缺陷:{self.COLORS['reset']}")
-        
-        for severity in [Severity.CRITICAL, Severity.HIGH, Severity.MEDIUM, Severity.LOW]:
-            count = severity_counts.get(severity, 0)
-            if count > 0:
-                color = self.SEVERITY_COLORS.get(severity, self.COLORS['white'])
-                severity_name = severity.value.upper()
-                print(f"  {color}{severity_name}: {count}{self.COLORS['reset']}")
\ No newline at end of file
+        with self._buffered_output():
+            total_defects = len(self.defects)
+            
+            if total_defects == 0:
+                self._write(f"{self.COLORS['green']}✅ 未发现缺陷{self.COLORS['reset']}")
+                return
+            
+            severity_counts = self._count_defects_by_severity()
+            
+            self._write(f"{self.COLORS['yellow']}⚠ 发现 {total_defects} 个缺陷:{self.COLORS['reset']}")
+            
+            for severity, severity_name, color in _SEVERITY_ORDER:
+                count = severity_counts.get(severity, 0)
+                if count > 0:
+                    self._write(f"  {color}{severity_name}: {count}{_RESET}")
\ No newline at end of file
@@ -3,47 +3,46 @@ HTML报告生成器
 """
 
 import os
-import json
+from collections import Counter
 from datetime import datetime
-from typing import List, Dict, Any
+from functools import cached_property
+from html import escape as _escape_html
+from operator import attrgetter
+from typing import Iterator, List, Dict, Any
 from pathlib import Path
 
 from pyanalyzer.patterns.base_patterns import Defect, Severity
+from pyanalyzer.utils.file_utils import dumps_json_compact, write_json_file
+from pyanalyzer.utils.metrics import aggregate_project_metrics
 
 
-class HTMLReporter:
-    """HTML报告生成器"""
-    
-    def __init__(self, defects: List[Defect], metrics: List[Dict], config: Dict):
-        self.defects = defects
-        self.metrics = metrics
-        self.config = config
-        self.timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-    def generate(self, output_dir: str) -> str:
-        """生成HTML报告"""
-        # 创建输出目录
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # 生成报告内容
-        html_content = self._generate_html()
-        
-        # 写入文件
-        output_path = Path(output_dir) / "analysis_report.html"
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(html_content)
-        
-        # 生成JSON数据供JavaScript使用
-        self._generate_json_data(output_dir)
-        
-        return str(output_path)
-    
-    def _generate_html(self) -> str:
-        """生成完整的HTML页面"""
-        severity_counts = self._count_defects_by_severity()
-        pattern_counts = self._count_defects_by_pattern()
-        
-        html = f"""<!DOCTYPE html>
+# 统计时按属性取值，避免生成器逐个缺陷的解释器开销
+_severity_value = attrgetter("severity.value")
+_pattern_name = attrgetter("pattern")
+
+
+# 缺陷表格中各严重程度的(样式类, 标签文字)
+_SEVERITY_BADGES = {
+    severity: (f"badge-{severity.value}", severity.value.upper())
+    for severity in Severity
+}
+
+# 缺陷表格行模板，填入的报告文本需先经过HTML转义
+_DEFECT_ROW_TEMPLATE = """
+                <tr class="defect-row" data-defect-id="%d">
+                    <td><span class="severity-badge %s">%s</span></td>
+                    <td><strong>%s</strong></td>
+                    <td>%s</td>
+                    <td>%s:%s</td>
+                    <td>%s</td>
+                </tr>
+            """
+
+# 写入HTML报告时的文件缓冲区大小
+_WRITE_BUFFER_SIZE = 1 << 17
+
+# 页面中不随报告变化的部分，模块加载时构造一次
+_HTML_HEAD = """<!DOCTYPE html>
 <html lang="zh-CN">
 <head>
     <meta charset="UTF-8">
@@ -51,47 +50,47 @@ class HTMLReporter:
     <title>PyAnalyzer - Python代码分析报告</title>
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <style>
-        * {{
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
         
-        body {{
+        body {
             font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
             line-height: 1.6;
             color: #333;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             min-height: 100vh;
-        }}
+        }
         
-        .container {{
+        .container {
             max-width: 1200px;
             margin: 0 auto;
             padding: 20px;
-        }}
+        }
         
-        .header {{
+        .header {
             background: white;
             padding: 30px;
             border-radius: 10px;
             box-shadow: 0 4px 6px rgba(0,0,0,0.1);
             margin-bottom: 30px;
             text-align: center;
-        }}
+        }
         
-        .header h1 {{
+        .header h1 {
             color: #2c3e50;
             margin-bottom: 10px;
             font-size: 2.5em;
-        }}
+        }
         
-        .subtitle {{
+        .subtitle {
             color: #7f8c8d;
             font-size: 1.1em;
-        }}
+        }
         
-        .timestamp {{
+        .timestamp {
             background: #3498db;
             color: white;
             padding: 10px 20px;
@@ -99,183 +98,183 @@ class HTMLReporter:
             display: inline-block;
             margin-top: 10px;
             font-weight: bold;
-        }}
+        }
         
-        .dashboard {{
+        .dashboard {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(300px, 1fr));
             gap: 20px;
             margin-bottom: 30px;
-        }}
+        }
         
-        .card {{
+        .card {
             background: white;
             padding: 25px;
             border-radius: 10px;
             box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        }}
+        }
         
-        .card h2 {{
+        .card h2 {
             color: #2c3e50;
             margin-bottom: 20px;
             padding-bottom: 10px;
             border-bottom: 2px solid #f8f9fa;
             font-size: 1.4em;
-        }}
+        }
         
-        .stats-grid {{
+        .stats-grid {
             display: grid;
             grid-template-columns: repeat(2, 1fr);
             gap: 15px;
-        }}
+        }
         
-        .stat-item {{
+        .stat-item {
             text-align: center;
             padding: 15px;
             border-radius: 8px;
             background: #f8f9fa;
-        }}
+        }
         
-        .stat-value {{
+        .stat-value {
             font-size: 2em;
             font-weight: bold;
             margin-bottom: 5px;
-        }}
+        }
         
-        .stat-label {{
+        .stat-label {
             color: #7f8c8d;
             font-size: 0.9em;
-        }}
+        }
         
-        .severity-critical {{ color: #e74c3c; }}
-        .severity-high {{ color: #e67e22; }}
-        .severity-medium {{ color: #f1c40f; }}
-        .severity-low {{ color: #3498db; }}
+        .severity-critical { color: #e74c3c; }
+        .severity-high { color: #e67e22; }
+        .severity-medium { color: #f1c40f; }
+        .severity-low { color: #3498db; }
         
-        .defects-table {{
+        .defects-table {
             width: 100%;
             border-collapse: collapse;
             margin-top: 20px;
-        }}
+        }
         
-        .defects-table th {{
+        .defects-table th {
             background: #2c3e50;
             color: white;
             padding: 15px;
             text-align: left;
             font-weight: 600;
-        }}
+        }
         
-        .defects-table td {{
+        .defects-table td {
             padding: 12px 15px;
             border-bottom: 1px solid #eee;
-        }}
+        }
         
-        .defects-table tr:hover {{
+        .defects-table tr:hover {
             background: #f8f9fa;
-        }}
+        }
         
-        .severity-badge {{
+        .severity-badge {
             padding: 5px 10px;
             border-radius: 20px;
             font-size: 0.8em;
             font-weight: bold;
             text-transform: uppercase;
-        }}
+        }
         
-        .badge-critical {{ background: #e74c3c; color: white; }}
-        .badge-high {{ background: #e67e22; color: white; }}
-        .badge-medium {{ background: #f1c40f; color: white; }}
-        .badge-low {{ background: #3498db; color: white; }}
+        .badge-critical { background: #e74c3c; color: white; }
+        .badge-high { background: #e67e22; color: white; }
+        .badge-medium { background: #f1c40f; color: white; }
+        .badge-low { background: #3498db; color: white; }
         
-        .chart-container {{
+        .chart-container {
             position: relative;
             height: 300px;
             margin-top: 20px;
-        }}
+        }
         
-        .metrics-grid {{
+        .metrics-grid {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
             gap: 15px;
             margin-top: 20px;
-        }}
+        }
         
-        .metric-card {{
+        .metric-card {
             background: #f8f9fa;
             padding: 15px;
             border-radius: 8px;
             border-left: 4px solid #3498db;
-        }}
+        }
         
-        .metric-name {{
+        .metric-name {
             font-weight: bold;
             color: #2c3e50;
             margin-bottom: 5px;
-        }}
+        }
         
-        .metric-value {{
+        .metric-value {
             font-size: 1.5em;
             color: #3498db;
-        }}
+        }
         
-        .summary {{
+        .summary {
             margin-top: 30px;
             padding: 20px;
             background: linear-gradient(135deg, #1abc9c, #16a085);
             color: white;
             border-radius: 10px;
             text-align: center;
-        }}
+        }
         
-        .summary h2 {{
+        .summary h2 {
             margin-bottom: 15px;
             font-size: 1.8em;
-        }}
+        }
         
-        .recommendations {{
+        .recommendations {
             margin-top: 30px;
             padding: 20px;
             background: white;
             border-radius: 10px;
             box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        }}
+        }
         
-        .recommendations ul {{
+        .recommendations ul {
             padding-left: 20px;
-        }}
+        }
         
-        .recommendations li {{
+        .recommendations li {
             margin-bottom: 10px;
             padding-left: 10px;
-        }}
+        }
         
-        .footer {{
+        .footer {
             text-align: center;
             padding: 20px;
             color: white;
             margin-top: 30px;
             font-size: 0.9em;
-        }}
+        }
         
-        @media (max-width: 768px) {{
-            .container {{
+        @media (max-width: 768px) {
+            .container {
                 padding: 10px;
-            }}
+            }
             
-            .dashboard {{
+            .dashboard {
                 grid-template-columns: 1fr;
-            }}
+            }
             
-            .stats-grid {{
+            .stats-grid {
                 grid-template-columns: 1fr;
-            }}
+            }
             
-            .defects-table {{
+            .defects-table {
                 display: block;
                 overflow-x: auto;
-            }}
-        }}
+            }
+        }
     </style>
 </head>
 <body>
@@ -283,7 +282,161 @@ class HTMLReporter:
         <div class="header">
             <h1>🔍 PyAnalyzer 代码分析报告</h1>
             <p class="subtitle">基于AST与符号执行的Python代码缺陷检测</p>
-            <div class="timestamp">生成时间: {self.timestamp}</div>
+            <div class="timestamp">生成时间: """
+
+_HTML_SCRIPT_HEAD = """    <script>
+        // 图表数据
+        const patternData = """
+
+_HTML_SCRIPT = """;
+        
+        // 准备图表数据
+        const labels = Object.keys(patternData);
+        const data = Object.values(patternData);
+        const colors = [
+            '#e74c3c', '#e67e22', '#f1c40f', '#2ecc71', 
+            '#3498db', '#9b59b6', '#1abc9c', '#34495e'
+        ];
+        
+        // 缺陷分布图表
+        const defectsChart = new Chart(
+            document.getElementById('defectsChart'),
+            {
+                type: 'doughnut',
+                data: {
+                    labels: labels,
+                    datasets: [{
+                        data: data,
+                        backgroundColor: colors,
+                        borderWidth: 1,
+                        borderColor: '#fff'
+                    }]
+                },
+                options: {
+                    responsive: true,
+                    maintainAspectRatio: false,
+                    plugins: {
+                        legend: {
+                            position: 'right',
+                            labels: {
+                                padding: 20,
+                                font: {
+                                    size: 12
+                                }
+                            }
+                        },
+                        tooltip: {
+                            callbacks: {
+                                label: function(context) {
+                                    const label = context.label || '';
+                                    const value = context.raw || 0;
+                                    const total = context.dataset.data.reduce((a, b) => a + b, 0);
+                                    const percentage = Math.round((value / total) * 100);
+                                    return `${label}: ${value} (${percentage}%)`;
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        );
+        
+        // 点击缺陷行显示详情
+        document.querySelectorAll('.defect-row').forEach(row => {
+            row.addEventListener('click', function() {
+                const defectId = this.dataset.defectId;
+                const modal = document.getElementById(`defect-modal-${defectId}`);
+                if (modal) {
+                    modal.style.display = 'block';
+                }
+            });
+        });
+        
+        // 关闭模态框
+        document.querySelectorAll('.close-modal').forEach(btn => {
+            btn.addEventListener('click', function() {
+                this.closest('.modal').style.display = 'none';
+            });
+        });
+    </script>
+</body>
+</html>
+"""
+
+_CHART_HTML = """<div class="chart-container">
+                    <canvas id="defectsChart"></canvas>
+                </div>"""
+
+# 无缺陷时的图表位置占位，不再输出画布和图表数据
+_EMPTY_CHART_HTML = '<p style="text-align: center; padding: 20px; color: #27ae60;">暂无缺陷数据</p>'
+
+_HTML_TAIL = """</body>
+</html>
+"""
+
+# 与缺陷统计无关的通用建议，始终附在建议列表末尾
+_GENERIC_RECOMMENDATIONS = (
+    "<li>定期运行代码分析，建立代码质量检查流程</li>\n"
+    "<li>考虑使用CI/CD集成代码分析工具</li>"
+)
+
+_DEFECTS_TABLE_HEAD = """
+        <table class="defects-table">
+            <thead>
+                <tr>
+                    <th>严重程度</th>
+                    <th>模式</th>
+                    <th>描述</th>
+                    <th>位置</th>
+                    <th>建议</th>
+                </tr>
+            </thead>
+            <tbody>
+                """
+
+_DEFECTS_TABLE_TAIL = """
+            </tbody>
+        </table>
+        """
+
+
+class HTMLReporter:
+    """HTML报告生成器"""
+    
+    def __init__(self, defects: List[Defect], metrics: List[Dict], config: Dict):
+        self.defects = defects
+        self.metrics = metrics
+        self.config = config
+        # 缺陷统计结果，各报告段共享，首次使用时计算
+        self._severity_counts = None
+        self._pattern_counts = None
+        
+    @cached_property
+    def timestamp(self) -> str:
+        """报告生成时间，首次使用时（即生成报告时）才取当前时间"""
+        return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    
+    def generate(self, output_dir: str) -> str:
+        """生成HTML报告"""
+        # 创建输出目录
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # 按段写入带缓冲的文件，不在内存中拼出完整页面
+        output_path = Path(output_dir) / "analysis_report.html"
+        with open(output_path, 'w', encoding='utf-8', buffering=_WRITE_BUFFER_SIZE) as f:
+            f.writelines(self._iter_html())
+        
+        # 生成JSON数据供JavaScript使用
+        self._generate_json_data(output_dir)
+        
+        return str(output_path)
+    
+    def _iter_html(self) -> Iterator[str]:
+        """按段生成完整的HTML页面，静态的头部样式和脚本直接取模块常量"""
+        severity_counts = self._count_defects_by_severity()
+        
+        yield _HTML_HEAD
+        yield f"""{self.timestamp}</div>
         </div>
         
         <div class="dashboard">
@@ -311,9 +464,7 @@ class HTMLReporter:
             
             <div class="card">
                 <h2>📈 缺陷分布</h2>
-                <div class="chart-container">
-                    <canvas id="defectsChart"></canvas>
-                </div>
+                {_CHART_HTML if self.defects else _EMPTY_CHART_HTML}
             </div>
             
             <div class="card">
@@ -337,7 +488,9 @@ class HTMLReporter:
         
         <div class="card">
             <h2>🔎 缺陷详情</h2>
-            {self._generate_defects_table()}
+            """
+        yield from self._iter_defects_table()
+        yield f"""
         </div>
         
         {self._generate_metrics_section()}
@@ -360,152 +513,66 @@ class HTMLReporter:
         </div>
     </div>
     
-    <script>
-        // 图表数据
-        const patternData = {json.dumps(pattern_counts)};
-        
-        // 准备图表数据
-        const labels = Object.keys(patternData);
-        const data = Object.values(patternData);
-        const colors = [
-            '#e74c3c', '#e67e22', '#f1c40f', '#2ecc71', 
-            '#3498db', '#9b59b6', '#1abc9c', '#34495e'
-        ];
-        
-        // 缺陷分布图表
-        const defectsChart = new Chart(
-            document.getElementById('defectsChart'),
-            {{
-                type: 'doughnut',
-                data: {{
-                    labels: labels,
-                    datasets: [{{
-                        data: data,
-                        backgroundColor: colors,
-                        borderWidth: 1,
-                        borderColor: '#fff'
-                    }}]
-                }},
-                options: {{
-                    responsive: true,
-                    maintainAspectRatio: false,
-                    plugins: {{
-                        legend: {{
-                            position: 'right',
-                            labels: {{
-                                padding: 20,
-                                font: {{
-                                    size: 12
-                                }}
-                            }}
-                        }},
-                        tooltip: {{
-                            callbacks: {{
-                                label: function(context) {{
-                                    const label = context.label || '';
-                                    const value = context.raw || 0;
-                                    const total = context.dataset.data.reduce((a, b) => a + b, 0);
-                                    const percentage = Math.round((value / total) * 100);
-                                    return `${{label}}: ${{value}} (${{percentage}}%)`;
-                                }}
-                            }}
-                        }}
-                    }}
-                }}
-            }}
-        );
-        
-        // 点击缺陷行显示详情
-        document.querySelectorAll('.defect-row').forEach(row => {{
-            row.addEventListener('click', function() {{
-                const defectId = this.dataset.defectId;
-                const modal = document.getElementById(`defect-modal-${{defectId}}`);
-                if (modal) {{
-                    modal.style.display = 'block';
-                }}
-            }});
-        }});
-        
-        // 关闭模态框
-        document.querySelectorAll('.close-modal').forEach(btn => {{
-            btn.addEventListener('click', function() {{
-                this.closest('.modal').style.display = 'none';
-            }});
-        }});
-    </script>
-</body>
-</html>
 """
-        
-        return html
+        if not self.defects:
+            # 无缺陷时没有图表和缺陷行，整段脚本都不需要
+            yield _HTML_TAIL
+            return
+        
+        # 图表数据在模板外单独序列化，脚本前后两段都是静态常量
+        chart_json = dumps_json_compact(self._count_defects_by_pattern())
+        yield _HTML_SCRIPT_HEAD
+        yield chart_json
+        yield _HTML_SCRIPT
     
     def _count_defects_by_severity(self) -> Dict[str, int]:
-        """按严重程度统计缺陷"""
-        counts = {}
-        for defect in self.defects:
-            sev = defect.severity.value
-            counts[sev] = counts.get(sev, 0) + 1
-        return counts
+        """按严重程度统计缺陷（首次调用时统计，之后复用）"""
+        if self._severity_counts is None:
+            self._severity_counts = Counter(map(_severity_value, self.defects))
+        return self._severity_counts
     
     def _count_defects_by_pattern(self) -> Dict[str, int]:
-        """按模式统计缺陷"""
-        counts = {}
-        for defect in self.defects:
-            pattern = defect.pattern
-            counts[pattern] = counts.get(pattern, 0) + 1
-        return counts
+        """按模式统计缺陷（首次调用时统计，之后复用）"""
+        if self._pattern_counts is None:
+            self._pattern_counts = Counter(map(_pattern_name, self.defects))
+        return self._pattern_counts
     
-    def _generate_defects_table(self) -> str:
-        """生成缺陷表格"""
+    def _iter_defects_table(self) -> Iterator[str]:
+        """按行生成缺陷表格"""
         if not self.defects:
-            return '<p style="text-align: center; padding: 20px; color: #27ae60;">🎉 未发现缺陷！</p>'
+            yield '<p style="text-align: center; padding: 20px; color: #27ae60;">🎉 未发现缺陷！</p>'
+            return
         
-        rows = []
+        yield _DEFECTS_TABLE_HEAD
+        # 同一文件的缺陷共用文件名，按路径缓存（已转义），避免逐行构造Path
+        file_names: Dict[str, str] = {}
+        escape = _escape_html
         for i, defect in enumerate(self.defects):
-            severity_class = f"badge-{defect.severity.value}"
-            rows.append(f"""
-                <tr class="defect-row" data-defect-id="{i}">
-                    <td><span class="severity-badge {severity_class}">{defect.severity.value.upper()}</span></td>
-                    <td><strong>{defect.pattern}</strong></td>
-                    <td>{defect.description}</td>
-                    <td>{Path(defect.file_path).name}:{defect.line}</td>
-                    <td>{defect.suggestion or '无'}</td>
-                </tr>
-            """)
-        
-        table = f"""
-        <table class="defects-table">
-            <thead>
-                <tr>
-                    <th>严重程度</th>
-                    <th>模式</th>
-                    <th>描述</th>
-                    <th>位置</th>
-                    <th>建议</th>
-                </tr>
-            </thead>
-            <tbody>
-                {''.join(rows)}
-            </tbody>
-        </table>
-        """
-        
-        return table
+            severity_class, severity_label = _SEVERITY_BADGES[defect.severity]
+            file_name = file_names.get(defect.file_path)
+            if file_name is None:
+                file_name = escape(os.path.basename(defect.file_path))
+                file_names[defect.file_path] = file_name
+            yield _DEFECT_ROW_TEMPLATE % (
+                i, severity_class, severity_label,
+                escape(defect.pattern),
+                escape(defect.description),
+                file_name, defect.line,
+                escape(defect.suggestion or '无'),
+            )
+        yield _DEFECTS_TABLE_TAIL
     
     def _generate_metrics_section(self) -> str:
         """生成指标部分"""
         if not self.metrics:
             return ""
         
-        # 计算总体指标
-        total_lines = sum(m.get('total_lines', 0) for m in self.metrics)
-        total_functions = sum(m.get('function_count', 0) for m in self.metrics)
-        total_classes = sum(m.get('class_count', 0) for m in self.metrics)
-        
-        avg_complexity = 0
-        complexities = [m.get('avg_cyclomatic_complexity', 0) for m in self.metrics if m.get('avg_cyclomatic_complexity', 0) > 0]
-        if complexities:
-            avg_complexity = sum(complexities) / len(complexities)
+        # 单次遍历汇总总体指标
+        project_metrics = aggregate_project_metrics(self.metrics)
+        total_lines = project_metrics["total_lines"]
+        total_functions = project_metrics["total_functions"]
+        total_classes = project_metrics["total_classes"]
+        avg_complexity = project_metrics["avg_cyclomatic_complexity"]
         
         return f"""
         <div class="card">
@@ -533,6 +600,9 @@ class HTMLReporter:
     
     def _generate_recommendations(self) -> str:
         """生成改进建议"""
+        if not self.defects:
+            return _GENERIC_RECOMMENDATIONS
+        
         recommendations = []
         
         severity_counts = self._count_defects_by_severity()
@@ -543,17 +613,18 @@ class HTMLReporter:
         if severity_counts.get('high', 0) > 0:
             recommendations.append("<li>优先处理<strong>高危</strong>缺陷，如空指针解引用和除以零</li>")
         
-        if any('unused' in pattern for pattern in self._count_defects_by_pattern().keys()):
+        pattern_counts = self._count_defects_by_pattern()
+        
+        if any('unused' in pattern for pattern in pattern_counts):
             recommendations.append("<li>清理未使用的变量和导入，提高代码可读性</li>")
         
-        if any('missing_type_hints' == pattern for pattern in self._count_defects_by_pattern().keys()):
+        if 'missing_type_hints' in pattern_counts:
             recommendations.append("<li>为关键函数添加类型注解，提高代码可维护性</li>")
         
-        if any('long_function' == pattern for pattern in self._count_defects_by_pattern().keys()):
+        if 'long_function' in pattern_counts:
             recommendations.append("<li>重构过长的函数，遵循单一职责原则</li>")
         
-        recommendations.append("<li>定期运行代码分析，建立代码质量检查流程</li>")
-        recommendations.append("<li>考虑使用CI/CD集成代码分析工具</li>")
+        recommendations.append(_GENERIC_RECOMMENDATIONS)
         
         return '\n'.join(recommendations)
     
@@ -580,5 +651,4 @@ class HTMLReporter:
         }
         
         json_path = Path(output_dir) / "analysis_data.json"
-        with open(json_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
\ No newline at end of file
+        write_json_file(data, json_path)
\ No newline at end of file
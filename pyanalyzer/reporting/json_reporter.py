@@ -2,13 +2,22 @@
 JSON报告生成器
 """
 
-import json
 import os
+from collections import Counter
 from datetime import datetime
+from functools import cached_property
+from operator import attrgetter
 from typing import List, Dict, Any
 from pathlib import Path
 
 from pyanalyzer.patterns.base_patterns import Defect
+from pyanalyzer.utils.file_utils import write_json_file
+from pyanalyzer.utils.metrics import aggregate_project_metrics
+
+
+# 统计时按属性取值，避免生成器逐个缺陷的解释器开销
+_severity_value = attrgetter("severity.value")
+_pattern_name = attrgetter("pattern")
 
 
 class JSONReporter:
@@ -18,8 +27,17 @@ class JSONReporter:
         self.defects = defects
         self.metrics = metrics
         self.config = config
-        self.timestamp = datetime.now().isoformat()
-        
+        # 缺陷统计结果，各报告段共享，首次使用时计算
+        self._severity_counts = None
+        self._pattern_counts = None
+        # 完整报告数据，生成报告与统计数据共享
+        self._report_data = None
+        
+    @cached_property
+    def timestamp(self) -> str:
+        """报告生成时间，首次使用时（即生成报告时）才取当前时间"""
+        return datetime.now().isoformat()
+    
     def generate(self, output_dir: str) -> str:
         """生成JSON报告"""
         # 创建输出目录
@@ -29,20 +47,25 @@ class JSONReporter:
         report_data = self._generate_report_data()
         
         # 写入文件
-        output_path = Path(output_dir) / "analysis_report.json"
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(report_data, f, indent=2, ensure_ascii=False)
+        output_dir = Path(output_dir)
+        output_path = output_dir / "analysis_report.json"
+        write_json_file(report_data, output_path)
         
         # 生成摘要文件
-        summary_path = Path(output_dir) / "summary.json"
+        summary_path = output_dir / "summary.json"
         summary_data = self._generate_summary_data(report_data)
-        with open(summary_path, 'w', encoding='utf-8') as f:
-            json.dump(summary_data, f, indent=2, ensure_ascii=False)
+        write_json_file(summary_data, summary_path)
         
         return str(output_path)
     
     def _generate_report_data(self) -> Dict[str, Any]:
-        """生成完整的报告数据"""
+        """生成完整的报告数据（首次调用时生成，之后复用）"""
+        if self._report_data is None:
+            self._report_data = self._build_report_data()
+        return self._report_data
+    
+    def _build_report_data(self) -> Dict[str, Any]:
+        """构造完整的报告数据"""
         # 按文件分组缺陷
         defects_by_file = {}
         for defect in self.defects:
@@ -83,18 +106,7 @@ class JSONReporter:
             },
             "defects": {
                 "by_file": defects_by_file,
-                "all": [
-                    {
-                        "id": i,
-                        "pattern": d.pattern,
-                        "description": d.description,
-                        "severity": d.severity.value,
-                        "file": d.file_path,
-                        "line": d.line,
-                        "suggestion": d.suggestion
-                    }
-                    for i, d in enumerate(self.defects)
-                ]
+                "all": self._generate_all_defects_data()
             },
             "metrics": {
                 "files": self.metrics,
@@ -109,17 +121,43 @@ class JSONReporter:
         
         return report_data
     
+    def _generate_all_defects_data(self) -> Any:
+        """生成全部缺陷列表
+        
+        默认按字段分列输出（各字段一个列表，下标即缺陷编号），不为每个缺陷构造字典；
+        配置reporting.row_oriented为真时输出逐条缺陷的字典列表
+        """
+        defects = self.defects
+        if self.config.get("reporting", {}).get("row_oriented", False):
+            return [
+                {
+                    "id": i,
+                    "pattern": d.pattern,
+                    "description": d.description,
+                    "severity": d.severity.value,
+                    "file": d.file_path,
+                    "line": d.line,
+                    "suggestion": d.suggestion
+                }
+                for i, d in enumerate(defects)
+            ]
+        
+        return {
+            "pattern": [d.pattern for d in defects],
+            "description": [d.description for d in defects],
+            "severity": [d.severity.value for d in defects],
+            "file": [d.file_path for d in defects],
+            "line": [d.line for d in defects],
+            "suggestion": [d.suggestion for d in defects]
+        }
+    
     def _generate_summary_data(self, report_data: Dict) -> Dict[str, Any]:
         """生成摘要数据"""
         summary = {
             "timestamp": self.timestamp,
             "total_defects": report_data["summary"]["total_defects"],
             "severity_summary": report_data["summary"]["severity_distribution"],
-            "top_patterns": dict(sorted(
-                report_data["summary"]["pattern_distribution"].items(),
-                key=lambda x: x[1],
-                reverse=True
-            )[:5]),
+            "top_patterns": dict(self._count_defects_by_pattern().most_common(5)),
             "files_with_defects": len(report_data["defects"]["by_file"]),
             "total_files_analyzed": report_data["summary"]["files_analyzed"],
             "key_metrics": {
@@ -135,48 +173,22 @@ class JSONReporter:
         return summary
     
     def _count_defects_by_severity(self) -> Dict[str, int]:
-        """按严重程度统计缺陷"""
-        counts = {}
-        for defect in self.defects:
-            sev = defect.severity.value
-            counts[sev] = counts.get(sev, 0) + 1
-        return counts
+        """按严重程度统计缺陷（首次调用时统计，之后复用）"""
+        if self._severity_counts is None:
+            self._severity_counts = Counter(map(_severity_value, self.defects))
+        return self._severity_counts
     
     def _count_defects_by_pattern(self) -> Dict[str, int]:
-        """按模式统计缺陷"""
-        counts = {}
-        for defect in self.defects:
-            pattern = defect.pattern
-            counts[pattern] = counts.get(pattern, 0) + 1
-        return counts
+        """按模式统计缺陷（首次调用时统计，之后复用）"""
+        if self._pattern_counts is None:
+            self._pattern_counts = Counter(map(_pattern_name, self.defects))
+        return self._pattern_counts
     
     def _calculate_project_metrics(self) -> Dict[str, Any]:
         """计算项目级指标"""
         if not self.metrics:
             return {}
-        
-        total_lines = sum(m.get("total_lines", 0) for m in self.metrics)
-        total_functions = sum(m.get("function_count", 0) for m in self.metrics)
-        total_classes = sum(m.get("class_count", 0) for m in self.metrics)
-        
-        # 计算平均复杂度
-        complexities = [m.get("avg_cyclomatic_complexity", 0) 
-                       for m in self.metrics if m.get("avg_cyclomatic_complexity", 0) > 0]
-        avg_complexity = sum(complexities) / len(complexities) if complexities else 0
-        
-        # 计算平均函数长度
-        func_lengths = [m.get("avg_function_length", 0) 
-                       for m in self.metrics if m.get("avg_function_length", 0) > 0]
-        avg_function_length = sum(func_lengths) / len(func_lengths) if func_lengths else 0
-        
-        return {
-            "total_lines": total_lines,
-            "total_functions": total_functions,
-            "total_classes": total_classes,
-            "avg_cyclomatic_complexity": avg_complexity,
-            "avg_function_length": avg_function_length,
-            "files_analyzed": len(self.metrics)
-        }
+        return aggregate_project_metrics(self.metrics)
     
     def _generate_recommendations(self, report_data: Dict) -> List[str]:
         """生成改进建议"""
@@ -217,17 +229,19 @@ class JSONReporter:
     
     def generate_statistics(self) -> Dict[str, Any]:
         """生成统计数据"""
-        report_data = self._generate_report_data()
-        
         stats = {
             "defect_density": 0,
             "quality_score": 100,
             "risk_level": "low"
         }
         
+        # 只需总行数、缺陷数和严重程度分布，直接计算而不构造完整报告数据
         # 计算缺陷密度（每千行代码的缺陷数）
-        total_lines = report_data["summary"]["project_metrics"].get("total_lines", 1)
-        total_defects = report_data["summary"]["total_defects"]
+        if self.metrics:
+            total_lines = sum(m.get("total_lines", 0) for m in self.metrics)
+        else:
+            total_lines = 1
+        total_defects = len(self.defects)
         
         if total_lines > 0:
             stats["defect_density"] = (total_defects / total_lines) * 1000
@@ -242,7 +256,7 @@ class JSONReporter:
         
         severity_scores = sum(
             count * severity_weights.get(severity, 1)
-            for severity, count in report_data["summary"]["severity_distribution"].items()
+            for severity, count in self._count_defects_by_severity().items()
         )
         
         # 基于代码量和缺陷严重程度计算质量分数
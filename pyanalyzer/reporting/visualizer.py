@@ -3,13 +3,151 @@
 """
 
 import ast
-import matplotlib.pyplot as plt
-import networkx as nx
-from typing import Dict, List, Any, Optional
+import os
+from collections import defaultdict
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple
+from datetime import datetime
 from pathlib import Path
+from string import Template
 
-import matplotlib
-matplotlib.use('Agg')  # 使用非交互式后端
+from pyanalyzer.utils.ast_utils import parse_file
+from pyanalyzer.utils.parallel import parallel_map
+
+# matplotlib、networkx和numpy导入耗时且占内存，在首次绘图时才导入
+if TYPE_CHECKING:
+    import networkx as nx
+    from matplotlib.figure import Figure
+
+# PNG编码参数：图表以大片纯色背景为主，较低的zlib压缩级别编码快得多，文件只略大
+_PNG_PIL_KWARGS = {'compress_level': 3}
+
+# 摘要页模板，CSS中的花括号无需转义，只替换少量动态字段
+_SUMMARY_PAGE = Template("""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>代码分析可视化摘要 - $file_name</title>
+            <style>
+                body { font-family: Arial, sans-serif; margin: 20px; }
+                .container { max-width: 1200px; margin: 0 auto; }
+                h1 { color: #333; }
+                .section { margin-bottom: 30px; }
+                .image-grid { display: grid; grid-template-columns: repeat(2, 1fr); gap: 20px; }
+                .image-card { border: 1px solid #ddd; padding: 10px; text-align: center; }
+                .image-card img { max-width: 100%; height: auto; }
+                .metrics { background: #f5f5f5; padding: 15px; border-radius: 5px; }
+                .metric-row { display: flex; justify-content: space-between; margin-bottom: 10px; }
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <h1>📊 代码分析可视化摘要</h1>
+                <p><strong>文件:</strong> $file_path</p>
+                <p><strong>生成时间:</strong> $timestamp</p>
+                
+                <div class="section">
+                    <h2>📈 代码指标</h2>
+                    <div class="metrics">
+                        $metrics_html
+                    </div>
+                </div>
+                
+                <div class="section">
+                    <h2>🖼️ 可视化图表</h2>
+                    <div class="image-grid">
+                        $images_html
+                    </div>
+                </div>
+                
+                <div class="section">
+                    <h2>📋 文件列表</h2>
+                    <ul>
+                        $file_list_html
+                    </ul>
+                </div>
+            </div>
+        </body>
+        </html>
+        """)
+
+
+def _spring_layout(graph: "nx.Graph", k: float = 2.0, iterations: int = 50,
+                   seed: Optional[int] = None) -> Dict[Any, List[float]]:
+    """
+    Fruchterman-Reingold力导向布局，只依赖NumPy
+    
+    斥力通过广播一次算出所有点对，引力只沿边计算（O(E)，不构造邻接矩阵）；
+    位置和位移都是float32连续数组。结果缩放到[-1, 1]，与nx.spring_layout一致
+    
+    Args:
+        graph: 图
+        k: 节点间理想距离
+        iterations: 迭代次数
+        seed: 随机种子
+        
+    Returns:
+        节点到二维坐标的映射
+    """
+    import numpy as np
+    
+    nodes = list(graph.nodes())
+    n = len(nodes)
+    if n <= 1:
+        return {node: [0.0, 0.0] for node in nodes}
+    
+    index = {node: i for i, node in enumerate(nodes)}
+    edges = np.array(
+        [(index[u], index[v]) for u, v in graph.edges() if u != v],
+        dtype=np.intp,
+    ).reshape(-1, 2)
+    sources, targets = edges[:, 0], edges[:, 1]
+    
+    pos = np.random.default_rng(seed).random((n, 2), dtype=np.float32)
+    k = np.float32(k)
+    # 初始“温度”为布局范围的十分之一，每轮线性降温
+    temperature = np.float32(0.1)
+    cooling = temperature / np.float32(iterations + 1)
+    
+    for _ in range(iterations):
+        # 斥力：k²/d，沿点对连线方向
+        delta = pos[:, np.newaxis, :] - pos[np.newaxis, :, :]
+        dist_sq = np.einsum('ijk,ijk->ij', delta, delta)
+        np.maximum(dist_sq, np.float32(1e-4), out=dist_sq)
+        disp = np.einsum('ijk,ij->ik', delta, (k * k) / dist_sq)
+        
+        # 引力：d²/k，只作用于相连的节点
+        if len(edges):
+            edge_delta = pos[sources] - pos[targets]
+            edge_dist = np.sqrt(np.einsum('ij,ij->i', edge_delta, edge_delta))
+            force = edge_delta * (edge_dist / k)[:, np.newaxis]
+            np.subtract.at(disp, sources, force)
+            np.add.at(disp, targets, force)
+        
+        # 位移长度不超过当前温度
+        length = np.sqrt(np.einsum('ij,ij->i', disp, disp))
+        np.maximum(length, np.float32(0.01), out=length)
+        pos += disp * (temperature / length)[:, np.newaxis]
+        temperature -= cooling
+    
+    pos -= pos.mean(axis=0)
+    limit = np.abs(pos).max()
+    if limit > 0:
+        pos /= limit
+    return dict(zip(nodes, pos.tolist()))
+
+
+def _render_chart(file_path: str, method: str, args: tuple,
+                  output_path: str) -> Tuple[Optional[str], Optional[Exception]]:
+    """
+    在工作进程中重新解析文件并生成单个图表（模块级函数，可被进程池序列化）
+    
+    Returns:
+        (图表路径, None)，失败时为(None, 异常)，单个图表失败不影响其他图表
+    """
+    try:
+        return getattr(CodeVisualizer(file_path), method)(*args, output_path), None
+    except Exception as e:
+        return None, e
 
 
 class CodeVisualizer:
@@ -17,45 +155,94 @@ class CodeVisualizer:
     
     def __init__(self, file_path: str):
         self.file_path = file_path
-        with open(file_path, 'r', encoding='utf-8') as f:
-            self.source_code = f.read()
+        # 同一文件在进程内只读取和解析一次（按修改时间和大小失效）
+        self.source_code, self.ast_tree = parse_file(file_path)
+        # 文件名各部分只解析一次，供图表标题和默认输出路径使用
+        path = Path(file_path)
+        self._file_name = path.name
+        self._file_stem = path.stem
+        self._file_dir = str(path.parent)
+        
+        # 遍历一次AST，按节点类型分组（保持ast.walk顺序），各图表生成方法共享
+        self._nodes_by_type: Dict[type, List[ast.AST]] = defaultdict(list)
+        for node in ast.walk(self.ast_tree):
+            self._nodes_by_type[type(node)].append(node)
+        
+        # 深度优先遍历一次，随函数定义进出维护外层函数链：
+        # 记录节点id到直接所在函数名的映射，并把判定点计入链上每个函数的圈复杂度
+        # （外层函数的复杂度包含嵌套函数中的判定点）
+        self._enclosing_func: Dict[int, str] = {}
+        self._function_complexity: Dict[int, int] = {}
+        stack = [(child, ()) for child in ast.iter_child_nodes(self.ast_tree)]
+        while stack:
+            node, funcs = stack.pop()
+            if funcs:
+                self._enclosing_func[id(node)] = funcs[-1].name
+                points = self._decision_points(node)
+                if points:
+                    for func in funcs:
+                        self._function_complexity[id(func)] += points
+            if isinstance(node, ast.FunctionDef):
+                self._function_complexity[id(node)] = 1
+                funcs += (node,)
+            stack.extend((child, funcs) for child in ast.iter_child_nodes(node))
         
-        self.ast_tree = ast.parse(self.source_code)
+        # 各图表共用一个Figure和Agg画布，首次绘图时创建，之后每次生成前清空
+        self._fig = None
+        self._canvas = None
+    
+    def _new_figure(self, figsize) -> "Figure":
+        """清空共用的Figure并调整为指定尺寸"""
+        if self._fig is None:
+            # 直接使用Figure和Agg画布，不经过pyplot的全局图形管理
+            import matplotlib.style
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            
+            # 设置样式
+            matplotlib.style.use('seaborn-v0_8-darkgrid')
+            
+            self._fig = Figure()
+            self._canvas = FigureCanvasAgg(self._fig)
         
-        # 设置样式
-        plt.style.use('seaborn-v0_8-darkgrid')
+        self._fig.clear()
+        self._fig.set_size_inches(figsize)
+        return self._fig
     
     def generate_call_graph(self, output_path: str = None) -> str:
         """生成函数调用图"""
         if output_path is None:
-            output_path = Path(self.file_path).stem + "_call_graph.png"
+            output_path = self._file_stem + "_call_graph.png"
+        
+        import networkx as nx
         
         # 构建调用图
         graph = nx.DiGraph()
         
         # 提取函数定义
-        functions = []
-        for node in ast.walk(self.ast_tree):
-            if isinstance(node, ast.FunctionDef):
-                functions.append(node.name)
-                graph.add_node(node.name, type='function', line=node.lineno)
-        
-        # 分析调用关系
-        for node in ast.walk(self.ast_tree):
-            if isinstance(node, ast.Call):
-                # 获取调用者
-                caller = self._get_enclosing_function(node)
-                # 获取被调用者
-                callee = self._extract_callee_name(node)
-                
-                if caller and callee and callee in functions:
-                    graph.add_edge(caller, callee)
+        functions = set()
+        for node in self._nodes_by_type[ast.FunctionDef]:
+            functions.add(node.name)
+            graph.add_node(node.name, type='function', line=node.lineno)
+        
+        # 分析调用关系，边先去重（保持首次出现顺序）再一次性加入图中
+        edges = {}
+        for node in self._nodes_by_type[ast.Call]:
+            # 获取调用者
+            caller = self._get_enclosing_function(node)
+            # 获取被调用者
+            callee = self._extract_callee_name(node)
+            
+            if caller and callee and callee in functions:
+                edges[caller, callee] = None
+        graph.add_edges_from(edges)
         
         # 绘制图形
-        plt.figure(figsize=(12, 8))
+        fig = self._new_figure((12, 8))
+        ax = fig.add_subplot()
         
-        # 使用层次布局
-        pos = nx.spring_layout(graph, k=2, iterations=50)
+        # 力导向布局（NumPy向量化实现，大图不依赖SciPy）
+        pos = _spring_layout(graph, k=2, iterations=50)
         
         # 节点颜色
         node_colors = []
@@ -68,103 +255,119 @@ class CodeVisualizer:
         
         # 绘制节点和边
         nx.draw_networkx_nodes(graph, pos, node_color=node_colors, 
-                              node_size=800, alpha=0.8)
+                              node_size=800, alpha=0.8, ax=ax)
         nx.draw_networkx_edges(graph, pos, edge_color='gray', 
-                              arrows=True, arrowsize=20, alpha=0.6)
-        nx.draw_networkx_labels(graph, pos, font_size=10, font_weight='bold')
+                              arrows=True, arrowsize=20, alpha=0.6, ax=ax)
+        nx.draw_networkx_labels(graph, pos, font_size=10, font_weight='bold', ax=ax)
         
-        plt.title(f"函数调用图 - {Path(self.file_path).name}", fontsize=16)
-        plt.axis('off')
-        plt.tight_layout()
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        ax.set_title(f"函数调用图 - {self._file_name}", fontsize=16)
+        ax.axis('off')
+        fig.tight_layout()
+        fig.savefig(output_path, dpi=300, bbox_inches='tight', pil_kwargs=_PNG_PIL_KWARGS)
         
         return output_path
     
     def generate_ast_tree(self, output_path: str = None) -> str:
         """生成AST树图"""
         if output_path is None:
-            output_path = Path(self.file_path).stem + "_ast_tree.png"
+            output_path = self._file_stem + "_ast_tree.png"
         
         # 创建图形
-        fig, ax = plt.subplots(figsize=(15, 10))
+        fig = self._new_figure((15, 10))
+        ax = fig.add_subplot()
         
-        # 递归绘制AST
+        # 绘制AST
         self._plot_ast_node(self.ast_tree, ax, x=0.5, y=0.95, width=1.0, depth=0)
         
         ax.set_xlim(0, 1)
         ax.set_ylim(0, 1)
         ax.axis('off')
-        plt.title(f"抽象语法树 - {Path(self.file_path).name}", fontsize=16)
-        plt.tight_layout()
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        ax.set_title(f"抽象语法树 - {self._file_name}", fontsize=16)
+        fig.tight_layout()
+        fig.savefig(output_path, dpi=300, bbox_inches='tight', pil_kwargs=_PNG_PIL_KWARGS)
         
         return output_path
     
     def _plot_ast_node(self, node: ast.AST, ax, x: float, y: float, 
                       width: float, depth: int):
-        """递归绘制AST节点"""
-        if depth > 5:  # 限制深度
-            return
-        
-        # 获取节点类型
-        node_type = type(node).__name__
-        
-        # 绘制节点
-        ax.text(x, y, node_type, ha='center', va='center',
-               bbox=dict(boxstyle="round,pad=0.3", 
-                        facecolor="lightblue", 
-                        edgecolor="black", 
-                        alpha=0.8),
-               fontsize=9)
-        
-        # 处理子节点
-        children = list(ast.iter_child_nodes(node))
-        num_children = len(children)
-        
-        if num_children > 0:
+        """绘制AST节点及其子树
+        
+        先用栈遍历收集节点位置和连线，再把所有连线作为一个LineCollection加入，
+        节点标签共用同一个边框样式，避免逐节点创建线条对象
+        """
+        import numpy as np
+        from matplotlib.collections import LineCollection
+        
+        labels = []
+        # 连线端点坐标按(x0, y0, x1, y1)平铺在一个列表中，最后一次性转为(N, 2, 2)数组
+        segment_coords = []
+        stack = [(node, x, y, width, depth)]
+        while stack:
+            node, x, y, width, depth = stack.pop()
+            labels.append((x, y, type(node).__name__))
+            
             # 计算子节点位置
-            child_width = width / num_children
+            children = list(ast.iter_child_nodes(node))
+            if not children:
+                continue
+            child_width = width / len(children)
             child_x_start = x - width/2 + child_width/2
+            child_y = y - 0.1  # 垂直间距
+            child_xs = [child_x_start + i * child_width for i in range(len(children))]
             
-            for i, child in enumerate(children):
-                child_x = child_x_start + i * child_width
-                child_y = y - 0.1  # 垂直间距
-                
-                # 绘制连接线
-                ax.plot([x, child_x], [y-0.02, child_y+0.02], 
-                       'gray', linewidth=1, alpha=0.5)
-                
-                # 递归绘制子节点
-                self._plot_ast_node(child, ax, child_x, child_y, 
-                                   child_width * 0.9, depth + 1)
+            for child_x in child_xs:
+                segment_coords += (x, y - 0.02, child_x, child_y + 0.02)
+            
+            # 超出深度限制的子节点只画连线不入栈（限制深度）；
+            # 逆序入栈，保持与递归相同的先序、从左到右的绘制顺序
+            if depth < 5:
+                stack.extend(
+                    (child, child_x, child_y, child_width * 0.9, depth + 1)
+                    for child, child_x in zip(reversed(children), reversed(child_xs))
+                )
+        
+        # 连线一次性加入，zorder与ax.plot的线条一致
+        segments = np.array(segment_coords, dtype=float).reshape(-1, 2, 2)
+        ax.add_collection(LineCollection(segments, colors='gray', linewidths=1,
+                                         alpha=0.5, zorder=2))
+        
+        bbox = dict(boxstyle="round,pad=0.3", 
+                    facecolor="lightblue", 
+                    edgecolor="black", 
+                    alpha=0.8)
+        for x, y, label in labels:
+            ax.text(x, y, label, ha='center', va='center', bbox=bbox, fontsize=9)
     
     def generate_complexity_chart(self, output_path: str = None) -> str:
         """生成复杂度图表"""
         if output_path is None:
-            output_path = Path(self.file_path).stem + "_complexity.png"
+            output_path = self._file_stem + "_complexity.png"
         
         # 计算每个函数的圈复杂度
         complexities = []
         function_names = []
         
-        for node in ast.walk(self.ast_tree):
-            if isinstance(node, ast.FunctionDef):
-                complexity = self._calculate_cyclomatic_complexity(node)
-                complexities.append(complexity)
-                function_names.append(node.name)
+        for node in self._nodes_by_type[ast.FunctionDef]:
+            complexity = self._function_complexity[id(node)]
+            complexities.append(complexity)
+            function_names.append(node.name)
         
         if not complexities:
             return None
         
+        import numpy as np
+        
+        # 复杂度分级：≤5为低、6-10为中、>10为高，柱色和饼图计数都由分级得出
+        levels = np.digitize(np.fromiter(complexities, dtype=np.int64), [5, 10], right=True)
+        level_colors = ['green', 'orange', 'red']
+        
         # 创建图表
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+        fig = self._new_figure((14, 6))
+        ax1, ax2 = fig.subplots(1, 2)
         
         # 柱状图
         bars = ax1.bar(range(len(complexities)), complexities, 
-                      color=['red' if c > 10 else 'orange' if c > 5 else 'green' 
-                            for c in complexities])
+                      color=np.array(level_colors)[levels].tolist())
         ax1.set_xlabel('函数')
         ax1.set_ylabel('圈复杂度')
         ax1.set_title('函数圈复杂度分布')
@@ -178,50 +381,36 @@ class CodeVisualizer:
                     f'{complexity}', ha='center', va='bottom')
         
         # 饼图
-        low = sum(1 for c in complexities if c <= 5)
-        medium = sum(1 for c in complexities if 5 < c <= 10)
-        high = sum(1 for c in complexities if c > 10)
-        
-        sizes = [low, medium, high]
+        sizes = np.bincount(levels, minlength=3).tolist()
         labels = ['低 (≤5)', '中 (6-10)', '高 (>10)']
-        colors = ['green', 'orange', 'red']
         
-        ax2.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%',
+        ax2.pie(sizes, labels=labels, colors=level_colors, autopct='%1.1f%%',
                startangle=90)
         ax2.axis('equal')
         ax2.set_title('复杂度分布比例')
         
-        plt.suptitle(f"代码复杂度分析 - {Path(self.file_path).name}", fontsize=16)
-        plt.tight_layout()
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        fig.suptitle(f"代码复杂度分析 - {self._file_name}", fontsize=16)
+        fig.tight_layout()
+        fig.savefig(output_path, dpi=300, bbox_inches='tight', pil_kwargs=_PNG_PIL_KWARGS)
         
         return output_path
     
-    def _calculate_cyclomatic_complexity(self, node: ast.AST) -> int:
-        """计算圈复杂度"""
-        complexity = 1
-        
-        for child in ast.walk(node):
-            if isinstance(child, (ast.If, ast.While, ast.For, ast.AsyncFor)):
-                complexity += 1
-            elif isinstance(child, ast.BoolOp):
-                complexity += len(child.values) - 1
-            elif isinstance(child, (ast.Try, ast.ExceptHandler)):
-                complexity += 1
-            elif isinstance(child, ast.Match):
-                complexity += len(child.cases)
-        
-        return complexity
+    @staticmethod
+    def _decision_points(node: ast.AST) -> int:
+        """单个节点为圈复杂度增加的判定点数"""
+        if isinstance(node, (ast.If, ast.While, ast.For, ast.AsyncFor)):
+            return 1
+        elif isinstance(node, ast.BoolOp):
+            return len(node.values) - 1
+        elif isinstance(node, (ast.Try, ast.ExceptHandler)):
+            return 1
+        elif isinstance(node, ast.Match):
+            return len(node.cases)
+        return 0
     
     def _get_enclosing_function(self, node: ast.AST) -> Optional[str]:
         """获取包含节点的函数名"""
-        parent = node
-        while hasattr(parent, 'parent'):
-            parent = parent.parent
-            if isinstance(parent, ast.FunctionDef):
-                return parent.name
-        return None
+        return self._enclosing_func.get(id(node))
     
     def _extract_callee_name(self, node: ast.Call) -> Optional[str]:
         """提取被调用函数名"""
@@ -233,9 +422,12 @@ class CodeVisualizer:
     
     def generate_defect_distribution(self, defects: List[Dict], 
                                     output_path: str = None) -> str:
-        """生成缺陷分布图"""
+        """生成缺陷分布图，没有缺陷时不绘图，返回None"""
+        if not defects:
+            return None
+        
         if output_path is None:
-            output_path = Path(self.file_path).stem + "_defects.png"
+            output_path = self._file_stem + "_defects.png"
         
         # 按严重程度分组
         severity_counts = {}
@@ -250,7 +442,8 @@ class CodeVisualizer:
             pattern_counts[pattern] = pattern_counts.get(pattern, 0) + 1
         
         # 创建图表
-        fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(14, 6))
+        fig = self._new_figure((14, 6))
+        ax1, ax2 = fig.subplots(1, 2)
         
         # 严重程度饼图
         if severity_counts:
@@ -287,56 +480,54 @@ class CodeVisualizer:
                 ax2.text(bar.get_x() + bar.get_width()/2., height,
                         f'{count}', ha='center', va='bottom')
         
-        plt.suptitle(f"缺陷分布分析 - {Path(self.file_path).name}", fontsize=16)
-        plt.tight_layout()
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        plt.close()
+        fig.suptitle(f"缺陷分布分析 - {self._file_name}", fontsize=16)
+        fig.tight_layout()
+        fig.savefig(output_path, dpi=300, bbox_inches='tight', pil_kwargs=_PNG_PIL_KWARGS)
         
         return output_path
     
     def generate_combined_report(self, defects: List[Dict], 
-                                metrics: Dict, output_dir: str = None) -> Dict:
-        """生成综合可视化报告"""
+                                metrics: Dict, output_dir: str = None,
+                                workers: Optional[int] = None) -> Dict:
+        """生成综合可视化报告
+        
+        各图表在独立进程中绘制，workers为进程数（默认CPU核数），为1时在当前进程中依次绘制
+        """
         if output_dir is None:
-            output_dir = Path(self.file_path).parent / "visualizations"
+            output_dir = os.path.join(self._file_dir, "visualizations")
+        
+        os.makedirs(output_dir, exist_ok=True)
+        
+        # 各图表互不依赖、写入不同文件，分发给进程池并行绘制
+        # 没有函数或没有缺陷时对应图表为空，直接跳过
+        jobs = [
+            ('call_graph', 'generate_call_graph', (), "call_graph.png", "生成调用图失败"),
+            ('ast_tree', 'generate_ast_tree', (), "ast_tree.png", "生成AST树失败"),
+        ]
+        if self._nodes_by_type[ast.FunctionDef]:
+            jobs.append(('complexity', 'generate_complexity_chart', (),
+                         "complexity.png", "生成复杂度图表失败"))
+        if defects:
+            jobs.append(('defects', 'generate_defect_distribution', (defects,),
+                         "defects.png", "生成缺陷分布图失败"))
         
-        Path(output_dir).mkdir(parents=True, exist_ok=True)
+        calls = [
+            (self.file_path, method, args, os.path.join(output_dir, file_name))
+            for _, method, args, file_name, _ in jobs
+        ]
+        results = list(parallel_map(_render_chart, *zip(*calls), workers=workers))
         
+        # 按提交顺序收集结果，保持报告中图表的顺序
         report_files = {}
-        
-        # 生成所有图表
-        try:
-            report_files['call_graph'] = self.generate_call_graph(
-                str(Path(output_dir) / "call_graph.png")
-            )
-        except Exception as e:
-            print(f"生成调用图失败: {e}")
-        
-        try:
-            report_files['ast_tree'] = self.generate_ast_tree(
-                str(Path(output_dir) / "ast_tree.png")
-            )
-        except Exception as e:
-            print(f"生成AST树失败: {e}")
-        
-        try:
-            report_files['complexity'] = self.generate_complexity_chart(
-                str(Path(output_dir) / "complexity.png")
-            )
-        except Exception as e:
-            print(f"生成复杂度图表失败: {e}")
-        
-        if defects:
-            try:
-                report_files['defects'] = self.generate_defect_distribution(
-                    defects, str(Path(output_dir) / "defects.png")
-                )
-            except Exception as e:
-                print(f"生成缺陷分布图失败: {e}")
+        for (key, _, _, _, error_message), (path, error) in zip(jobs, results):
+            if error is None:
+                report_files[key] = path
+            else:
+                print(f"{error_message}: {error}")
         
         # 生成HTML摘要
         html_path = self._generate_html_summary(report_files, metrics, 
-                                               str(Path(output_dir) / "summary.html"))
+                                               os.path.join(output_dir, "summary.html"))
         report_files['summary'] = html_path
         
         return report_files
@@ -344,53 +535,14 @@ class CodeVisualizer:
     def _generate_html_summary(self, report_files: Dict, 
                               metrics: Dict, output_path: str) -> str:
         """生成HTML摘要"""
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>代码分析可视化摘要 - {Path(self.file_path).name}</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 20px; }}
-                .container {{ max-width: 1200px; margin: 0 auto; }}
-                h1 {{ color: #333; }}
-                .section {{ margin-bottom: 30px; }}
-                .image-grid {{ display: grid; grid-template-columns: repeat(2, 1fr); gap: 20px; }}
-                .image-card {{ border: 1px solid #ddd; padding: 10px; text-align: center; }}
-                .image-card img {{ max-width: 100%; height: auto; }}
-                .metrics {{ background: #f5f5f5; padding: 15px; border-radius: 5px; }}
-                .metric-row {{ display: flex; justify-content: space-between; margin-bottom: 10px; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>📊 代码分析可视化摘要</h1>
-                <p><strong>文件:</strong> {self.file_path}</p>
-                <p><strong>生成时间:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
-                
-                <div class="section">
-                    <h2>📈 代码指标</h2>
-                    <div class="metrics">
-                        {self._generate_metrics_html(metrics)}
-                    </div>
-                </div>
-                
-                <div class="section">
-                    <h2>🖼️ 可视化图表</h2>
-                    <div class="image-grid">
-                        {self._generate_images_html(report_files)}
-                    </div>
-                </div>
-                
-                <div class="section">
-                    <h2>📋 文件列表</h2>
-                    <ul>
-                        {self._generate_file_list_html(report_files)}
-                    </ul>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
+        html_content = _SUMMARY_PAGE.substitute(
+            file_name=self._file_name,
+            file_path=self.file_path,
+            timestamp=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            metrics_html=self._generate_metrics_html(metrics),
+            images_html=self._generate_images_html(report_files),
+            file_list_html=self._generate_file_list_html(report_files),
+        )
         
         with open(output_path, 'w', encoding='utf-8') as f:
             f.write(html_content)
@@ -402,41 +554,44 @@ class CodeVisualizer:
         if not metrics:
             return "<p>暂无指标数据</p>"
         
-        html = ""
+        rows = []
         for key, value in metrics.items():
             if isinstance(value, (int, float)):
-                html += f"""
+                # 格式说明符中不能写条件表达式，先按类型格式化好再插入
+                value_text = f"{value:.2f}" if isinstance(value, float) else str(value)
+                rows.append(f"""
                 <div class="metric-row">
                     <span>{key}:</span>
-                    <span><strong>{value:.2f if isinstance(value, float) else value}</strong></span>
+                    <span><strong>{value_text}</strong></span>
                 </div>
-                """
+                """)
         
-        return html
+        return "".join(rows)
     
     def _generate_images_html(self, report_files: Dict) -> str:
         """生成图片HTML"""
-        html = ""
+        cards = []
         
         for name, path in report_files.items():
             if path and path.endswith('.png'):
-                img_name = Path(path).name
-                html += f"""
+                img_name = os.path.basename(path)
+                cards.append(f"""
                 <div class="image-card">
                     <h3>{name.replace('_', ' ').title()}</h3>
                     <img src="{img_name}" alt="{name}">
                     <p>{img_name}</p>
                 </div>
-                """
+                """)
         
-        return html
+        return "".join(cards)
     
     def _generate_file_list_html(self, report_files: Dict) -> str:
         """生成文件列表HTML"""
-        html = ""
+        items = []
         
         for name, path in report_files.items():
             if path:
-                html += f'<li><a href="{Path(path).name}">{name}: {Path(path).name}</a></li>'
+                file_name = os.path.basename(path)
+                items.append(f'<li><a href="{file_name}">{name}: {file_name}</a></li>')
         
-        return html
\ No newline at end of file
+        return "".join(items)
\ No newline at end of file
@@ -5,10 +5,17 @@ PyAnalyzer核心功能测试
 import unittest
 import tempfile
 import os
+import pickle
 from pathlib import Path
 
+# 测试不写入用户目录下的AST磁盘缓存
+os.environ["PYANALYZER_NO_CACHE"] = "1"
+
 from pyanalyzer.core.ast_parser import ASTParser
 from pyanalyzer.core.defect_detector import DefectDetector
+from pyanalyzer.core.call_graph import CallGraphAnalyzer
+from pyanalyzer.core.pattern_matcher import PatternMatcher
+from pyanalyzer.patterns.base_patterns import Defect, Severity
 from pyanalyzer.utils.file_utils import find_python_files
 
 
@@ -48,6 +55,22 @@ class Person:
         self.assertEqual(len(classes), 1)
         self.assertEqual(classes[0].name, "Person")
     
+    def test_function_by_name_prefers_outer(self):
+        """测试同名函数按ast.walk顺序收集，按名称查找时返回外层定义"""
+        code = """
+def outer():
+    def helper():
+        pass
+    return helper
+
+def helper(x):
+    return x
+"""
+        parser = ASTParser(code, "test.py", use_cache=False)
+        self.assertEqual([(f.name, f.lineno) for f in parser.functions],
+                         [("outer", 2), ("helper", 7), ("helper", 3)])
+        self.assertEqual(parser.get_function_by_name("helper").lineno, 7)
+    
     def test_metrics_calculation(self):
         """测试指标计算"""
         parser = ASTParser(self.sample_code, "test.py")
@@ -56,6 +79,17 @@ class Person:
         self.assertIn("function_count", metrics)
         self.assertIn("class_count", metrics)
     
+    def test_maintainability_index_batch(self):
+        """测试批量可维护性指数与逐个计算结果一致"""
+        from pyanalyzer.utils.metrics import (
+            calculate_maintainability_index,
+            calculate_maintainability_index_batch,
+        )
+        volumes, complexities, lines = [0, 120.5, -2, 1e6], [1, 3.5, 2, 40], [0, 80, 10, 3000]
+        batch = calculate_maintainability_index_batch(volumes, complexities, lines)
+        for i, value in enumerate(batch):
+            self.assertAlmostEqual(value, calculate_maintainability_index(volumes[i], complexities[i], lines[i]))
+    
     def test_unused_variable_detection(self):
         """测试未使用变量检测"""
         code = """
@@ -68,6 +102,34 @@ def test():
         unused = parser.find_unused_variables()
         self.assertEqual(len(unused), 1)
         self.assertEqual(unused[0]["variable"], "y")
+    
+    def test_function_scope(self):
+        """测试按父节点查找所在函数"""
+        import ast
+        from pyanalyzer.utils.ast_utils import get_function_scope
+        tree = ast.parse("def outer():\n    def inner():\n        x = 1\n    y = 2\nz = 3\n")
+        scopes = {node.id: get_function_scope(node, tree)
+                  for node in ast.walk(tree) if isinstance(node, ast.Name)}
+        self.assertEqual(scopes, {"x": "inner", "y": "outer", "z": None})
+    
+    def test_unreachable_code(self):
+        """测试跳转语句之后的不可达语句"""
+        import ast
+        from pyanalyzer.utils.ast_utils import find_unreachable_code
+        code = """
+def f(x):
+    for i in x:
+        continue
+        print(i)
+    else:
+        return 1
+        x += 1
+    raise ValueError()
+    y = 2
+"""
+        unreachable = find_unreachable_code(ast.parse(code))
+        self.assertEqual(sorted((u["line"], u["reason"]) for u in unreachable),
+                         [(5, "Continue"), (8, "Return"), (10, "Raise")])
 
 
 class TestDefectDetector(unittest.TestCase):
@@ -136,6 +198,209 @@ def problematic():
         detector = DefectDetector(parser, config)
         defects = detector.detect_all()
         self.assertGreaterEqual(len(defects), 3)
+    
+    def test_hardcoded_password(self):
+        """测试硬编码密码检测（依赖解析器设置的父节点）"""
+        code = """
+def connect():
+    db_password = "secret123"
+    return db_password
+"""
+        parser = ASTParser(code, "test.py")
+        config = {"patterns": {"enabled": ["hardcoded_password"]}}
+        defects = DefectDetector(parser, config).detect_all()
+        self.assertEqual([(d.pattern, d.line) for d in defects], [("hardcoded_password", 3)])
+    
+    def test_unused_import_aliases(self):
+        """测试未使用导入按实际绑定名称判断"""
+        code = """
+import os.path
+import numpy as np
+from collections import OrderedDict as OD, defaultdict
+from typing import *
+
+print(os.path.join("a", "b"), np.zeros(3), OD())
+"""
+        parser = ASTParser(code, "test.py")
+        config = {
+            "patterns": {"enabled": ["unused_import"]},
+            "reporting": {"severity_filter": "low"}
+        }
+        detector = DefectDetector(parser, config)
+        unused = [d.context for d in detector.detect_all()]
+        self.assertEqual(unused, ["defaultdict"])
+    
+    def test_defect_pickle_roundtrip(self):
+        """测试缺陷对象跨进程序列化"""
+        defect = Defect(
+            pattern="resource_leak",
+            description="文件未关闭",
+            severity=Severity.MEDIUM,
+            line=3,
+            file_path="test.py",
+            context="open('x')"
+        )
+        self.assertEqual(pickle.loads(pickle.dumps(defect)), defect)
+    
+    def test_source_prefilter(self):
+        """测试源码预筛选不影响检测结果"""
+        config = {"patterns": {"enabled": ["potential_loop_infinite"]}}
+        
+        parser = ASTParser("def spin():\n    while True:\n        pass\n", "test.py")
+        defects = DefectDetector(parser, config).detect_all()
+        self.assertEqual([d.pattern for d in defects], ["potential_loop_infinite"])
+        
+        parser = ASTParser("def idle():\n    return 1\n", "test.py")
+        self.assertEqual(DefectDetector(parser, config).detect_all(), [])
+    
+    def test_enabled_patterns_changed_after_init(self):
+        """测试构造后修改启用模式时按新的模式检测"""
+        parser = ASTParser("def spin():\n    while True:\n        pass\n", "test.py")
+        detector = DefectDetector(parser, {"patterns": {"enabled": []}})
+        self.assertEqual(detector.detect_all(), [])
+        
+        detector.enabled_patterns.append("potential_loop_infinite")
+        self.assertEqual([d.pattern for d in detector.detect_all()], ["potential_loop_infinite"])
+    
+    def test_detector_error_skips_only_failing_node(self):
+        """测试检测器在某个节点上出错时，只跳过该节点，后续节点照常检测"""
+        import ast
+        from unittest import mock
+        from pyanalyzer.patterns.base_patterns import PATTERNS
+        
+        def flaky(node, file_path, parser=None):
+            if node.id == "bad":
+                raise RuntimeError("boom")
+            return [Defect("flaky", "测试", Severity.HIGH, node.lineno, file_path, node.id)]
+        
+        parser = ASTParser("bad\nok\n", "test.py")
+        flaky_pattern = {"description": "测试", "severity": Severity.HIGH,
+                         "detector": flaky, "node_types": (ast.Name,)}
+        with mock.patch.dict(PATTERNS, {"flaky": flaky_pattern}):
+            defects = DefectDetector(parser, {"patterns": {"enabled": ["flaky"]}}).detect_all()
+        self.assertEqual([d.line for d in defects], [2])
+        
+        matches = []
+        names = parser.nodes_by_type[ast.Name]
+        PatternMatcher({})._match_pattern(parser, names, "null_dereference", flaky, False, matches)
+        self.assertEqual([m.node.id for m in matches], ["ok"])
+    
+    def test_high_complexity_same_name(self):
+        """测试同名函数按各自的复杂度检测"""
+        branches = "".join(f"        if x == {i}:\n            x += 1\n" for i in range(12))
+        code = ("def handle(x):\n    return x\n\n"
+                "class Handler:\n    def handle(self, x):\n" + branches + "        return x\n")
+        parser = ASTParser(code, "test.py")
+        config = {"patterns": {"enabled": ["high_complexity"]}}
+        defects = DefectDetector(parser, config).detect_all()
+        self.assertEqual([d.line for d in defects], [5])
+
+
+class TestCallGraph(unittest.TestCase):
+    """测试调用图分析"""
+    
+    def setUp(self):
+        code = """
+def a():
+    b()
+
+def b():
+    a()
+
+def c():
+    c()
+
+class Service:
+    def run(self):
+        a()
+"""
+        self.analyzer = CallGraphAnalyzer(ASTParser(code, "test.py"))
+        self.analyzer.build_call_graph()
+    
+    def test_call_edges(self):
+        """测试调用边"""
+        self.assertEqual(self.analyzer.successors["a"], {"b"})
+        self.assertEqual(self.analyzer.successors["Service.run"], {"a"})
+        self.assertEqual(self.analyzer.predecessors["a"], {"b", "Service.run"})
+    
+    def test_circular_dependencies(self):
+        """测试循环依赖检测"""
+        cycles = sorted(sorted(cycle) for cycle in self.analyzer.find_circular_dependencies())
+        self.assertEqual(cycles, [["a", "b"], ["c"]])
+    
+    def test_most_coupled_functions(self):
+        """测试耦合度排序"""
+        top = self.analyzer.find_most_coupled_functions(1)
+        self.assertEqual(top, [("a", 3)])
+
+
+class TestPatternMatcher(unittest.TestCase):
+    """测试模式匹配引擎"""
+    
+    def test_match_security_and_basic_patterns(self):
+        """测试按节点类型分派到各类模式"""
+        code = """
+def load(data):
+    while True:
+        return eval(data)
+"""
+        matcher = PatternMatcher({})
+        matches = matcher.match_all(
+            ASTParser(code, "test.py"),
+            ["unsafe_deserialization", "potential_loop_infinite"]
+        )
+        self.assertEqual(
+            sorted(match.pattern_name for match in matches),
+            ["potential_loop_infinite", "unsafe_deserialization"]
+        )
+    
+    def test_list_membership_test(self):
+        """测试对列表字面量的成员测试"""
+        code = """
+def check(x):
+    if x in [1, 2, 3]:
+        return x in {1, 2}
+"""
+        matches = PatternMatcher({}).match_all(ASTParser(code, "test.py"), ["inefficient_membership_test"])
+        self.assertEqual([match.node.lineno for match in matches], [3])
+    
+    def test_command_injection_and_path_traversal(self):
+        """测试命令注入与路径遍历按参数结构判断"""
+        code = """
+def run(name):
+    os.system("ls -la")
+    os.system(f"cat {name}")
+    open("config.ini")
+    open("../" + name)
+"""
+        matches = PatternMatcher({}).match_all(
+            ASTParser(code, "test.py"),
+            ["command_injection", "path_traversal"]
+        )
+        self.assertEqual(
+            sorted((match.pattern_name, match.node.lineno) for match in matches),
+            [("command_injection", 4), ("path_traversal", 6)]
+        )
+    
+    def test_scan_files(self):
+        """测试按文件运行安全检测器"""
+        from pyanalyzer.patterns.security_patterns import SecurityPatterns
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            paths = []
+            for i, code in enumerate(["import os\nos.system(cmd)\n", "x = 1\n", "h = md5(b)\n"]):
+                path = Path(temp_dir) / f"m{i}.py"
+                path.write_text(code)
+                paths.append(str(path))
+            defects = SecurityPatterns.scan_files(paths, workers=1)
+            pooled = SecurityPatterns.scan_files(paths, workers=2)
+        
+        self.assertEqual(
+            [(d.pattern, Path(d.file_path).name) for d in defects],
+            [("command_injection", "m0.py"), ("weak_cryptography", "m2.py")]
+        )
+        # 进程池路径应按文件顺序返回与顺序执行相同的结果
+        self.assertEqual(pooled, defects)
 
 
 class TestFileUtils(unittest.TestCase):
@@ -175,12 +440,43 @@ class TestFileUtils(unittest.TestCase):
         self.assertIn("module.py", file_names)
         self.assertNotIn("test_test.py", file_names)
     
+    def test_find_python_files_non_directory_root(self):
+        """测试根路径为文件或不存在时返回空列表"""
+        self.assertEqual(find_python_files(str(self.py_file), {}), [])
+        self.assertEqual(find_python_files(str(Path(self.temp_dir) / "missing"), {}), [])
+    
     def test_count_lines(self):
         """测试行数计算"""
         from pyanalyzer.utils.file_utils import count_lines_in_file
         lines = count_lines_in_file(str(self.py_file))
         self.assertEqual(lines, 1)  # print('hello') 一行
     
+    def test_parse_file_cache(self):
+        """测试解析结果缓存：未修改时复用，修改后重新解析"""
+        from pyanalyzer.utils.ast_utils import parse_file
+        source, tree = parse_file(str(self.sub_py))
+        self.assertEqual(source, "x = 10")
+        self.assertIs(parse_file(str(self.sub_py))[1], tree)
+        
+        self.sub_py.write_text("x = 100")
+        source, new_tree = parse_file(str(self.sub_py))
+        self.assertEqual(source, "x = 100")
+        self.assertIsNot(new_tree, tree)
+    
+    def test_ast_cache_prune(self):
+        """测试AST缓存按时间和总大小清理"""
+        import time
+        from pyanalyzer.core import _ast_cache
+        cache_dir = Path(self.temp_dir) / "cache"
+        cache_dir.mkdir()
+        for i, age in enumerate([100, 3, 2, 1]):
+            entry = cache_dir / f"{i}.pkl"
+            entry.write_bytes(b"x" * 10)
+            os.utime(entry, (0, time.time() - age))
+        
+        _ast_cache.prune(cache_dir, max_bytes=20, max_age=50)
+        self.assertEqual(sorted(p.name for p in cache_dir.iterdir()), ["2.pkl", "3.pkl"])
+    
     def tearDown(self):
         # 清理临时目录
         import shutil
@@ -192,9 +488,8 @@ class TestIntegration(unittest.TestCase):
     
     def test_full_analysis(self):
         """测试完整分析流程"""
-        # 使用示例代码
-        from examples.example_project.vulnerable_code import __file__ as example_path
-        example_dir = Path(example_path).parent
+        # 使用示例代码（按路径定位，示例只作为分析输入，无需导入执行）
+        example_dir = Path(__file__).resolve().parent.parent / "examples" / "example_project"
         
         # 查找文件
         ignore_config = {"files": []}
@@ -232,6 +527,8 @@ def run_tests():
     # 添加测试类
     suite.addTests(loader.loadTestsFromTestCase(TestASTParser))
     suite.addTests(loader.loadTestsFromTestCase(TestDefectDetector))
+    suite.addTests(loader.loadTestsFromTestCase(TestCallGraph))
+    suite.addTests(loader.loadTestsFromTestCase(TestPatternMatcher))
     suite.addTests(loader.loadTestsFromTestCase(TestFileUtils))
     suite.addTests(loader.loadTestsFromTestCase(TestIntegration))
     
@@ -5,18 +5,24 @@
 from pyanalyzer.utils.file_utils import (
     find_python_files,
     read_file_safely,
+    prefetch_files,
     is_test_file,
     get_file_size,
     count_lines_in_file,
     create_output_directory,
     get_relative_path,
     write_json_file,
+    dumps_json_compact,
     read_json_file,
 )
 from pyanalyzer.utils.ast_utils import (
     ASTWalker,
     ASTVisitor,
+    parse_file,
+    parse_source,
     get_node_position,
+    link_parents,
+    get_ancestors,
     get_function_scope,
     get_variable_usage,
     extract_string_constants,
@@ -25,27 +31,39 @@ from pyanalyzer.utils.metrics import (
     calculate_metrics,
     calculate_complexity,
     calculate_maintainability_index,
+    calculate_maintainability_index_batch,
     calculate_halstead_metrics,
+    aggregate_project_metrics,
 )
+from pyanalyzer.utils.parallel import parallel_map
 
 __all__ = [
     "find_python_files",
     "read_file_safely",
+    "prefetch_files",
     "is_test_file",
     "get_file_size",
     "count_lines_in_file",
     "create_output_directory",
     "get_relative_path",
     "write_json_file",
+    "dumps_json_compact",
     "read_json_file",
     "ASTWalker",
     "ASTVisitor",
+    "parse_file",
+    "parse_source",
     "get_node_position",
+    "link_parents",
+    "get_ancestors",
     "get_function_scope",
     "get_variable_usage",
     "extract_string_constants",
     "calculate_metrics",
     "calculate_complexity",
     "calculate_maintainability_index",
+    "calculate_maintainability_index_batch",
     "calculate_halstead_metrics",
+    "aggregate_project_metrics",
+    "parallel_map",
 ]
\ No newline at end of file
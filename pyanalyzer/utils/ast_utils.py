@@ -3,7 +3,64 @@ AST工具函数
 """
 
 import ast
-from typing import Dict, List, Set, Optional, Any
+import os
+import re
+from collections import Counter, defaultdict, deque
+from functools import lru_cache
+from typing import Dict, Iterator, List, Set, Optional, Any, Tuple
+
+
+# ASDL内置类型：这些字段只保存标识符、字符串或数值，不可能有子节点
+_ASDL_BUILTIN_TYPES = frozenset({'identifier', 'string', 'bytes', 'int', 'constant', 'object'})
+
+# 节点类型 -> 可能包含子节点的字段名，首次遇到该类型时生成
+_CHILD_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def _child_fields(cls: type) -> Tuple[str, ...]:
+    """
+    从节点类的文档签名（如"Name(identifier id, expr_context ctx)"）读出各字段的ASDL类型，
+    去掉内置类型的字段；签名无法解析时保留全部字段
+    """
+    signature = (cls.__doc__ or '').split('\n', 1)[0]
+    match = re.fullmatch(re.escape(cls.__name__) + r'\((.*)\)', signature)
+    if match is None:
+        return cls._fields
+    
+    field_types = {}
+    for part in match.group(1).split(','):
+        field_type, _, name = part.strip().rpartition(' ')
+        field_types[name] = field_type.rstrip('?*')
+    return tuple(name for name in cls._fields
+                 if field_types.get(name) not in _ASDL_BUILTIN_TYPES)
+
+
+def _iter_nodes(root: ast.AST) -> Iterator[ast.AST]:
+    """
+    按与ast.walk相同的广度优先顺序产出所有节点
+    
+    子节点直接从按类型缓存的字段中取，不为每个节点创建iter_child_nodes生成器
+    """
+    node_type = ast.AST
+    child_fields = _CHILD_FIELDS
+    queue = deque([root])
+    popleft = queue.popleft
+    append = queue.append
+    extend = queue.extend
+    while queue:
+        node = popleft()
+        yield node
+        
+        cls = type(node)
+        fields = child_fields.get(cls)
+        if fields is None:
+            fields = child_fields[cls] = _child_fields(cls)
+        for name in fields:
+            value = getattr(node, name, None)
+            if isinstance(value, node_type):
+                append(value)
+            elif isinstance(value, list):
+                extend([item for item in value if isinstance(item, node_type)])
 
 
 class ASTWalker:
@@ -14,7 +71,7 @@ class ASTWalker:
     
     def walk(self, node_type: type = None):
         """遍历AST节点"""
-        for node in ast.walk(self.tree):
+        for node in _iter_nodes(self.tree):
             if node_type is None or isinstance(node, node_type):
                 yield node
     
@@ -74,6 +131,36 @@ class ASTVisitor(ast.NodeVisitor):
         return any(isinstance(ancestor, ast.ClassDef) for ancestor in ancestors)
 
 
+def parse_file(file_path: str) -> Tuple[str, ast.Module]:
+    """
+    读取并解析Python文件，返回(源码, AST)
+    
+    结果按(路径, 修改时间, 文件大小)缓存，同一进程中多次检查同一文件时只读取和解析一次；
+    文件被修改后自动重新解析。返回的AST在调用方之间共享，不应修改
+    """
+    stat = os.stat(file_path)
+    return _parse_file_cached(os.fspath(file_path), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=256)
+def _parse_file_cached(file_path: str, mtime_ns: int, size: int) -> Tuple[str, ast.Module]:
+    """parse_file的缓存实现，修改时间和大小只参与缓存键"""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        source_code = f.read()
+    return source_code, parse_source(source_code)
+
+
+@lru_cache(maxsize=256)
+def parse_source(source_code: str) -> ast.Module:
+    """
+    解析源码字符串，按源码内容缓存结果
+    
+    calculate_metrics、validate_syntax等对同一段源码重复解析时直接复用已有AST；
+    语法错误不缓存，照常抛出SyntaxError。返回的AST在调用方之间共享，不应修改
+    """
+    return ast.parse(source_code)
+
+
 def get_node_position(node: ast.AST) -> Dict[str, int]:
     """获取节点位置信息"""
     position = {
@@ -90,13 +177,51 @@ def get_node_position(node: ast.AST) -> Dict[str, int]:
     return position
 
 
-def get_function_scope(node: ast.AST) -> Optional[str]:
-    """获取节点所在的函数作用域"""
-    visitor = ASTVisitor()
-    visitor.visit(node)
+def link_parents(tree: ast.AST) -> ast.AST:
+    """
+    为树中每个节点设置parent属性（与ASTParser.nodes_by_type的约定相同）
+    
+    父节点信息保存在节点自身上，随树一起释放；同一棵树只遍历一次
+    """
+    if getattr(tree, '_parents_linked', False):
+        return tree
     
-    ancestors = visitor.get_ancestors(node)
-    for ancestor in ancestors:
+    iter_child_nodes = ast.iter_child_nodes
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        for child in iter_child_nodes(node):
+            child.parent = node
+            stack.append(child)
+    tree._parents_linked = True
+    return tree
+
+
+def get_ancestors(node: ast.AST) -> List[ast.AST]:
+    """沿parent属性获取所有祖先节点（由近到远），节点未设置parent时返回空列表"""
+    ancestors = []
+    current = getattr(node, 'parent', None)
+    while current is not None:
+        ancestors.append(current)
+        current = getattr(current, 'parent', None)
+    return ancestors
+
+
+def get_function_scope(node: ast.AST, tree: Optional[ast.AST] = None) -> Optional[str]:
+    """
+    获取节点所在的函数作用域
+    
+    Args:
+        node: 节点
+        tree: 节点所在的树；给出时先为其设置父节点，否则使用节点上已有的parent属性
+        
+    Returns:
+        最内层函数名，不在函数中时返回None
+    """
+    if tree is not None:
+        link_parents(tree)
+    
+    for ancestor in get_ancestors(node):
         if isinstance(ancestor, (ast.FunctionDef, ast.AsyncFunctionDef)):
             return ancestor.name
     
@@ -105,42 +230,52 @@ def get_function_scope(node: ast.AST) -> Optional[str]:
 
 def get_variable_usage(tree: ast.AST) -> Dict[str, Dict[str, List[int]]]:
     """获取变量使用情况"""
-    definitions = {}
-    references = {}
+    definitions = defaultdict(list)
+    references = defaultdict(list)
     
-    visitor = ASTVisitor()
-    visitor.visit(tree)
-    
-    for node in visitor.nodes:
-        if isinstance(node, ast.Assign):
+    # 显式栈做先序深度优先遍历，行号顺序与ASTVisitor相同，但不再构建用不到的父节点映射
+    assign_type = ast.Assign
+    name_type = ast.Name
+    load_type = ast.Load
+    iter_child_nodes = ast.iter_child_nodes
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        node_type = type(node)
+        if node_type is assign_type:
             # 变量定义
             for target in node.targets:
-                if isinstance(target, ast.Name):
-                    var_name = target.id
-                    if var_name not in definitions:
-                        definitions[var_name] = []
-                    definitions[var_name].append(node.lineno)
+                if type(target) is name_type:
+                    definitions[target.id].append(node.lineno)
         
-        elif isinstance(node, ast.Name):
+        elif node_type is name_type:
             # 变量引用
-            var_name = node.id
-            if isinstance(node.ctx, ast.Load):
-                if var_name not in references:
-                    references[var_name] = []
-                references[var_name].append(node.lineno)
+            if type(node.ctx) is load_type:
+                references[node.id].append(node.lineno)
+        
+        stack.extend(reversed(list(iter_child_nodes(node))))
     
     return {
-        'definitions': definitions,
-        'references': references
+        'definitions': dict(definitions),
+        'references': dict(references)
     }
 
 
-def extract_string_constants(tree: ast.AST) -> List[Dict[str, Any]]:
-    """提取字符串常量"""
+def extract_string_constants(tree: ast.AST, source_code: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    提取字符串常量
+    
+    传入tree对应的源码时先检查其中是否有引号：字符串常量只能来自带引号的字面量，
+    源码中没有引号时直接返回空列表，不再遍历AST
+    """
+    if source_code is not None and '"' not in source_code and "'" not in source_code:
+        return []
+    
     strings = []
+    constant_type = ast.Constant
     
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Constant) and isinstance(node.value, str):
+    for node in _iter_nodes(tree):
+        if type(node) is constant_type and type(node.value) is str:
             strings.append({
                 'value': node.value,
                 'line': node.lineno,
@@ -153,20 +288,14 @@ def extract_string_constants(tree: ast.AST) -> List[Dict[str, Any]]:
 
 def count_node_types(tree: ast.AST) -> Dict[str, int]:
     """统计节点类型"""
-    counts = {}
-    
-    for node in ast.walk(tree):
-        node_type = type(node).__name__
-        counts[node_type] = counts.get(node_type, 0) + 1
-    
-    return counts
+    return Counter(type(node).__name__ for node in _iter_nodes(tree))
 
 
 def get_import_statements(tree: ast.AST) -> List[Dict[str, Any]]:
     """获取导入语句"""
     imports = []
     
-    for node in ast.walk(tree):
+    for node in _iter_nodes(tree):
         if isinstance(node, ast.Import):
             for alias in node.names:
                 imports.append({
@@ -190,6 +319,22 @@ def get_import_statements(tree: ast.AST) -> List[Dict[str, Any]]:
     return imports
 
 
+# 控制流节点类型到control_flow统计键的分派表，按type(node)精确查找
+_CONTROL_FLOW_KEYS = {
+    ast.If: 'if',
+    ast.For: 'for',
+    ast.While: 'while',
+    ast.Try: 'try',
+    ast.ExceptHandler: 'except',
+}
+if hasattr(ast, "Match"):  # Python 3.10+
+    _CONTROL_FLOW_KEYS[getattr(ast, "Match")] = 'match'
+# 使嵌套深度加一的节点类型
+_NEST_TYPES = frozenset({ast.If, ast.For, ast.While, ast.Try, ast.With})
+# 使嵌套深度归零的节点类型（新函数）
+_NEST_RESET_TYPES = frozenset({ast.FunctionDef, ast.AsyncFunctionDef})
+
+
 def get_function_complexity(func_node: ast.FunctionDef) -> Dict[str, Any]:
     """获取函数复杂度信息"""
     complexity = 1  # 起点为1
@@ -203,37 +348,25 @@ def get_function_complexity(func_node: ast.FunctionDef) -> Dict[str, Any]:
         'match': 0
     }
     
-    for node in ast.walk(func_node):
-        if isinstance(node, ast.If):
-            complexity += 1
-            control_flow_nodes['if'] += 1
-        elif isinstance(node, ast.For):
-            complexity += 1
-            control_flow_nodes['for'] += 1
-        elif isinstance(node, ast.While):
-            complexity += 1
-            control_flow_nodes['while'] += 1
-        elif isinstance(node, ast.Try):
-            complexity += 1
-            control_flow_nodes['try'] += 1
-        elif isinstance(node, ast.ExceptHandler):
-            complexity += 1
-            control_flow_nodes['except'] += 1
-        elif isinstance(node, ast.Match):
-            complexity += len(node.cases)
-            control_flow_nodes['match'] += len(node.cases)
-        elif isinstance(node, ast.BoolOp):
-            complexity += len(node.values) - 1
-    
-    # 计算嵌套深度
+    # 一次遍历同时统计判定点和嵌套深度
     max_depth = 0
     current_depth = 0
+    control_flow_keys = _CONTROL_FLOW_KEYS
     
-    for node in ast.walk(func_node):
-        if isinstance(node, (ast.If, ast.For, ast.While, ast.Try, ast.With)):
+    for node in _iter_nodes(func_node):
+        node_type = type(node)
+        key = control_flow_keys.get(node_type)
+        if key is not None:
+            points = len(node.cases) if key == 'match' else 1
+            complexity += points
+            control_flow_nodes[key] += points
+        elif node_type is ast.BoolOp:
+            complexity += len(node.values) - 1
+        
+        if node_type in _NEST_TYPES:
             current_depth += 1
             max_depth = max(max_depth, current_depth)
-        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        elif node_type in _NEST_RESET_TYPES:
             # 重置深度（新函数）
             current_depth = 0
     
@@ -244,23 +377,31 @@ def get_function_complexity(func_node: ast.FunctionDef) -> Dict[str, Any]:
     }
 
 
+# 之后的同级语句不可达的跳转语句
+_TERMINAL_STMT_TYPES = (ast.Return, ast.Raise, ast.Break, ast.Continue)
+
+
 def find_unreachable_code(tree: ast.AST) -> List[Dict[str, Any]]:
-    """查找不可达代码"""
+    """
+    查找不可达代码
+    
+    一次遍历检查每个语句块（body、orelse、finalbody），
+    块内return/raise/break/continue之后的第一条语句记为不可达
+    """
     unreachable = []
     
-    # 查找return/raise/break/continue之后的代码
-    for node in ast.walk(tree):
-        if isinstance(node, (ast.Return, ast.Raise, ast.Break, ast.Continue)):
-            # 检查同一作用域内是否有后续语句
-            parent = None
-            for child in ast.walk(tree):
-                if child is node:
-                    parent = child
+    for node in _iter_nodes(tree):
+        for field in ('body', 'orelse', 'finalbody'):
+            block = getattr(node, field, None)
+            if not isinstance(block, list):
+                continue
+            for stmt, next_stmt in zip(block, block[1:]):
+                if isinstance(stmt, _TERMINAL_STMT_TYPES):
+                    unreachable.append({
+                        'line': next_stmt.lineno,
+                        'reason': type(stmt).__name__
+                    })
                     break
-            
-            if parent:
-                # 这里简化处理，实际需要更复杂的分析
-                pass
     
     return unreachable
 
@@ -268,7 +409,7 @@ def find_unreachable_code(tree: ast.AST) -> List[Dict[str, Any]]:
 def validate_syntax(source_code: str) -> Optional[str]:
     """验证语法有效性"""
     try:
-        ast.parse(source_code)
+        parse_source(source_code)
         return None
     except SyntaxError as e:
         return f"语法错误: {e.msg} (行{e.lineno}, 列{e.offset})"
\ No newline at end of file
@@ -2,10 +2,47 @@
 文件工具函数
 """
 
+import codecs
 import os
 import fnmatch
+import json
+import re
+import threading
 from pathlib import Path
-from typing import List, Set, Dict
+from functools import lru_cache
+from typing import Any, List, Set, Dict, Tuple
+
+try:
+    # orjson为可选依赖：直接生成UTF-8字节，序列化大型报告比标准库json快得多
+    import orjson
+except ImportError:
+    orjson = None
+
+# 始终忽略的目录名，与配置中的忽略模式合并使用
+_DEFAULT_IGNORES = (
+    "__pycache__",
+    ".git",
+    ".vscode",
+    ".idea",
+    "venv",
+    "env",
+    "node_modules",
+    "dist",
+    "build",
+)
+
+
+@lru_cache(maxsize=32)
+def _compile_ignore_patterns(ignore_patterns: Tuple[str, ...]) -> Tuple[re.Pattern, re.Pattern]:
+    """
+    将忽略模式预先合并为两个正则，按模式元组缓存，相同配置重复调用时不再重新构建
+    
+    路径匹配任一glob模式或包含任一模式子串时忽略，遍历时每个路径只需匹配两次
+    """
+    ignore_patterns = [os.path.normcase(pattern) for pattern in ignore_patterns]
+    glob_re = re.compile("|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in ignore_patterns))
+    substring_re = re.compile("|".join(map(re.escape, ignore_patterns)))
+    return glob_re, substring_re
 
 
 def find_python_files(root_path: str, ignore_config: Dict) -> List[str]:
@@ -22,33 +59,42 @@ def find_python_files(root_path: str, ignore_config: Dict) -> List[str]:
     python_files = []
     root = Path(root_path)
     
-    # 获取忽略模式
-    ignore_patterns = ignore_config.get("files", [])
-    ignore_patterns.extend([
-        "__pycache__",
-        ".git",
-        ".vscode",
-        ".idea",
-        "venv",
-        "env",
-        "node_modules",
-        "dist",
-        "build"
-    ])
-    
-    # 遍历目录
-    for file_path in root.rglob("*.py"):
-        file_str = str(file_path)
-        
-        # 检查是否应该忽略
-        should_ignore = False
-        for pattern in ignore_patterns:
-            if fnmatch.fnmatch(file_str, pattern) or pattern in file_str:
-                should_ignore = True
-                break
+    # 用户配置的忽略模式在前、默认忽略项在后，合并为新元组，不修改调用方的配置
+    ignore_patterns = tuple(ignore_config.get("files", ())) + _DEFAULT_IGNORES
+    glob_re, substring_re = _compile_ignore_patterns(ignore_patterns)
+    
+    # 用os.scandir深度优先遍历目录（顺序与rglob一致）；
+    # 目录路径已包含某个忽略子串时，其下所有文件都会被忽略，直接跳过整个目录不再深入
+    root_str = str(root)
+    # 与rglob一致：根路径不存在或不是目录时返回空列表
+    if not os.path.isdir(root_str):
+        return python_files
+    stack = [root_str]
+    while stack:
+        dir_path = stack.pop()
+        try:
+            with os.scandir(dir_path) as it:
+                entries = list(it)
+        except OSError:
+            # 无权限或遍历期间被删除的目录直接跳过
+            continue
         
-        if not should_ignore:
-            python_files.append(file_str)
+        subdirs = []
+        for entry in entries:
+            # 与Path.__truediv__相同，根目录为"."时子路径不带"./"前缀
+            entry_path = entry.name if dir_path == "." else os.path.join(dir_path, entry.name)
+            if os.path.normcase(entry.name).endswith(".py"):
+                # 检查是否应该忽略
+                normalized = os.path.normcase(entry_path)
+                if not (glob_re.match(normalized) or substring_re.search(normalized)):
+                    python_files.append(entry_path)
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+            except OSError:
+                is_dir = False
+            if is_dir and not substring_re.search(os.path.normcase(entry_path)):
+                subdirs.append(entry_path)
+        stack.extend(reversed(subdirs))
     
     return python_files
 
@@ -64,21 +110,53 @@ def read_file_safely(file_path: str, encoding: str = 'utf-8') -> str:
     Returns:
         文件内容
     """
+    # 只读取一次，解码失败时用同一份字节尝试其他编码
+    raw = Path(file_path).read_bytes()
     try:
-        with open(file_path, 'r', encoding=encoding) as f:
-            return f.read()
+        return raw.decode(encoding)
     except UnicodeDecodeError:
         # 尝试其他编码
         encodings = ['utf-8-sig', 'gbk', 'gb2312', 'latin-1']
         for enc in encodings:
             try:
-                with open(file_path, 'r', encoding=enc) as f:
-                    return f.read()
+                return raw.decode(enc)
             except UnicodeDecodeError:
                 continue
         raise ValueError(f"无法解码文件: {file_path}")
 
 
+def prefetch_files(file_paths: List[str]) -> threading.Thread:
+    """
+    在后台线程中提示内核预读文件，使磁盘I/O与后续解析重叠
+    
+    仅在支持posix_fadvise的平台（Linux）上生效，其他平台直接返回。
+    预读只是提示，不读取文件内容，失败时忽略。
+    
+    Args:
+        file_paths: 文件路径列表
+        
+    Returns:
+        执行预读的后台线程
+    """
+    def _prefetch():
+        for file_path in file_paths:
+            try:
+                fd = os.open(file_path, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+    
+    thread = threading.Thread(target=_prefetch, name="pyanalyzer-prefetch", daemon=True)
+    if hasattr(os, "posix_fadvise"):
+        thread.start()
+    return thread
+
+
 def is_test_file(file_path: str) -> bool:
     """
     检查是否为测试文件
@@ -118,9 +196,25 @@ def count_lines_in_file(file_path: str) -> int:
     Returns:
         文件行数
     """
+    # 按1MB分块读取字节，用bytes.count在C层统计换行，不再逐行迭代；
+    # 计数规则与文本模式逐行读取一致：\n、\r\n和单独的\r各算一个换行，末尾无换行的最后一行也计入
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return sum(1 for _ in f)
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        count = 0
+        last_byte = b''
+        with open(file_path, 'rb') as f:
+            while chunk := f.read(1 << 20):
+                # 只做UTF-8校验，非UTF-8文件与原先一样返回0
+                decoder.decode(chunk)
+                count += chunk.count(b'\n') + chunk.count(b'\r') - chunk.count(b'\r\n')
+                if last_byte == b'\r' and chunk[:1] == b'\n':
+                    # \r\n被分在两个块中
+                    count -= 1
+                last_byte = chunk[-1:]
+        decoder.decode(b'', final=True)
+        if last_byte and last_byte not in b'\r\n':
+            count += 1
+        return count
     except Exception:
         return 0
 
@@ -163,9 +257,40 @@ def write_json_file(data: dict, file_path: str, indent: int = 2):
         file_path: 文件路径
         indent: 缩进
     """
-    import json
+    # orjson只支持2空格缩进；遇到它不支持的数据（如超出64位的整数）时退回标准库json
+    if orjson is not None and indent == 2:
+        try:
+            content = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+        else:
+            with open(file_path, 'wb') as f:
+                f.write(content)
+            return
+    
+    # 先在内存中序列化再整体写入，避免json.dump逐个片段写文件
+    content = json.dumps(data, indent=indent, ensure_ascii=False)
     with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=indent, ensure_ascii=False)
+        f.write(content)
+
+
+def dumps_json_compact(data: Any) -> str:
+    """
+    将数据序列化为紧凑的JSON字符串（无多余空白，非ASCII字符原样保留）
+    
+    Args:
+        data: 数据
+        
+    Returns:
+        JSON字符串
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        except TypeError:
+            pass
+    
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
 
 
 def read_json_file(file_path: str) -> dict:
@@ -178,6 +303,5 @@ def read_json_file(file_path: str) -> dict:
     Returns:
         JSON数据
     """
-    import json
     with open(file_path, 'r', encoding='utf-8') as f:
         return json.load(f)
\ No newline at end of file
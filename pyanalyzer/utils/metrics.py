@@ -4,46 +4,78 @@
 
 import ast
 import math
-from typing import Dict, List, Any, Tuple
+import re
+from collections import Counter, deque
+from typing import TYPE_CHECKING, Dict, List, Any, Sequence, Tuple
+
+from pyanalyzer.utils.ast_utils import parse_source
+
+# numpy只在批量计算时才导入
+if TYPE_CHECKING:
+    import numpy as np
+
+# 按行扫描的正则：[^\S\n]即除换行外的空白字符，与str.strip()去除的字符一致且不会跨行
+_BLANK_LINE_RE = re.compile(r'^[^\S\n]*$', re.MULTILINE)
+_COMMENT_LINE_RE = re.compile(r'^[^\S\n]*#', re.MULTILINE)
 
 
 def calculate_metrics(source_code: str) -> Dict[str, Any]:
     """计算代码指标"""
     try:
-        tree = ast.parse(source_code)
+        tree = parse_source(source_code)
     except SyntaxError:
         return {}
     
-    # 基本指标
-    lines = source_code.split('\n')
-    total_lines = len(lines)
-    non_empty_lines = len([line for line in lines if line.strip()])
-    comment_lines = len([line for line in lines if line.strip().startswith('#')])
-    
-    # 统计节点
-    function_count = len([node for node in ast.walk(tree) 
-                         if isinstance(node, ast.FunctionDef)])
-    class_count = len([node for node in ast.walk(tree) 
-                      if isinstance(node, ast.ClassDef)])
-    import_count = len([node for node in ast.walk(tree) 
-                       if isinstance(node, (ast.Import, ast.ImportFrom))])
-    
-    # 计算平均函数长度和复杂度
+    # 基本指标（由str.count和正则在C层完成，不再拆分出行列表逐行处理）
+    total_lines = source_code.count('\n') + 1
+    non_empty_lines = total_lines - len(_BLANK_LINE_RE.findall(source_code))
+    comment_lines = len(_COMMENT_LINE_RE.findall(source_code))
+    
+    # 一次遍历（与ast.walk同为广度优先顺序）统计各类节点并收集函数指标；
+    # 遍历时携带外层函数链，判定点计入链上每个函数，结果与对各函数调用calculate_complexity相同
+    function_count = 0
+    class_count = 0
+    import_count = 0
     function_metrics = []
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):
+    
+    function_def = ast.FunctionDef
+    class_def = ast.ClassDef
+    import_types = (ast.Import, ast.ImportFrom)
+    iter_child_nodes = ast.iter_child_nodes
+    handlers = _CC_HANDLERS
+    
+    queue = deque([(tree, ())])
+    while queue:
+        node, funcs = queue.popleft()
+        
+        if funcs:
+            handler = handlers.get(type(node))
+            if handler is not None:
+                points = handler(node)
+                for func in funcs:
+                    func['complexity'] += points
+        
+        if isinstance(node, function_def):
+            function_count += 1
             start_line = node.lineno
             end_line = getattr(node, 'end_lineno', start_line)
             length = end_line - start_line + 1 if end_line else 10
             
-            complexity = calculate_complexity(node)
-            
-            function_metrics.append({
+            func = {
                 'name': node.name,
                 'length': length,
-                'complexity': complexity,
+                'complexity': 1,
                 'line': start_line
-            })
+            }
+            function_metrics.append(func)
+            funcs += (func,)
+        elif isinstance(node, class_def):
+            class_count += 1
+        elif isinstance(node, import_types):
+            import_count += 1
+        
+        for child in iter_child_nodes(node):
+            queue.append((child, funcs))
     
     avg_function_length = 0
     avg_complexity = 0
@@ -80,71 +112,85 @@ def calculate_metrics(source_code: str) -> Dict[str, Any]:
 def calculate_complexity(node: ast.AST) -> int:
     """计算圈复杂度"""
     complexity = 1
-    
+    handlers = _CC_HANDLERS
     for child in ast.walk(node):
-        if isinstance(child, (ast.If, ast.While, ast.For, ast.AsyncFor)):
-            complexity += 1
-        elif isinstance(child, ast.BoolOp):
-            complexity += len(child.values) - 1
-        elif isinstance(child, (ast.Try, ast.ExceptHandler)):
-            complexity += 1
-        elif isinstance(child, ast.Match):
-            complexity += len(child.cases)
-    
+        handler = handlers.get(type(child))
+        if handler is not None:
+            complexity += handler(child)
     return complexity
 
 
+def _h_one(node: ast.AST) -> int:
+    return 1
+
+
+def _h_boolop(node: ast.BoolOp) -> int:
+    return len(node.values) - 1
+
+
+def _h_match(node: ast.AST) -> int:
+    return len(node.cases)
+
+
+# 节点类型到判定点计算函数的分派表，按type(node)精确查找，避免逐个isinstance判断
+_CC_HANDLERS = {
+    ast.If: _h_one,
+    ast.While: _h_one,
+    ast.For: _h_one,
+    ast.AsyncFor: _h_one,
+    ast.Try: _h_one,
+    ast.ExceptHandler: _h_one,
+    ast.BoolOp: _h_boolop,
+}
+if hasattr(ast, "Match"):  # Python 3.10+
+    _CC_HANDLERS[getattr(ast, "Match")] = _h_match
+
+
+def _decision_points(node: ast.AST) -> int:
+    """单个节点为圈复杂度增加的判定点数"""
+    handler = _CC_HANDLERS.get(type(node))
+    return handler(node) if handler is not None else 0
+
+
+# Halstead操作符节点类型（算术/位运算、比较、逻辑三类合并），按type(node)精确查找
+_HALSTEAD_OPERATOR_TYPES = frozenset({
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv,
+    ast.Mod, ast.Pow, ast.LShift, ast.RShift,
+    ast.BitOr, ast.BitXor, ast.BitAnd, ast.MatMult,
+    ast.Eq, ast.NotEq, ast.Lt, ast.LtE,
+    ast.Gt, ast.GtE, ast.Is, ast.IsNot,
+    ast.In, ast.NotIn,
+    ast.And, ast.Or, ast.Not,
+})
+
+
 def calculate_halstead_metrics(tree: ast.AST) -> Dict[str, float]:
     """计算Halstead指标"""
-    operators = set()
-    operands = set()
-    operator_count = 0
-    operand_count = 0
-    
-    # 定义操作符和操作数
-    operator_keywords = {
-        '+', '-', '*', '/', '//', '%', '**',  # 算术
-        '==', '!=', '<', '<=', '>', '>=',  # 比较
-        'and', 'or', 'not',  # 逻辑
-        'is', 'is not', 'in', 'not in',  # 身份/成员
-        '&', '|', '^', '~', '<<', '>>',  # 位运算
-        '=', '+=', '-=', '*=', '/=', '//=', '%=', '**=',  # 赋值
-        '&=', '|=', '^=', '<<=', '>>=',  # 位赋值
-    }
+    # 一次遍历收集操作符类型和操作数（变量名和常量），之后由Counter在C层统计种类数和总数
+    operator_list = []
+    operand_list = []
+    operator_types = _HALSTEAD_OPERATOR_TYPES
+    name_type = ast.Name
+    constant_type = ast.Constant
     
     for node in ast.walk(tree):
-        # 统计操作符
-        if isinstance(node, (ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv,
-                           ast.Mod, ast.Pow, ast.LShift, ast.RShift,
-                           ast.BitOr, ast.BitXor, ast.BitAnd, ast.MatMult)):
-            operators.add(type(node).__name__)
-            operator_count += 1
-        
-        elif isinstance(node, (ast.Eq, ast.NotEq, ast.Lt, ast.LtE,
-                             ast.Gt, ast.GtE, ast.Is, ast.IsNot,
-                             ast.In, ast.NotIn)):
-            operators.add(type(node).__name__)
-            operator_count += 1
-        
-        elif isinstance(node, (ast.And, ast.Or, ast.Not)):
-            operators.add(type(node).__name__)
-            operator_count += 1
-        
-        # 统计操作数（变量和常量）
-        elif isinstance(node, ast.Name):
-            operands.add(node.id)
-            operand_count += 1
-        
-        elif isinstance(node, ast.Constant):
+        node_type = type(node)
+        if node_type in operator_types:
+            operator_list.append(node_type)
+        elif node_type is name_type:
+            operand_list.append(node.id)
+        elif node_type is constant_type:
             if isinstance(node.value, (int, float, str, bool)):
-                operands.add(str(node.value))
-                operand_count += 1
+                operand_list.append(str(node.value))
+    
+    operators = Counter(operator_list)
+    operands = Counter(operand_list)
     
     # 计算Halstead指标
     n1 = len(operators)  # 独特操作符数
     n2 = len(operands)   # 独特操作数数
-    N1 = operator_count  # 操作符总数
-    N2 = operand_count   # 操作数总数
+    N1 = len(operator_list)  # 操作符总数
+    N2 = len(operand_list)   # 操作数总数
     
     # 避免除以零
     if n1 == 0 or n2 == 0:
@@ -193,14 +239,39 @@ def calculate_maintainability_index(volume: float,
         return 50.0
 
 
+def calculate_maintainability_index_batch(volumes: Sequence[float],
+                                         complexities: Sequence[float],
+                                         lines: Sequence[int]) -> "np.ndarray":
+    """
+    批量计算多个文件的可维护性指数
+    
+    用NumPy向量化计算，逐元素结果与calculate_maintainability_index相同：
+    行数为0时为100，对数参数非正时为50，其余截断到[0, 100]
+    """
+    import numpy as np
+    
+    volumes = np.asarray(volumes, dtype=np.float64)
+    complexities = np.asarray(complexities, dtype=np.float64)
+    lines = np.asarray(lines, dtype=np.float64)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mi = 171 - 5.2 * np.log(volumes + 1) - 0.23 * complexities - 16.2 * np.log(lines)
+    result = np.where((volumes + 1 > 0) & (lines > 0), np.clip(mi, 0, 100), 50.0)
+    result[lines == 0] = 100.0
+    return result
+
+
 def calculate_code_churn(old_code: str, new_code: str) -> Dict[str, int]:
     """计算代码变更率"""
     old_lines = old_code.split('\n')
     new_lines = new_code.split('\n')
     
     # 简化的变更计算（实际应该用diff算法）
-    added = len([line for line in new_lines if line not in old_lines])
-    deleted = len([line for line in old_lines if line not in new_lines])
+    # 成员判断改用集合，O(N+M)；仍逐行统计，重复出现的行各计一次，结果与列表查找相同
+    old_set = set(old_lines)
+    new_set = set(new_lines)
+    added = sum(1 for line in new_lines if line not in old_set)
+    deleted = sum(1 for line in old_lines if line not in new_set)
     modified = min(added, deleted)  # 简化
     
     total_churn = added + deleted + modified
@@ -282,4 +353,35 @@ def calculate_technical_debt(metrics: Dict, defects: List[Dict]) -> Dict[str, An
         'total_debt': total_debt,
         'estimated_hours': estimated_hours,
         'debt_density': total_debt / metrics.get('total_lines', 1) * 1000
-    }
\ No newline at end of file
+    }
+
+
+def aggregate_project_metrics(metrics: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """汇总各文件指标为项目级指标（单次遍历）
+    
+    平均圈复杂度和平均函数长度只统计大于0的文件
+    """
+    total_lines = total_functions = total_classes = 0
+    complexity_sum = length_sum = 0
+    complexity_count = length_count = 0
+    for m in metrics:
+        total_lines += m.get("total_lines", 0)
+        total_functions += m.get("function_count", 0)
+        total_classes += m.get("class_count", 0)
+        complexity = m.get("avg_cyclomatic_complexity", 0)
+        if complexity > 0:
+            complexity_sum += complexity
+            complexity_count += 1
+        length = m.get("avg_function_length", 0)
+        if length > 0:
+            length_sum += length
+            length_count += 1
+    
+    return {
+        "total_lines": total_lines,
+        "total_functions": total_functions,
+        "total_classes": total_classes,
+        "avg_cyclomatic_complexity": complexity_sum / complexity_count if complexity_count else 0,
+        "avg_function_length": length_sum / length_count if length_count else 0,
+        "files_analyzed": len(metrics)
+    }
@@ -0,0 +1,33 @@
+"""
+并行执行工具函数
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, Optional, Sequence
+
+
+def parallel_map(func: Callable[..., Any], *items: Sequence[Any],
+                 workers: Optional[int] = None, min_items: int = 2,
+                 chunksize: int = 1) -> Iterator[Any]:
+    """按输入顺序逐个产出func的结果，输入较多时分发给进程池
+    
+    工作进程数不超过分块数，避免启动永远分不到任务的进程；
+    输入少于min_items或只需一个工作进程时直接在当前进程中执行
+    
+    Args:
+        func: 可被pickle的模块级函数
+        *items: 与func参数一一对应的输入序列
+        workers: 最大工作进程数，默认为CPU核数
+        min_items: 启用进程池所需的最少输入数
+        chunksize: 每次分发给工作进程的输入数
+    """
+    count = min((len(seq) for seq in items), default=0)
+    chunk_count = -(-count // chunksize)
+    max_workers = min(workers or os.cpu_count() or 1, chunk_count)
+    if count < min_items or max_workers <= 1:
+        yield from map(func, *items)
+        return
+    
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(func, *items, chunksize=chunksize)
@@ -24,6 +24,7 @@ def main():
         print("用法: python run_analysis.py <项目路径> [选项]")
         print("示例: python run_analysis.py examples/example_project")
         print("示例: python run_analysis.py . --symbolic --format html")
+        print("示例: python run_analysis.py . --jobs 4")
         return
     
     project_path = sys.argv[1]
@@ -42,6 +43,10 @@ def main():
         output_index = sys.argv.index("--output")
         if output_index + 1 < len(sys.argv):
             args.extend(["--output", sys.argv[output_index + 1]])
+    if "--jobs" in sys.argv:
+        jobs_index = sys.argv.index("--jobs")
+        if jobs_index + 1 < len(sys.argv):
+            args.extend(["--jobs", sys.argv[jobs_index + 1]])
     
     # 运行分析
     try:
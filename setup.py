@@ -16,6 +16,12 @@ with open("pyanalyzer/__init__.py", "r", encoding="utf-8") as fh:
 with open("requirements.txt", "r", encoding="utf-8") as fh:
     requirements = [line.strip() for line in fh if line.strip() and not line.startswith("#")]
 
+# 可选：设置PYANALYZER_USE_MYPYC=1时用mypyc将AST遍历热点模块编译为C扩展
+ext_modules = []
+if os.environ.get("PYANALYZER_USE_MYPYC"):
+    from mypyc.build import mypycify
+    ext_modules = mypycify(["pyanalyzer/core/_ast_parser_fast.py"])
+
 setup(
     name="pyanalyzer",
     version=version.get("__version__", "1.0.0"),
@@ -48,6 +54,7 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=requirements,
+    ext_modules=ext_modules,
     entry_points={
         "console_scripts": [
             "pyanalyzer=pyanalyzer.cli:cli",
@@ -72,6 +79,9 @@ setup(
             "sphinx-rtd-theme>=1.0.0",
             "myst-parser>=0.18.0",
         ],
+        "fast": [
+            "orjson>=3.6.0",
+        ],
     },
     keywords=[
         "static-analysis",